@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+장부 조회/저장용 JSON HTTP API (선택 사항, Streamlit 앱과 별도로 실행).
+
+실행:
+    python api_server.py                      # http://127.0.0.1:8502
+    python api_server.py --host 0.0.0.0 --port 8502
+
+인증: 환경변수 CHURCH_API_TOKEN 을 설정하면 모든 요청에 `Authorization: Bearer <토큰>` 이 필요합니다.
+      저장(PUT)은 토큰을 설정한 경우에만 허용됩니다.
+장부 선택: `?ledger=<코드>` (생략 시 기본 장부)
+
+GET  /api/ledgers
+GET  /api/day/<YYYY-MM-DD>
+PUT  /api/day/<YYYY-MM-DD>      본문: {"income": [...], "expense": [...], "expected_version": 3}
+               (GET으로 받은 행의 uid를 그대로 보내면 그 행을 고침. uid가 없는 행은 같은 내용의 행이 없으면 새 행)
+GET  /api/rows?kind=income|expense&start=&end=&limit=100&cursor=<다음 페이지 커서>
+               (선택 필터: item=<항목명>&usage=현금|은행&min=&max=&q=<검색어>&order=desc)
+GET  /api/summary?start=&end=
+
+응답에는 ETag가 붙습니다(조회 기간 날짜들의 저장 버전 + 항목 목록 지문 + 장부 사본 id 기준,
+항목 이름/순합계 제외 설정을 바꾸거나 백업을 복원해도 바뀜).
+If-None-Match 로 같은 값을 보내면 데이터가 바뀌지 않은 경우 304 Not Modified 를 돌려줍니다.
+"""
+import os
+import sys
+import gzip
+import json
+import hmac
+import base64
+import hashlib
+import argparse
+import datetime as dt
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+from utils import storage, tenants, sync
+from utils.reports import build_period_report
+from utils.warmup import warm_up
+
+API_TOKEN = os.environ.get("CHURCH_API_TOKEN") or None
+
+MAX_PAGE_ROWS = 1000
+GZIP_MIN_BYTES = 1024
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _parse_date(s, name: str):
+    if s is None or s == "":
+        return None
+    try:
+        return dt.date.fromisoformat(s)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name}: 날짜 형식은 YYYY-MM-DD 입니다.")
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    out = []
+    for r in df.to_dict(orient="records"):
+        out.append({k: (None if (not isinstance(v, (list, dict)) and pd.isna(v)) else v) for k, v in r.items()})
+    return out
+
+def _encode_cursor(d: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{d}|{row_id}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        d, row_id = raw.split("|")
+        dt.date.fromisoformat(d)
+        return d, int(row_id)
+    except Exception:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "cursor 값이 올바르지 않습니다.")
+
+def _etag(*parts) -> str:
+    h = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{h}"'
+
+def _data_version(start, end) -> tuple:
+    """
+    ETag에 넣는 데이터 버전: 기간 버전(날짜 저장 버전 + 항목 목록 지문, storage.range_version) + 사본 id.
+    백업을 복원하면 날짜 버전이 예전 값으로 돌아가지만 사본 id가 새로 바뀌므로 예전 ETag와 겹치지 않음
+    """
+    return storage.range_version(start or dt.date.min, end or dt.date.max), sync.node_id()
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "ChurchFinanceAPI/1.0"
+
+    # ------------------------------------------------------------------
+    # 공통
+    # ------------------------------------------------------------------
+    def log_message(self, fmt, *args):
+        sys.stderr.write("%s - %s\n" % (self.address_string(), fmt % args))
+
+    def _query(self) -> dict:
+        return {k: v[-1] for k, v in parse_qs(urlsplit(self.path).query).items()}
+
+    def _route(self) -> list[str]:
+        return [p for p in urlsplit(self.path).path.split("/") if p]
+
+    def _check_auth(self) -> None:
+        if API_TOKEN is None:
+            return
+        got = self.headers.get("Authorization", "")
+        if not hmac.compare_digest(got, f"Bearer {API_TOKEN}"):
+            raise ApiError(HTTPStatus.UNAUTHORIZED, "인증이 필요합니다.")
+
+    def _send_json(self, status: HTTPStatus, payload, etag: str | None = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8", "Cache-Control": "no-cache"}
+        if etag:
+            headers["ETag"] = etag
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, etag: str) -> bool:
+        inm = self.headers.get("If-None-Match")
+        if inm and etag in [t.strip() for t in inm.split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return True
+        return False
+
+    def _dispatch(self, method: str) -> None:
+        try:
+            self._check_auth()
+            q = self._query()
+            ledger = q.get("ledger") or tenants.DEFAULT_LEDGER
+            try:
+                tenants.get_ledger(ledger)
+            except KeyError as e:
+                raise ApiError(HTTPStatus.NOT_FOUND, str(e))
+            with tenants.use_ledger(ledger):
+                self._handle(method, self._route(), q, ledger)
+        except ApiError as e:
+            self._send_json(e.status, {"error": e.message})
+        except storage.SaveConflictError as e:
+            self._send_json(HTTPStatus.CONFLICT, {"error": str(e), "current_version": e.current})
+        except storage.PeriodClosedError as e:
+            self._send_json(HTTPStatus.LOCKED, {"error": str(e), "period": e.period})
+        except ValueError as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except Exception as e:
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    # ------------------------------------------------------------------
+    # 라우팅
+    # ------------------------------------------------------------------
+    def _handle(self, method: str, route: list[str], q: dict, ledger: str) -> None:
+        if not route or route[0] != "api":
+            raise ApiError(HTTPStatus.NOT_FOUND, "없는 경로입니다.")
+        route = route[1:]
+
+        if method == "GET" and route == ["ledgers"]:
+            self._send_json(HTTPStatus.OK, [{"key": l.key, "name": l.name} for l in tenants.list_ledgers()])
+        elif len(route) == 2 and route[0] == "day":
+            d = _parse_date(route[1], "날짜")
+            if method == "GET":
+                self._get_day(d, ledger)
+            else:
+                self._put_day(d)
+        elif method == "GET" and route == ["rows"]:
+            self._get_rows(q, ledger)
+        elif method == "GET" and route == ["summary"]:
+            self._get_summary(q, ledger)
+        else:
+            raise ApiError(HTTPStatus.NOT_FOUND, "없는 경로입니다.")
+
+    def _get_day(self, d: dt.date, ledger: str) -> None:
+        version = storage.fetch_day_version(d)
+        etag = _etag(ledger, "day", d, version, *_data_version(d, d))
+        if self._not_modified(etag):
+            return
+        income, expense = storage.fetch_day(d, with_uid=True)
+        self._send_json(
+            HTTPStatus.OK,
+            {"date": d, "version": version, "income": _records(income), "expense": _records(expense)},
+            etag=etag,
+        )
+
+    def _put_day(self, d: dt.date) -> None:
+        if API_TOKEN is None:
+            raise ApiError(HTTPStatus.FORBIDDEN, "저장하려면 CHURCH_API_TOKEN 을 설정해야 합니다.")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_BYTES:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "본문(JSON)이 비었거나 너무 큽니다.")
+        try:
+            payload = json.loads(self.rfile.read(length).decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "JSON 형식이 올바르지 않습니다.")
+
+        income = pd.DataFrame(payload.get("income") or [])
+        expense = pd.DataFrame(payload.get("expense") or [])
+        expected = payload.get("expected_version")
+        version = storage.save_day(d, income, expense, actor=payload.get("actor") or "api", expected_version=expected)
+        self._send_json(HTTPStatus.OK, {"date": d, "version": version})
+
+    def _get_rows(self, q: dict, ledger: str) -> None:
+        kind = q.get("kind", "income")
+        if kind not in storage.KIND_COLS:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "kind 는 income 또는 expense 입니다.")
+        start = _parse_date(q.get("start"), "start")
+        end = _parse_date(q.get("end"), "end")
+        try:
+            limit = max(1, min(MAX_PAGE_ROWS, int(q.get("limit", 100))))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "limit 은 숫자입니다.")
+        after = _decode_cursor(q["cursor"]) if q.get("cursor") else None
+        try:
+            min_amount = float(q["min"]) if q.get("min") else None
+            max_amount = float(q["max"]) if q.get("max") else None
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "min, max 는 숫자입니다.")
+        filters = dict(
+            item=q.get("item") or None,
+            usage=q.get("usage") or None,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            text=q.get("q") or None,
+            descending=q.get("order") == "desc",
+        )
+
+        etag = _etag(ledger, "rows", *_data_version(start, end), kind, start, end, limit, after, sorted(filters.items()))
+        if self._not_modified(etag):
+            return
+        df = storage.fetch_page(kind, start, end, after=after, limit=limit, **filters)
+        next_cursor = None
+        if len(df) == limit:
+            last = df.iloc[-1]
+            next_cursor = _encode_cursor(last["날짜"].isoformat(), int(last["id"]))
+        self._send_json(HTTPStatus.OK, {"kind": kind, "rows": _records(df), "next_cursor": next_cursor}, etag=etag)
+
+    def _get_summary(self, q: dict, ledger: str) -> None:
+        start = _parse_date(q.get("start"), "start")
+        end = _parse_date(q.get("end"), "end")
+        if start is None or end is None:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "start, end 가 필요합니다.")
+        if end < start:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "end 가 start 보다 앞설 수 없습니다.")
+
+        etag = _etag(ledger, "summary", *_data_version(start, end), start, end)
+        if self._not_modified(etag):
+            return
+        report = build_period_report(start, end, f"{start.isoformat()} ~ {end.isoformat()}")
+        self._send_json(
+            HTTPStatus.OK,
+            {
+                "start": start,
+                "end": end,
+                "income_total": report.income_total,
+                "expense_total": report.expense_total,
+                "net": report.income_total - report.expense_total,
+                "income_usage": report.income_usage,
+                "expense_usage": report.expense_usage,
+                "income_items": _records(report.income_sum),
+                "expense_items": _records(report.expense_sum),
+            },
+            etag=etag,
+        )
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="교회 재정장부 JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args(argv)
+
+    warm_up()  # 첫 요청 전에 장부 DB/캐시 준비
+    server = ThreadingHTTPServer((args.host, args.port), ApiHandler)
+    print(f"API 서버 실행 중: http://{args.host}:{args.port}/api/ledgers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -3,9 +3,10 @@ import streamlit as st
 
 from utils.ui import apply_global_style, render_header, render_top_nav
 from utils.auth import login_form, is_authenticated
+from utils.tenants import SESSION_KEY, list_ledgers, current_ledger, current_church_name
 
 st.set_page_config(
-    page_title="평안한교회 재정장부",
+    page_title=f"{current_church_name()} 재정장부",
     page_icon="💒",
     layout="wide",
     initial_sidebar_state="collapsed",
@@ -20,5 +21,53 @@ st.write("")
 if is_authenticated():
     st.success("로그인 되어 있습니다.")
     st.write("상단 메뉴에서 원하는 항목으로 이동하세요.")
+
+    # 장부(교회) 선택: 등록된 장부가 2개 이상일 때만 표시
+    # (위젯 값은 페이지 이동 시 사라지므로 선택값을 별도 세션 키에 보관)
+    ledgers = list_ledgers()
+    if len(ledgers) > 1:
+        keys = [l.key for l in ledgers]
+        names = {l.key: l.name for l in ledgers}
+
+        def _on_ledger_change():
+            st.session_state[SESSION_KEY] = st.session_state["ledger_select"]
+
+        st.selectbox(
+            "장부(교회) 선택",
+            keys,
+            index=keys.index(current_ledger()),
+            format_func=lambda k: names.get(k, k),
+            key="ledger_select",
+            on_change=_on_ledger_change,
+        )
+
+    # 요약(대시보드): 날짜별 합계(daily_totals)만 읽음. pandas는 로그인 후에만 불러옴
+    import datetime as dt
+    import pandas as pd
+    from utils.dashboard import build_dashboard
+
+    board = build_dashboard(dt.date.today())
+    st.divider()
+    net_label = f"순잔액({'/'.join(board.net_excluded)} 제외)" if board.net_excluded else "순잔액(수입-지출)"
+    cols = st.columns(len(board.periods), gap="large")
+    for col, p in zip(cols, board.periods):
+        with col:
+            st.markdown(f"### {p.label}")
+            st.caption(f"{p.start.isoformat()} ~ {p.end.isoformat()}")
+            st.metric("수입", f"₩{p.income:,.0f}")
+            st.metric("지출", f"₩{p.expense:,.0f}")
+            st.metric(net_label, f"₩{p.net:,.0f}")
+            st.dataframe(
+                pd.DataFrame([
+                    {"구분": "현금", "수입": f"₩{p.income_cash:,.0f}", "지출": f"₩{p.expense_cash:,.0f}"},
+                    {"구분": "은행", "수입": f"₩{p.income_bank:,.0f}", "지출": f"₩{p.expense_bank:,.0f}"},
+                ]),
+                width="stretch",
+                hide_index=True,
+            )
+
+    st.markdown("### 최근 52주 추이")
+    trend = pd.DataFrame(board.trend, columns=["주 시작일", "수입", "지출"]).set_index("주 시작일")
+    st.bar_chart(trend, stack=False, color=["#1f77b4", "#d62728"])
 else:
     login_form()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+import pandas as pd
+import streamlit as st
+
+from utils.ui import apply_global_style, render_header, render_top_nav
+from utils.auth import require_login, current_user
+from utils.storage import PeriodClosedError
+from utils import journal
+
+SOURCE_LABELS = {"ledger": "장부", "manual": "수기"}
+KIND_LABELS = {"income": "수입", "expense": "지출"}
+OWN_ACCOUNT = "(항목 자기 계정)"
+ENTRY_ROWS = 6  # 수기 분개 입력 줄 수
+
+st.set_page_config(page_title="시산표", page_icon="⚖️", layout="wide", initial_sidebar_state="collapsed")
+apply_global_style()
+render_top_nav("시산표")
+render_header("시산표(복식부기)", "장부를 계정과목별 차변/대변으로 분개해 기간 시산표를 봅니다.")
+
+if not require_login():
+    st.stop()
+
+if not journal.enabled():
+    st.info(
+        "복식부기를 켜면 지금 장부(수입/지출)를 날짜별로 분개하고, 이후 저장할 때마다 바뀐 날짜의 분개를 함께 고칩니다. "
+        "예치금/이월금/대출금 항목은 수입/지출이 아닌 자산/순자산/부채 계정으로 분개합니다. 기존 장부는 바뀌지 않습니다."
+    )
+    if st.button("복식부기 사용 시작", key="jr_enable", type="primary", width="stretch"):
+        n = journal.enable()
+        st.toast(f"분개 {n:,}개를 만들었습니다.", icon="⚖️")
+        st.rerun()
+    st.stop()
+
+today = dt.date.today()
+c1, c2 = st.columns(2, gap="small")
+start = c1.date_input("시작일", value=dt.date(today.year, 1, 1), key="jr_start")
+end = c2.date_input("종료일", value=today, key="jr_end")
+if start > end:
+    st.warning("시작일이 종료일보다 늦습니다.")
+    st.stop()
+
+chart = journal.accounts()
+labels = {code: f"{code} {name}" for code, name in zip(chart["code"], chart["name"])}
+
+# 시산표
+tb = journal.trial_balance(start, end)
+m1, m2, m3 = st.columns(3, gap="small")
+m1.metric("차변 합계", f"₩{tb.debit_total:,.0f}")
+m2.metric("대변 합계", f"₩{tb.credit_total:,.0f}")
+m3.metric("차대 일치", "✅ 일치" if tb.balanced else "⚠️ 불일치")
+if tb.rows.empty:
+    st.info("선택한 기간에 분개가 없습니다.")
+else:
+    st.dataframe(
+        tb.rows.style.format({c: "{:,.0f}" for c in ("기초", "차변", "대변", "기말")}),
+        width="stretch",
+        hide_index=True,
+    )
+    st.caption("기초/기말은 자산·지출은 차변, 부채·순자산·수입은 대변 쪽 잔액입니다. 수입/지출 계정은 기간 발생액만 표시합니다.")
+
+st.divider()
+st.markdown('<div class="section-title">수기 분개</div>', unsafe_allow_html=True)
+st.caption("현금 ↔ 은행 이체처럼 장부(수입/지출)에 적지 않는 거래를 입력합니다. 차변 합계와 대변 합계가 같아야 저장됩니다.")
+with st.form("jr_entry_form", clear_on_submit=True):
+    e1, e2 = st.columns([1, 2], gap="small")
+    entry_date = e1.date_input("날짜", value=today)
+    memo = e2.text_input("적요", placeholder="예: 현금 은행 입금")
+    lines = st.data_editor(
+        pd.DataFrame({"계정": [None] * ENTRY_ROWS, "차변": [None] * ENTRY_ROWS, "대변": [None] * ENTRY_ROWS}),
+        column_config={
+            "계정": st.column_config.SelectboxColumn("계정", options=list(labels.values())),
+            "차변": st.column_config.NumberColumn("차변(원)", min_value=0, step=1, format="accounting"),
+            "대변": st.column_config.NumberColumn("대변(원)", min_value=0, step=1, format="accounting"),
+        },
+        width="stretch",
+        hide_index=True,
+        key="jr_entry_lines",
+    )
+    if st.form_submit_button("분개 저장", type="primary", width="stretch"):
+        try:
+            entry_id = journal.post_entry(
+                entry_date, memo,
+                [((a.split(" ", 1)[0] if isinstance(a, str) else None), dr, cr)
+                 for a, dr, cr in zip(lines["계정"], lines["차변"], lines["대변"])],
+                actor=current_user(),
+            )
+            st.success(f"분개 {entry_id}번을 저장했습니다.")
+        except (ValueError, PeriodClosedError) as e:
+            st.error(str(e))
+
+with st.expander("분개장(기간)"):
+    only_manual = st.checkbox("수기 분개만", key="jr_only_manual")
+    lines_df = journal.entries(start, end, source="manual" if only_manual else None)
+    if lines_df.empty:
+        st.info("선택한 기간에 분개가 없습니다.")
+    else:
+        lines_df["구분"] = lines_df["구분"].map(SOURCE_LABELS)
+        st.dataframe(
+            lines_df.style.format({"차변": "{:,.0f}", "대변": "{:,.0f}"}),
+            width="stretch", hide_index=True, height=360,
+        )
+        manual_ids = sorted(lines_df.loc[lines_df["구분"] == "수기", "번호"].unique().tolist())
+        if manual_ids:
+            d1, d2 = st.columns([2, 1], gap="small")
+            del_id = d1.selectbox("지울 수기 분개 번호", manual_ids, key="jr_del_id")
+            if d2.button("수기 분개 삭제", key="jr_del_btn", width="stretch"):
+                try:
+                    journal.delete_entry(del_id)
+                    st.rerun()
+                except PeriodClosedError as e:
+                    st.error(str(e))
+
+with st.expander("계정과목 / 항목별 계정"):
+    st.dataframe(
+        chart.assign(type=chart["type"].map(journal.ACCOUNT_TYPES)).rename(
+            columns={"code": "계정코드", "name": "계정과목", "type": "구분"}
+        ),
+        width="stretch", hide_index=True, height=240,
+    )
+    with st.form("jr_add_account", clear_on_submit=True):
+        a1, a2, a3 = st.columns(3, gap="small")
+        new_code = a1.text_input("계정코드", placeholder="예: 104")
+        new_name = a2.text_input("계정 이름", placeholder="예: 적금")
+        new_type = a3.selectbox("구분", list(journal.ACCOUNT_TYPES), format_func=journal.ACCOUNT_TYPES.get)
+        if st.form_submit_button("계정 추가", width="stretch"):
+            try:
+                journal.add_account(new_code, new_name, new_type)
+                st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+
+    st.caption("장부 항목이 분개될 계정입니다. 바꾸면 장부 전체의 자동 분개를 다시 만듭니다.")
+    cats = journal.category_accounts()
+    options = [OWN_ACCOUNT] + [labels[c] for c in chart["code"] if c[:1] not in ("4", "5")]
+    edited = st.data_editor(
+        pd.DataFrame({
+            "구분": cats["kind"].map(KIND_LABELS),
+            "항목": cats["name"],
+            "계정": [labels.get(a, a) if a else OWN_ACCOUNT for a in cats["account"]],
+        }),
+        column_config={"계정": st.column_config.SelectboxColumn("계정", options=options, required=True)},
+        disabled=["구분", "항목"],
+        width="stretch",
+        hide_index=True,
+        key="jr_cat_accounts",
+    )
+    for code, before, after in zip(cats["code"], cats["account"], edited["계정"]):
+        new = None if after == OWN_ACCOUNT else after.split(" ", 1)[0]
+        if new != (before or None):
+            journal.set_category_account(code, new)
+            st.rerun()
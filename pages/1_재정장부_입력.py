@@ -1,31 +1,34 @@
 # -*- coding: utf-8 -*-
+import time
+import uuid
+from functools import partial
 import pandas as pd
 import streamlit as st
 
 from utils.ui import apply_global_style, render_header, render_top_nav, church_date_picker
-from utils.auth import require_login
-from utils.storage import fetch_day, save_day, INCOME_COLS, EXPENSE_COLS
+from utils.auth import require_login, current_user
+from utils.storage import (
+    fetch_day, fetch_day_rows, fetch_day_version, save_day, item_names, closed_period_of,
+    INCOME_COLS, EXPENSE_COLS, KIND_COLS,
+)
 from utils.exporter import export_day_xlsx
+from utils.tenants import current_ledger, current_church_name
+from utils.autosave import queue as autosave_queue, session_owner
+from utils.history import load_history, compare_table
+from utils.attachments import UPLOAD_TYPES, KIND_LABELS, attach, day_attachments, remove_attachment, read_blob, thumbnail
 
 USAGE_OPTIONS = ["은행", "현금"]
 
-INCOME_ITEMS = [
-    "십일조", "주정헌금", "감사헌금", "선교헌금", "건축헌금", "차량헌금", "구제헌금",
-    "신년감사헌금", "부활절감사헌금", "맥추감사헌금", "추수감사헌금", "성탄감사헌금",
-    "작정헌금", "기타", "대출금", "예치금", "이월금"
-]
-EXPENSE_ITEMS = [
-    "재정부", "예배부", "선교부", "사량부", "관리부", "식당봉사부", "새신자전도부",
-    "주일학교", "중고청년", "사례비1", "사례비2", "전기요금", "전화요금등", "상하수도요금",
-    "사택관리", "대출금이자", "화재보험료", "대출금", "예치금", "이월금"
-]
-
 DEFAULT_ROWS = 200  # 엑셀 복붙 편의
 
+# 편집 표 컬럼: 맨 앞의 uid는 숨김 컬럼(저장이 uid로 같은 행을 찾아 고친 행도 행 번호/첨부를 유지)
+INCOME_WORK_COLS = ["uid"] + INCOME_COLS
+EXPENSE_WORK_COLS = ["uid"] + EXPENSE_COLS
+
 st.set_page_config(page_title="재정장부(입력)", page_icon="📝", layout="wide", initial_sidebar_state="collapsed")
 apply_global_style()
 render_top_nav("재정장부(입력)")
-render_header("재정장부 (입력)", "좌측은 수입, 우측은 지출입니다. 저장은 '지금 저장' 버튼으로 진행합니다.")
+render_header("재정장부 (입력)", "좌측은 수입, 우측은 지출입니다. 입력을 멈추면 잠시 후 자동 저장됩니다('지금 저장'으로 바로 저장).")
 
 if not require_login():
     st.stop()
@@ -53,21 +56,75 @@ def _ensure_rows(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
     if "날짜" in df.columns:
         df["날짜"] = df["날짜"].fillna(selected_date)
 
+    # 새 행(빈 행 포함)에도 미리 uid를 붙여 둠: 자동 저장 뒤에 이어서 고쳐도 같은 행으로 저장(두 번 들어가지 않음)
+    if "uid" in df.columns:
+        df["uid"] = [u if isinstance(u, str) and u else uuid.uuid4().hex for u in df["uid"]]
+
     return df
 
-# 날짜 변경 시 DB에서 로드
+def _sig(income: pd.DataFrame, expense: pd.DataFrame) -> int:
+    # 편집 내용이 바뀌었는지 비교용
+    return hash((income.to_csv(index=False), expense.to_csv(index=False)))
+
+def _moved_rows(df: pd.DataFrame) -> pd.Series:
+    """날짜를 선택한 날짜가 아닌 날로 바꾼 행(저장하면 그 날짜로 옮겨짐)"""
+    dates = pd.to_datetime(df["날짜"], errors="coerce").dt.date
+    return dates.notna() & (dates != selected_date)
+
+def _drop_moved_rows() -> int:
+    """
+    저장으로 다른 날짜에 옮겨진 행을 편집 중인 표에서 뺍니다(편집기도 초기화). 뺀 행 수를 반환합니다.
+    표에 남겨 두면 저장은 선택한 날짜의 행만 비교하므로, 다음 저장 때마다 옮긴 날짜에 같은 행이 또 들어감
+    """
+    n = 0
+    for key, cols in (("in_income_work", INCOME_WORK_COLS), ("in_expense_work", EXPENSE_WORK_COLS)):
+        df = st.session_state[key]
+        moved = _moved_rows(df)
+        if moved.any():
+            n += int(moved.sum())
+            st.session_state[key] = _ensure_rows(df[~moved].reset_index(drop=True), cols)
+    if n:
+        st.session_state["in_submitted_sig"] = _sig(st.session_state["in_income_work"], st.session_state["in_expense_work"])
+        st.session_state.pop(f"income_editor_{work_key}", None)
+        st.session_state.pop(f"expense_editor_{work_key}", None)
+    return n
+
+# 날짜(또는 장부) 변경 시 DB에서 로드(불러온 시점의 버전도 함께 보관 → 저장 시 충돌 감지)
 state_date_key = "in_selected_date"
-if st.session_state.get(state_date_key) != selected_date.isoformat():
-    inc, exp = fetch_day(selected_date)
-    st.session_state["in_income_work"] = _ensure_rows(inc, INCOME_COLS)
-    st.session_state["in_expense_work"] = _ensure_rows(exp, EXPENSE_COLS)
-    st.session_state[state_date_key] = selected_date.isoformat()
+work_key = f"{current_ledger()}_{selected_date.isoformat()}"
+owner = session_owner()
+autosave_key = (owner, current_ledger(), selected_date.isoformat())
+if st.session_state.get(state_date_key) != work_key:
+    # 이전 날짜의 대기 중인 자동 저장을 먼저 반영
+    autosave_queue.flush_owner(owner)
+    st.session_state["in_loaded_version"] = fetch_day_version(selected_date)
+    inc, exp = fetch_day(selected_date, with_uid=True)
+    st.session_state["in_income_work"] = _ensure_rows(inc, INCOME_WORK_COLS)
+    st.session_state["in_expense_work"] = _ensure_rows(exp, EXPENSE_WORK_COLS)
+    st.session_state["in_submitted_sig"] = _sig(st.session_state["in_income_work"], st.session_state["in_expense_work"])
+    st.session_state["in_history"] = load_history(selected_date)
+    st.session_state[state_date_key] = work_key
+    st.session_state.pop("in_conflict", None)
+    autosave_queue.discard(autosave_key)
+
+# 자동 저장 결과 반영(저장 후 버전, 충돌)
+autosave_status = autosave_queue.status(autosave_key)
+if autosave_status is not None:
+    if autosave_status.version is not None:
+        st.session_state["in_loaded_version"] = autosave_status.version
+    if autosave_status.state == "conflict":
+        st.session_state["in_conflict"] = autosave_status.message
+
+# 마감된 기간이면 보기만 가능(편집/저장 막음)
+closed_period = closed_period_of(selected_date)
+if closed_period:
+    st.info(f"🔒 {closed_period} 기간은 마감되어 수정할 수 없습니다. (보고 화면의 '기간 마감'에서 해제)")
 
 # 현재 작업 DF
-income_df = st.session_state.get("in_income_work", pd.DataFrame(columns=INCOME_COLS))
-expense_df = st.session_state.get("in_expense_work", pd.DataFrame(columns=EXPENSE_COLS))
-income_df = _ensure_rows(income_df, INCOME_COLS)
-expense_df = _ensure_rows(expense_df, EXPENSE_COLS)
+income_df = st.session_state.get("in_income_work", pd.DataFrame(columns=INCOME_WORK_COLS))
+expense_df = st.session_state.get("in_expense_work", pd.DataFrame(columns=EXPENSE_WORK_COLS))
+income_df = _ensure_rows(income_df, INCOME_WORK_COLS)
+expense_df = _ensure_rows(expense_df, EXPENSE_WORK_COLS)
 
 income_total = float(pd.to_numeric(income_df["금액"], errors="coerce").fillna(0).sum())
 expense_total = float(pd.to_numeric(expense_df["금액"], errors="coerce").fillna(0).sum())
@@ -76,11 +133,12 @@ left, right = st.columns(2, gap="large")
 
 def _append_row(which: str):
     key = "in_income_work" if which == "income" else "in_expense_work"
-    cols = INCOME_COLS if which == "income" else EXPENSE_COLS
+    cols = INCOME_WORK_COLS if which == "income" else EXPENSE_WORK_COLS
     df = st.session_state.get(key, pd.DataFrame(columns=cols)).copy()
     df = _ensure_rows(df, cols)
     # 맨 끝에 1행 추가
     row = {c: None for c in cols}
+    row["uid"] = uuid.uuid4().hex
     row["날짜"] = selected_date
     df.loc[len(df)] = row
     st.session_state[key] = df
@@ -89,7 +147,7 @@ def _append_row(which: str):
 with left:
     st.markdown('<div class="section-title">일별 헌금 수입 명세서</div>', unsafe_allow_html=True)
     st.metric("합계 금액", f"₩{income_total:,.0f}")
-    st.button("➕ 수입 행 추가(날짜 자동)", key="add_income_row", on_click=_append_row, args=("income",), width="stretch")
+    st.button("➕ 수입 행 추가(날짜 자동)", key="add_income_row", on_click=_append_row, args=("income",), width="stretch", disabled=bool(closed_period))
 
     edited_income = st.data_editor(
         income_df,
@@ -97,20 +155,22 @@ with left:
         width="stretch",
         hide_index=True,
         column_config={
+            "uid": None,
             "날짜": st.column_config.DateColumn("날짜", format="YYYY-MM-DD"),
             "적요": st.column_config.SelectboxColumn("적요", options=USAGE_OPTIONS),
-            "수입항목": st.column_config.SelectboxColumn("수입항목", options=INCOME_ITEMS),
+            "수입항목": st.column_config.SelectboxColumn("수입항목", options=item_names("income")),
             "수입내역": st.column_config.TextColumn("수입내역"),
             "금액": st.column_config.NumberColumn("금액(원)", min_value=0, step=1, format="accounting"),
             "비고": st.column_config.TextColumn("비고"),
         },
-        key=f"income_editor_{selected_date.isoformat()}",
+        key=f"income_editor_{work_key}",
+        disabled=bool(closed_period),
     )
 
 with right:
     st.markdown('<div class="section-title">일별 헌금 지출 명세서</div>', unsafe_allow_html=True)
     st.metric("합계 금액", f"₩{expense_total:,.0f}")
-    st.button("➕ 지출 행 추가(날짜 자동)", key="add_expense_row", on_click=_append_row, args=("expense",), width="stretch")
+    st.button("➕ 지출 행 추가(날짜 자동)", key="add_expense_row", on_click=_append_row, args=("expense",), width="stretch", disabled=bool(closed_period))
 
     edited_expense = st.data_editor(
         expense_df,
@@ -118,40 +178,153 @@ with right:
         width="stretch",
         hide_index=True,
         column_config={
+            "uid": None,
             "날짜": st.column_config.DateColumn("날짜", format="YYYY-MM-DD"),
             "적요": st.column_config.SelectboxColumn("적요", options=USAGE_OPTIONS),
-            "지출항목": st.column_config.SelectboxColumn("지출항목", options=EXPENSE_ITEMS),
+            "지출항목": st.column_config.SelectboxColumn("지출항목", options=item_names("expense")),
             "지출내역": st.column_config.TextColumn("지출내역"),
             "금액": st.column_config.NumberColumn("금액(원)", min_value=0, step=1, format="accounting"),
             "비고": st.column_config.TextColumn("비고"),
         },
-        key=f"expense_editor_{selected_date.isoformat()}",
+        key=f"expense_editor_{work_key}",
+        disabled=bool(closed_period),
     )
 
-# 편집 결과 반영(저장은 수동)
-edited_income = _ensure_rows(edited_income.copy(), INCOME_COLS)
-edited_expense = _ensure_rows(edited_expense.copy(), EXPENSE_COLS)
+# 편집 결과 반영
+edited_income = _ensure_rows(edited_income.copy(), INCOME_WORK_COLS)
+edited_expense = _ensure_rows(edited_expense.copy(), EXPENSE_WORK_COLS)
 
 st.session_state["in_income_work"] = edited_income
 st.session_state["in_expense_work"] = edited_expense
 
+# 지난주/작년 같은 주일과 항목별 비교(비교 날짜 합계는 날짜를 고를 때 한 번만 읽어 둠 → 입력 중에는 DB 조회 없음)
+history = st.session_state.get("in_history")
+if history is None or history.d != selected_date:
+    history = st.session_state["in_history"] = load_history(selected_date)
+with st.expander(f"📈 비교: 지난주({history.last_week.isoformat()}) · 작년({history.last_year.isoformat()})", expanded=True):
+    h_left, h_right = st.columns(2, gap="large")
+    for col, kind, df in ((h_left, "income", edited_income), (h_right, "expense", edited_expense)):
+        table = compare_table(history, kind, df)
+        if table.empty:
+            col.caption("비교할 내역이 없습니다.")
+            continue
+        for c in ("이번", "지난주", "작년"):
+            table[c] = table[c].apply(lambda v: f"₩{v:,.0f}" if v else "")
+        col.dataframe(table, width="stretch", hide_index=True)
+
+# 바뀐 내용은 자동 저장 대기열로(연속 입력은 날짜별로 합쳐 한 번에 저장). 충돌 중/마감 기간에는 보류
+edited_sig = _sig(edited_income, edited_expense)
+if edited_sig != st.session_state.get("in_submitted_sig") and not st.session_state.get("in_conflict") and not closed_period:
+    autosave_queue.submit(
+        autosave_key, current_ledger(), selected_date, edited_income, edited_expense,
+        actor=current_user(), expected_version=st.session_state.get("in_loaded_version"),
+    )
+    st.session_state["in_submitted_sig"] = edited_sig
+    # 날짜를 바꾼 행이 있으면 기다리지 않고 바로 저장해 옮긴 뒤, 다음 편집이 들어오기 전에 표에서 뺌
+    if _moved_rows(edited_income).any() or _moved_rows(edited_expense).any():
+        if not autosave_queue.flush([autosave_key]):
+            st.warning("날짜를 바꾼 행을 아직 저장하는 중입니다. 저장이 끝나면 표에서 빠집니다.")
+        status = autosave_queue.status(autosave_key)
+        if status is not None and status.state == "saved":
+            st.session_state["in_loaded_version"] = status.version
+            n_moved = _drop_moved_rows()
+            st.toast(f"{n_moved}개 행을 바꾼 날짜로 옮겼습니다.", icon="📅")
+            st.rerun()
+
 st.divider()
 
 # 저장/다운로드
 c1, c2 = st.columns([1, 1], gap="small")
 
-def _save_now():
-    try:
-        save_day(selected_date, st.session_state["in_income_work"], st.session_state["in_expense_work"])
+def _save_now(force: bool = False):
+    income = st.session_state["in_income_work"]
+    expense = st.session_state["in_expense_work"]
+    if force:
+        # 덮어쓰기: 대기 중인 자동 저장을 버리고 버전 확인 없이 바로 저장
+        autosave_queue.discard(autosave_key)
+        try:
+            st.session_state["in_loaded_version"] = save_day(selected_date, income, expense, actor=current_user())
+            st.session_state.pop("in_conflict", None)
+            st.session_state["in_submitted_sig"] = _sig(income, expense)
+            _drop_moved_rows()
+            st.toast("저장 완료", icon="💾")
+        except Exception as e:
+            st.error("저장 중 오류가 발생했습니다.")
+            st.caption(str(e))
+        return
+
+    # 지금 저장: 대기열에 넣고 바로 반영될 때까지 기다림
+    autosave_queue.submit(
+        autosave_key, current_ledger(), selected_date, income, expense,
+        actor=current_user(), expected_version=st.session_state.get("in_loaded_version"),
+    )
+    st.session_state["in_submitted_sig"] = _sig(income, expense)
+    if not autosave_queue.flush([autosave_key]):
+        # 시간 안에 끝나지 않음(DB 잠김 등): 대기열에 남아 있으므로 자동 저장 상태 표시로 이어서 안내
+        st.warning("저장이 아직 끝나지 않았습니다. 계속 저장을 시도하며, 아래 저장 상태가 '자동 저장됨'으로 바뀌면 완료입니다.")
+        return
+    status = autosave_queue.status(autosave_key)
+    if status is None or status.state == "saved":
+        if status is not None:
+            st.session_state["in_loaded_version"] = status.version
+        st.session_state.pop("in_conflict", None)
+        _drop_moved_rows()
         st.toast("저장 완료", icon="💾")
-    except Exception as e:
+    elif status.state == "conflict":
+        st.session_state["in_conflict"] = status.message
+    else:
         st.error("저장 중 오류가 발생했습니다.")
-        st.caption(str(e))
+        st.caption(status.message)
+
+def _reload_from_db():
+    # 내 수정 내용을 버리고 DB의 최신 내용으로 다시 불러오기(편집기 상태도 초기화)
+    autosave_queue.discard(autosave_key)
+    st.session_state.pop(state_date_key, None)
+    st.session_state.pop("in_conflict", None)
+    st.session_state.pop(f"income_editor_{work_key}", None)
+    st.session_state.pop(f"expense_editor_{work_key}", None)
+
+c1.button("지금 저장", key="save_now_btn", on_click=_save_now, width="stretch", disabled=bool(closed_period))
 
-c1.button("지금 저장", key="save_now_btn", on_click=_save_now, width="stretch")
+def _show_autosave_status():
+    status = autosave_queue.status(autosave_key)
+    if status is None:
+        return
+    if status.state == "pending":
+        c1.caption("⏳ 입력을 멈추면 자동 저장합니다…")
+    elif status.state == "saving":
+        c1.caption("💾 저장 중…")
+    elif status.state == "saved":
+        c1.caption(f"✅ 자동 저장됨 ({time.strftime('%H:%M:%S', time.localtime(status.at))})")
+    elif status.state == "conflict":
+        if not st.session_state.get("in_conflict"):
+            st.rerun()  # 충돌 안내를 표시하도록 페이지 전체 다시 실행
+    else:
+        c1.caption(f"⚠️ 자동 저장 실패: {status.message}")
+
+# 저장 대기/진행 중일 때만 1초마다 상태 갱신
+_busy = autosave_queue.status(autosave_key)
+st.fragment(run_every=1.0 if _busy is not None and _busy.state in ("pending", "saving") else None)(_show_autosave_status)()
+
+if st.session_state.get("in_conflict"):
+    st.warning(
+        "다른 사용자가 먼저 이 날짜의 장부를 저장했습니다. 그대로 저장하면 상대방의 수정 내용을 덮어씁니다.\n\n"
+        + st.session_state["in_conflict"],
+        icon="⚠️",
+    )
+    k1, k2 = st.columns(2, gap="small")
+    k1.button("최신 내용 다시 불러오기(내 수정 취소)", key="conflict_reload_btn", on_click=_reload_from_db, width="stretch")
+    k2.button("내 내용으로 덮어쓰기", key="conflict_force_btn", on_click=_save_now, args=(True,), type="primary", width="stretch")
 
 try:
-    day_xlsx = export_day_xlsx(selected_date, st.session_state["in_income_work"], st.session_state["in_expense_work"])
+    # 엑셀은 버튼을 눌렀을 때 만듦(별도 스레드에서 실행되므로 교회 이름은 미리 넘김)
+    day_xlsx = partial(
+        export_day_xlsx,
+        selected_date,
+        st.session_state["in_income_work"][INCOME_COLS],
+        st.session_state["in_expense_work"][EXPENSE_COLS],
+        church_name=current_church_name(),
+    )
     c2.download_button(
         "선택한 날짜 장부 다운로드 (.xlsx)",
         data=day_xlsx,
@@ -163,3 +336,69 @@ try:
 except Exception as e:
     st.warning("선택한 날짜의 엑셀 파일을 만들지 못했습니다.")
     st.caption(str(e))
+
+# 영수증 첨부(저장된 행에만): 화면에는 썸네일만 표시하고 원본은 다운로드할 때 읽음
+# 저장된 행/첨부 목록은 날짜를 고르거나 저장(버전 변경)/첨부/삭제할 때만 읽어 둠 → 입력 중에는 DB 조회 없음
+att_state_key = (work_key, st.session_state.get("in_loaded_version"))
+att_state = st.session_state.get("in_attachments")
+if att_state is None or att_state["key"] != att_state_key:
+    att_state = st.session_state["in_attachments"] = {
+        "key": att_state_key,
+        "rows": {k: fetch_day_rows(k, selected_date) for k in ("expense", "income")},
+        "attachments": day_attachments(selected_date),
+    }
+with st.expander("🧾 영수증 첨부"):
+    day_rows = att_state["rows"]
+
+    def _row_label(kind: str, r) -> str:
+        item_col, detail_col = KIND_COLS[kind]
+        amount = "" if pd.isna(r["금액"]) else f"₩{r['금액']:,.0f}"
+        return " · ".join(str(v) for v in (r[item_col], r[detail_col], amount) if v and not pd.isna(v))
+
+    row_labels = {(k, int(r["id"])): _row_label(k, r) for k, df in day_rows.items() for _, r in df.iterrows()}
+
+    a1, a2, a3 = st.columns([1, 2, 2], gap="small")
+    att_kind = {"지출": "expense", "수입": "income"}[a1.radio("구분", ["지출", "수입"], horizontal=True, key="att_kind")]
+    row_ids = day_rows[att_kind]["id"].astype(int).tolist()
+    if not row_ids:
+        a2.info("이 날짜에 저장된 행이 없습니다. 행을 저장한 뒤 첨부할 수 있습니다.")
+    else:
+        att_row = a2.selectbox(
+            "첨부할 행", row_ids, format_func=lambda i: row_labels.get((att_kind, i), str(i)), key=f"att_row_{att_kind}"
+        )
+        nonce = st.session_state.get("att_nonce", 0)
+        upload = a3.file_uploader("영수증 파일(사진/스캔/PDF)", type=UPLOAD_TYPES, key=f"att_file_{nonce}")
+        if st.button("첨부", key="att_add_btn", disabled=upload is None, width="stretch"):
+            try:
+                attach(att_kind, att_row, upload, upload.name, upload.type, actor=current_user())
+                st.session_state["att_nonce"] = nonce + 1  # 파일 선택 초기화
+                st.session_state.pop("in_attachments", None)
+                st.toast("첨부 완료", icon="🧾")
+                st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+
+    attachments = att_state["attachments"]
+    if attachments:
+        grid = st.columns(4, gap="small")
+        for i, a in enumerate(attachments):
+            with grid[i % 4]:
+                thumb = thumbnail(a["sha256"])
+                if thumb:
+                    st.image(thumb)
+                else:
+                    st.markdown("### 📄")
+                label = row_labels.get((a["kind"], a["row_id"]), "")
+                st.caption(f"{KIND_LABELS[a['kind']]} · {label}\n\n{a['filename']} ({a['size'] / 1024:,.0f} KB)")
+                st.download_button(
+                    "원본 받기",
+                    data=partial(read_blob, a["sha256"]),
+                    file_name=a["filename"] or a["sha256"],
+                    mime=a["mime"] or "application/octet-stream",
+                    key=f"att_dl_{a['id']}",
+                    width="stretch",
+                )
+                if st.button("첨부 삭제", key=f"att_del_{a['id']}", width="stretch"):
+                    remove_attachment(a["id"])
+                    st.session_state.pop("in_attachments", None)
+                    st.rerun()
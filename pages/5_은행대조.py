@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+from functools import partial
+import pandas as pd
+import streamlit as st
+
+from utils.ui import apply_global_style, render_header, render_top_nav
+from utils.auth import require_login
+from utils.exporter import export_tables_xlsx
+from utils.reconcile import DEFAULT_WINDOW_DAYS, reconcile_file, result_tables
+
+st.set_page_config(page_title="은행 대조", page_icon="🏦", layout="wide", initial_sidebar_state="collapsed")
+apply_global_style()
+render_top_nav("은행 대조")
+render_header("은행 대조", "은행에서 내려받은 거래내역 파일을 장부의 '은행' 행과 맞춰 봅니다.")
+
+if not require_login():
+    st.stop()
+
+# 기본 기간: 지난달
+today = dt.date.today()
+last_month_end = today.replace(day=1) - dt.timedelta(days=1)
+c1, c2, c3 = st.columns([1, 1, 1], gap="small")
+start = c1.date_input("시작일", value=last_month_end.replace(day=1), key="rc_start")
+end = c2.date_input("종료일", value=last_month_end, key="rc_end")
+window = c3.number_input(
+    "날짜 허용 차이(일)", min_value=0, max_value=14, value=DEFAULT_WINDOW_DAYS, step=1, key="rc_window",
+    help="통장 날짜와 장부 날짜가 이 일수 이내로 어긋나도 같은 거래로 봅니다(주일 헌금을 월요일에 입금하는 경우 등).",
+)
+
+uploaded = st.file_uploader(
+    "거래내역 파일(CSV 또는 xlsx)",
+    type=["csv", "xlsx"],
+    key="rc_file",
+    help="날짜, 입금/출금(또는 금액), 적요/내용 컬럼이 있으면 됩니다. 위쪽의 계좌 정보 줄은 자동으로 건너뜁니다.",
+)
+
+if start > end:
+    st.warning("시작일이 종료일보다 늦습니다.")
+    st.stop()
+if uploaded is None:
+    st.info("거래내역 파일을 올리면 대조 결과가 표시됩니다.")
+    st.stop()
+
+try:
+    uploaded.seek(0)
+    result = reconcile_file(uploaded, uploaded.name, start, end, int(window))
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+
+tables = result_tables(result)
+m = st.columns(4, gap="small")
+m[0].metric("일치", f"{len(result.matched):,}건")
+m[1].metric("확인 필요", f"{len(result.ambiguous):,}건")
+m[2].metric("통장에만 있음", f"{len(result.unmatched_statement):,}건")
+m[3].metric("장부에만 있음", f"{len(result.unmatched_ledger):,}건")
+if result.skipped:
+    st.caption(f"기간 밖의 통장 거래 {result.skipped:,}건은 제외했습니다.")
+
+def _disp(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    out["금액"] = out["금액"].apply(lambda v: f"₩{v:,.0f}")
+    return out
+
+tabs = st.tabs(["확인 필요", "통장에만 있음", "장부에만 있음", "일치"])
+for tab, name, empty_msg in (
+    (tabs[0], "확인 필요", "날짜가 앞뒤로 같은 거리인 후보가 있어 확인이 필요한 거래가 없습니다."),
+    (tabs[1], "통장에만", "통장에만 있는 거래가 없습니다."),
+    (tabs[2], "장부에만", "장부에만 있는 '은행' 행이 없습니다."),
+    (tabs[3], "일치", "일치한 거래가 없습니다."),
+):
+    with tab:
+        if tables[name].empty:
+            st.info(empty_msg)
+        else:
+            st.dataframe(_disp(tables[name]), width="stretch", hide_index=True)
+
+# 엑셀 다운로드
+try:
+    xlsx = partial(
+        export_tables_xlsx,
+        filename_prefix=f"은행대조_{start.isoformat()}_{end.isoformat()}",
+        sheets=tables,
+        money_columns=["금액"],
+    )
+    st.download_button(
+        "대조 결과 다운로드 (.xlsx)",
+        data=xlsx,
+        file_name=f"은행대조_{start.isoformat()}_{end.isoformat()}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        width="stretch",
+        key="rc_dl",
+    )
+except Exception as e:
+    st.warning("엑셀 파일을 만들지 못했습니다.")
+    st.caption(str(e))
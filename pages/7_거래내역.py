@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import datetime as dt
+import pandas as pd
+import streamlit as st
+
+from utils.ui import apply_global_style, render_header, render_top_nav
+from utils.auth import require_login
+from utils.storage import fetch_page, item_names
+
+KIND_OPTIONS = {"수입": "income", "지출": "expense"}
+ALL = "(전체)"
+PAGE_SIZES = [50, 100, 200]
+
+st.set_page_config(page_title="거래 내역", page_icon="🔎", layout="wide", initial_sidebar_state="collapsed")
+apply_global_style()
+render_top_nav("거래 내역")
+render_header("거래 내역", "기간/항목/적요/금액/검색어로 장부 행을 찾아 페이지 단위로 봅니다.")
+
+if not require_login():
+    st.stop()
+
+# 필터
+f1, f2, f3, f4 = st.columns([1, 1, 1, 1], gap="small")
+kind_label = f1.radio("구분", list(KIND_OPTIONS), horizontal=True, key="tx_kind")
+kind = KIND_OPTIONS[kind_label]
+today = dt.date.today()
+start = f2.date_input("시작일", value=dt.date(today.year, 1, 1), key="tx_start")
+end = f3.date_input("종료일", value=today, key="tx_end")
+newest_first = f4.checkbox("최신순", value=True, key="tx_desc")
+
+g1, g2, g3, g4, g5 = st.columns([1, 1, 1, 1, 1.5], gap="small")
+item = g1.selectbox("항목", [ALL] + item_names(kind), key=f"tx_item_{kind}")
+usage = g2.selectbox("적요", [ALL, "현금", "은행"], key="tx_usage")
+min_amount = g3.number_input("최소 금액", min_value=0, value=0, step=1000, key="tx_min", help="0이면 제한 없음")
+max_amount = g4.number_input("최대 금액", min_value=0, value=0, step=1000, key="tx_max", help="0이면 제한 없음")
+text = g5.text_input("검색어(내역/비고)", key="tx_text").strip()
+page_size = st.selectbox("페이지당 행 수", PAGE_SIZES, index=1, key="tx_page_size")
+
+if start > end:
+    st.warning("시작일이 종료일보다 늦습니다.")
+    st.stop()
+
+filters = dict(
+    start_date=start,
+    end_date=end,
+    item=None if item == ALL else item,
+    usage=None if usage == ALL else usage,
+    min_amount=min_amount or None,
+    max_amount=max_amount or None,
+    text=text or None,
+    descending=newest_first,
+)
+
+# 페이지 위치: 각 페이지 시작 커서(직전 페이지 마지막 행의 (날짜, id))를 쌓아 둠 → 이전 페이지로 돌아갈 수 있음
+# 필터가 바뀌면 첫 페이지부터
+sig = (kind, tuple(sorted((k, str(v)) for k, v in filters.items())), page_size)
+if st.session_state.get("tx_sig") != sig:
+    st.session_state["tx_sig"] = sig
+    st.session_state["tx_cursors"] = [None]
+cursors = st.session_state["tx_cursors"]
+
+# 다음 페이지가 있는지 알기 위해 1행 더 읽음
+df = fetch_page(kind, after=cursors[-1], limit=page_size + 1, **filters)
+has_next = len(df) > page_size
+df = df.head(page_size)
+
+def _next_page(after):
+    st.session_state["tx_cursors"].append(after)
+
+def _prev_page():
+    if len(st.session_state["tx_cursors"]) > 1:
+        st.session_state["tx_cursors"].pop()
+
+page_no = len(cursors)
+if df.empty:
+    st.info("조건에 맞는 거래가 없습니다." if page_no == 1 else "더 이상 거래가 없습니다.")
+else:
+    shown = f"{(page_no - 1) * page_size + 1:,} ~ {(page_no - 1) * page_size + len(df):,}번째"
+    st.caption(f"{page_no}페이지 · {shown} 행 · 이 페이지 합계 ₩{pd.to_numeric(df['금액'], errors='coerce').fillna(0).sum():,.0f}")
+    disp = df.drop(columns=["id"]).copy()
+    disp["금액"] = disp["금액"].apply(lambda v: "" if pd.isna(v) else f"₩{v:,.0f}")
+    st.dataframe(disp, width="stretch", hide_index=True)
+
+last = df.iloc[-1] if not df.empty else None
+n1, n2 = st.columns(2, gap="small")
+n1.button("◀ 이전 페이지", key="tx_prev", on_click=_prev_page, disabled=page_no == 1, width="stretch")
+n2.button(
+    "다음 페이지 ▶",
+    key="tx_next",
+    on_click=_next_page,
+    args=((last["날짜"].isoformat(), int(last["id"])) if last is not None else None,),
+    disabled=not has_next,
+    width="stretch",
+)
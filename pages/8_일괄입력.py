@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import uuid
+import datetime as dt
+import calendar
+import pandas as pd
+import streamlit as st
+
+from utils.ui import apply_global_style, render_header, render_top_nav
+from utils.auth import require_login, current_user
+from utils.storage import (
+    fetch_range, fetch_day_versions, save_days, item_names, closed_periods, calendar_day,
+    SaveConflictError, PeriodClosedError, INCOME_COLS, EXPENSE_COLS,
+)
+from utils.tenants import current_ledger
+from utils.autosave import queue as autosave_queue, session_owner
+
+USAGE_OPTIONS = ["은행", "현금"]
+PERIOD_OPTIONS = ["주(주일~토요일)", "월"]
+
+BLANK_ROWS = 30  # 엑셀 복붙용 빈 행
+
+st.set_page_config(page_title="일괄 입력", page_icon="🗓️", layout="wide", initial_sidebar_state="collapsed")
+apply_global_style()
+render_top_nav("일괄 입력")
+render_header("일괄 입력", "한 주 또는 한 달의 수입/지출을 한 표에서 입력합니다. 각 행은 자기 '날짜'의 장부로 저장됩니다.")
+
+if not require_login():
+    st.stop()
+
+def _period_range(d: dt.date, period: str) -> tuple[dt.date, dt.date]:
+    if period == "월":
+        return d.replace(day=1), d.replace(day=calendar.monthrange(d.year, d.month)[1])
+    # 주는 calendar 테이블의 주(주일~토요일, 달이 바뀌는 주는 기준 날짜가 속한 달 쪽만)
+    day = calendar_day(d)
+    return day["week_start"], day["week_end"]
+
+p1, p2 = st.columns([1, 1], gap="small")
+period = p1.radio("기간", PERIOD_OPTIONS, horizontal=True, key="bt_period")
+anchor = p2.date_input("기준 날짜", value=dt.date.today(), key="bt_anchor", help="이 날짜가 속한 주(주일~토요일, 달이 바뀌는 주는 이 날짜의 달 쪽만) 또는 달을 입력합니다.")
+start, end = _period_range(anchor, period)
+st.caption(f"입력 범위: {start.isoformat()} ~ {end.isoformat()}")
+
+def _with_blank_rows(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    """
+    불러온 행 뒤에 빈 행을 붙이고 금액을 숫자로 맞춥니다.
+    맨 앞 uid(숨김 컬럼)는 빈 행에도 미리 붙여 둠 → 저장 후 다시 고쳐 저장해도 같은 행으로 저장
+    """
+    cols = ["uid"] + cols
+    df = (df if df is not None else pd.DataFrame(columns=cols)).reindex(columns=cols)
+    df["금액"] = pd.to_numeric(df["금액"], errors="coerce")
+    df = df.reset_index(drop=True).reindex(range(len(df) + BLANK_ROWS))
+    df["uid"] = [u if isinstance(u, str) and u else uuid.uuid4().hex for u in df["uid"]]
+    return df
+
+# 범위(또는 장부)가 바뀌면 DB에서 로드(날짜별 버전도 보관 → 저장 시 충돌 감지)
+work_key = f"{current_ledger()}_{start.isoformat()}_{end.isoformat()}"
+if st.session_state.get("bt_work_key") != work_key:
+    # 날짜별 입력 화면에서 대기 중인 자동 저장을 먼저 반영
+    autosave_queue.flush_owner(session_owner())
+    st.session_state["bt_versions"] = fetch_day_versions(start, end)
+    inc, exp = fetch_range(start, end, with_uid=True)
+    st.session_state["bt_income_work"] = _with_blank_rows(inc, INCOME_COLS)
+    st.session_state["bt_expense_work"] = _with_blank_rows(exp, EXPENSE_COLS)
+    st.session_state["bt_nonce"] = st.session_state.get("bt_nonce", 0) + 1  # 편집기 상태 초기화
+    st.session_state["bt_work_key"] = work_key
+    st.session_state.pop("bt_conflict", None)
+editor_key = f"{work_key}_{st.session_state['bt_nonce']}"
+
+# 범위에 마감된 기간이 있으면 안내(그 날짜의 내용이 바뀌면 저장이 거부됨)
+closed = [c["period"] for c in closed_periods() if c["start"] <= end and c["end"] >= start]
+if closed:
+    st.info(f"🔒 마감된 기간({', '.join(closed)})이 포함되어 있습니다. 그 기간의 날짜는 수정해도 저장되지 않습니다.")
+
+def _column_config(kind: str) -> dict:
+    item_col, detail_col = ("수입항목", "수입내역") if kind == "income" else ("지출항목", "지출내역")
+    return {
+        "uid": None,
+        "날짜": st.column_config.DateColumn("날짜", format="YYYY-MM-DD", min_value=start, max_value=end),
+        "적요": st.column_config.SelectboxColumn("적요", options=USAGE_OPTIONS),
+        item_col: st.column_config.SelectboxColumn(item_col, options=item_names(kind)),
+        detail_col: st.column_config.TextColumn(detail_col),
+        "금액": st.column_config.NumberColumn("금액(원)", min_value=0, step=1, format="accounting"),
+        "비고": st.column_config.TextColumn("비고"),
+    }
+
+def _day_totals(income: pd.DataFrame, expense: pd.DataFrame) -> pd.DataFrame:
+    """날짜별 수입/지출 합계(입력 확인용)"""
+    def by_day(df: pd.DataFrame) -> pd.Series:
+        df = df.dropna(subset=["날짜"])
+        return pd.to_numeric(df["금액"], errors="coerce").fillna(0).groupby(df["날짜"]).sum()
+
+    out = pd.concat([by_day(income).rename("수입"), by_day(expense).rename("지출")], axis=1).fillna(0).sort_index()
+    return out[(out["수입"] != 0) | (out["지출"] != 0)]
+
+tab_in, tab_ex = st.tabs(["수입", "지출"])
+with tab_in:
+    edited_income = st.data_editor(
+        st.session_state["bt_income_work"],
+        num_rows="dynamic",
+        width="stretch",
+        hide_index=True,
+        column_config=_column_config("income"),
+        key=f"bt_income_editor_{editor_key}",
+    )
+with tab_ex:
+    edited_expense = st.data_editor(
+        st.session_state["bt_expense_work"],
+        num_rows="dynamic",
+        width="stretch",
+        hide_index=True,
+        column_config=_column_config("expense"),
+        key=f"bt_expense_editor_{editor_key}",
+    )
+
+totals = _day_totals(edited_income, edited_expense)
+if not totals.empty:
+    with st.expander(f"날짜별 합계 (수입 ₩{totals['수입'].sum():,.0f} · 지출 ₩{totals['지출'].sum():,.0f})"):
+        disp = totals.reset_index().rename(columns={"index": "날짜"})
+        for c in ("수입", "지출"):
+            disp[c] = disp[c].apply(lambda v: f"₩{v:,.0f}")
+        st.dataframe(disp, width="stretch", hide_index=True)
+
+st.divider()
+
+def _reload():
+    # 내 수정 내용을 버리고 DB의 최신 내용으로 다시 불러오기
+    st.session_state.pop("bt_work_key", None)
+
+c1, c2 = st.columns([1, 1], gap="small")
+if c1.button("범위 전체 저장", key="bt_save_btn", type="primary", width="stretch"):
+    before = st.session_state["bt_versions"]
+    try:
+        after = save_days(
+            start, end, edited_income, edited_expense,
+            actor=current_user(), expected_versions=before,
+        )
+    except SaveConflictError as e:
+        st.session_state["bt_conflict"] = str(e)
+    except (PeriodClosedError, ValueError) as e:
+        st.error(str(e))
+    except Exception as e:
+        st.error("저장 중 오류가 발생했습니다.")
+        st.caption(str(e))
+    else:
+        st.session_state["bt_versions"] = after
+        changed = sorted(d for d, v in after.items() if before.get(d, 0) != v)
+        st.session_state.pop("bt_conflict", None)
+        st.toast(f"저장 완료 ({len(changed)}일 변경)" if changed else "바뀐 내용이 없습니다.", icon="💾")
+c2.button("DB에서 다시 불러오기", key="bt_reload_btn", on_click=_reload, width="stretch")
+
+if st.session_state.get("bt_conflict"):
+    st.warning(
+        f"⚠️ {st.session_state['bt_conflict']}\n\n"
+        "'DB에서 다시 불러오기'로 최신 내용을 불러온 뒤 다시 입력해 주세요."
+    )
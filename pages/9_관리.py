@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+import json
+import datetime as dt
+from functools import partial
+import pandas as pd
+import streamlit as st
+
+from utils.ui import apply_global_style, render_header, render_top_nav
+from utils.auth import require_login, current_user
+from utils.storage import (
+    fetch_changes, load_categories, add_category, set_category_flags, donor_year_totals, closed_periods, reopen_period,
+)
+from utils.backup import create_backup, list_backups, prune_backups, verify_backup
+from utils.maintenance import db_stats, run_maintenance, maintenance_history, INTERVAL_DAYS
+from utils.tenants import add_ledger, list_ledgers, current_ledger
+from utils.receipts import receipts_zip_bytes
+from utils import querylog
+from utils import sync
+
+KIND_LABELS = {"income": "수입", "expense": "지출"}
+OP_LABELS = {"insert": "추가", "update": "수정", "delete": "삭제"}
+TRIGGER_LABELS = {"manual": "수동", "schedule": "정기", "cli": "명령줄"}
+FIELD_LABELS = {"d": "날짜", "usage": "적요", "item": "항목", "detail": "내역", "amount": "금액", "note": "비고"}
+
+st.set_page_config(page_title="관리", page_icon="🛠️", layout="wide", initial_sidebar_state="collapsed")
+apply_global_style()
+render_top_nav("관리")
+render_header("관리", "장부 변경 이력 등 관리용 정보를 확인합니다.")
+
+if not require_login():
+    st.stop()
+
+def _fmt_row(js) -> str:
+    """이력 JSON을 '항목: 값' 형태의 한 줄 문자열로 변환"""
+    if js is None or (isinstance(js, float) and pd.isna(js)):
+        return ""
+    try:
+        row = json.loads(js)
+    except Exception:
+        return str(js)
+    parts = []
+    for k, label in FIELD_LABELS.items():
+        v = row.get(k)
+        if v is None:
+            continue
+        if k == "amount":
+            v = f"₩{float(v):,.0f}"
+        parts.append(f"{label}: {v}")
+    return ", ".join(parts)
+
+st.markdown('<div class="section-title">변경 이력</div>', unsafe_allow_html=True)
+
+today = dt.date.today()
+c1, c2 = st.columns(2, gap="small")
+hist_start = c1.date_input("시작일(장부 날짜)", value=today.replace(day=1), key="adm_hist_start")
+hist_end = c2.date_input("종료일(장부 날짜)", value=today, key="adm_hist_end")
+
+changes = fetch_changes(start_date=hist_start, end_date=hist_end)
+if changes.empty:
+    st.info("선택한 기간의 변경 이력이 없습니다.")
+else:
+    disp = pd.DataFrame({
+        "번호": changes["seq"],
+        "시각": changes["ts"],
+        "작성자": changes["actor"].fillna(""),
+        "구분": changes["kind"].map(KIND_LABELS).fillna(changes["kind"]),
+        "작업": changes["op"].map(OP_LABELS).fillna(changes["op"]),
+        "장부 날짜": changes["d"],
+        "변경 전": changes["old_json"].apply(_fmt_row),
+        "변경 후": changes["new_json"].apply(_fmt_row),
+    })
+    # 최근 변경이 위로 오도록
+    disp = disp.iloc[::-1].reset_index(drop=True)
+    st.caption(f"총 {len(disp):,}건")
+    st.dataframe(disp, width="stretch", hide_index=True)
+
+st.divider()
+st.markdown('<div class="section-title">백업</div>', unsafe_allow_html=True)
+st.caption("앱 실행 중에도 안전하게 DB 스냅샷을 만듭니다. 복원은 서버에서 `python -m utils.backup restore <파일>` 로 진행합니다.")
+
+if st.button("지금 백업", key="adm_backup_now", width="stretch"):
+    try:
+        path = create_backup()
+        prune_backups()
+        st.success(f"백업 완료: {path}")
+    except Exception as e:
+        st.error("백업 중 오류가 발생했습니다.")
+        st.caption(str(e))
+
+backups = list_backups()
+if not backups:
+    st.info("아직 백업이 없습니다.")
+else:
+    st.dataframe(
+        pd.DataFrame([
+            {"생성 시각": b["created"].strftime("%Y-%m-%d %H:%M:%S"), "크기(KB)": round(b["size"] / 1024, 1), "파일": b["name"]}
+            for b in backups
+        ]),
+        width="stretch",
+        hide_index=True,
+    )
+    sel = st.selectbox("검증할 백업", [b["name"] for b in backups], key="adm_backup_sel")
+    if st.button("선택한 백업 검증", key="adm_backup_verify", width="stretch"):
+        ok, msg = verify_backup(next(b["path"] for b in backups if b["name"] == sel))
+        if ok:
+            st.success("정상 백업입니다.")
+        else:
+            st.error(f"백업 파일에 문제가 있습니다: {msg}")
+
+st.divider()
+st.markdown('<div class="section-title">장부 동기화(사본 간)</div>', unsafe_allow_html=True)
+st.caption(
+    "다른 컴퓨터에 있는 장부 사본과 DB 파일 전체 대신 바뀐 행만 파일로 주고받습니다. "
+    "이쪽 변경은 파일로 내려받아 상대 사본에서 가져오고, 상대 사본에서 만든 파일은 여기서 가져옵니다. "
+    "명령줄: `python -m utils.sync`"
+)
+sync_node = sync.node_id()
+st.caption(f"이 사본 id: `{sync_node}`")
+NEW_PEER = "(처음 보내는 사본)"
+
+def _sync_export(peer) -> bytes:
+    return sync.export_changes(peer)[0]
+
+known_peers = sync.peers()
+y1, y2 = st.columns(2, gap="small")
+with y1:
+    target = st.selectbox("받을 사본", [p["node"] for p in known_peers] + [NEW_PEER], key="adm_sync_peer")
+    st.download_button(
+        "변경 파일 내려받기 (.json.gz)",
+        data=partial(_sync_export, None if target == NEW_PEER else target),
+        file_name=f"sync_{current_ledger()}_{sync_node}_{dt.datetime.now():%Y%m%d_%H%M}.json.gz",
+        mime="application/gzip",
+        width="stretch",
+        key=f"adm_sync_dl_{target}",
+    )
+with y2:
+    sync_file = st.file_uploader("상대 사본에서 만든 파일", type=["gz"], key="adm_sync_file")
+    if sync_file is not None and st.button("가져오기", key="adm_sync_import", width="stretch"):
+        try:
+            result = sync.import_changes(sync_file.getvalue(), actor=current_user())
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.success(
+                f"{result.received:,}행 중 반영 {result.applied:,} · 같음 {result.unchanged:,} · 충돌 {result.conflicts:,} "
+                f"(바뀐 날짜 {len(result.days)}일)"
+            )
+if known_peers:
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "사본 id": p["node"], "보낸 것 확인(seq)": p["acked_seq"], "받은 것(seq)": p["received_seq"],
+                "마지막 내보내기": p["last_export"] or "", "마지막 가져오기": p["last_import"] or "",
+            }
+            for p in known_peers
+        ]),
+        width="stretch",
+        hide_index=True,
+    )
+
+conflicts = sync.open_conflicts()
+if conflicts:
+    st.warning(f"양쪽 사본에서 함께 고친 행 {len(conflicts)}건이 반영되지 않았습니다. 남길 내용을 골라 주세요.")
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "번호": c["id"], "장부 날짜": c["d"], "구분": KIND_LABELS.get(c["kind"], c["kind"]), "이유": c["reason"],
+                "이쪽 내용": _fmt_row(json.dumps(c["local"], ensure_ascii=False)) if c["local"] else "(삭제됨)",
+                "상대 내용": _fmt_row(json.dumps(c["remote"], ensure_ascii=False)) if c["remote"] else "(삭제됨)",
+            }
+            for c in conflicts
+        ]),
+        width="stretch",
+        hide_index=True,
+    )
+    r1, r2, r3 = st.columns([1, 2, 1], gap="small")
+    conflict_id = r1.selectbox("번호", [c["id"] for c in conflicts], key="adm_sync_conflict")
+    keep = r2.radio(
+        "남길 내용", ["local", "remote"], horizontal=True, key="adm_sync_keep",
+        format_func={"local": "이쪽 내용(다음 내보내기 때 상대에 반영)", "remote": "상대 내용"}.get,
+    )
+    if r3.button("정리", key="adm_sync_resolve", width="stretch"):
+        try:
+            sync.resolve_conflict(conflict_id, keep, actor=current_user())
+            st.rerun()
+        except Exception as e:
+            st.error(str(e))
+
+st.divider()
+st.markdown('<div class="section-title">DB 정리</div>', unsafe_allow_html=True)
+st.caption(
+    f"통계 갱신(ANALYZE), 빈 공간 반납(VACUUM), WAL 체크포인트를 실행합니다. "
+    f"앱 실행 중에는 {INTERVAL_DAYS}일마다 자동으로 실행되며, 명령줄에서는 `python -m utils.maintenance run` 으로 실행합니다."
+)
+
+def _stats_table(stats: dict) -> dict:
+    unused, frag = stats["unused_pct"], stats["frag_pct"]
+    return {
+        "파일(KB)": round(stats["file_bytes"] / 1024, 1),
+        "WAL(KB)": round(stats["wal_bytes"] / 1024, 1),
+        "빈 페이지": f"{stats['freelist_count']:,}/{stats['page_count']:,} ({stats['free_pct']}%)",
+        "페이지 내 빈 공간": "-" if unused is None else f"{unused}%",
+        "조각화": "-" if frag is None else f"{frag}%",
+    }
+
+st.dataframe(pd.DataFrame([{"구분": "현재", **_stats_table(db_stats())}]), width="stretch", hide_index=True)
+m1, m2 = st.columns(2, gap="small")
+maint_full = m2.checkbox("전체 VACUUM(페이지 재배치, 시간이 더 걸림)", key="adm_maint_full")
+if m1.button("지금 정리", key="adm_maint_now", width="stretch"):
+    try:
+        result = run_maintenance(full=maint_full, actor=current_user())
+        saved = result["before"]["file_bytes"] - result["after"]["file_bytes"]
+        st.success(f"정리 완료({result['elapsed_sec']:.2f}초): 파일 크기 {saved / 1024:,.1f} KB 감소")
+    except Exception as e:
+        st.error("DB 정리 중 오류가 발생했습니다.")
+        st.caption(str(e))
+
+history = maintenance_history()
+if history:
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "시각": h["ts"],
+                "실행": TRIGGER_LABELS.get(h["trigger"], h["trigger"]),
+                "실행자": h["actor"] or "",
+                "작업": h["steps"],
+                "소요(초)": h["elapsed_sec"],
+                "파일 전(KB)": round(h["before"]["file_bytes"] / 1024, 1),
+                "파일 후(KB)": round(h["after"]["file_bytes"] / 1024, 1),
+                "빈 페이지 전(%)": h["before"]["free_pct"],
+                "빈 페이지 후(%)": h["after"]["free_pct"],
+                "조각화 전(%)": h["before"]["frag_pct"],
+                "조각화 후(%)": h["after"]["frag_pct"],
+            }
+            for h in history
+        ]),
+        width="stretch",
+        hide_index=True,
+    )
+
+st.divider()
+st.markdown('<div class="section-title">SQL 실행 기록</div>', unsafe_allow_html=True)
+st.caption(
+    "켜 두면 장부 DB 문장마다 실행 시간과 읽은 행 수를 모으고, 기준보다 오래 걸린 실행은 실행 계획(EXPLAIN QUERY PLAN)을 남깁니다. "
+    "기록은 서버 메모리에만 있고 재시작하면 비워집니다. 서버 시작 때부터 켜려면 `CHURCH_QUERY_LOG=1`."
+)
+q1, q2, q3 = st.columns([1, 1, 1], gap="small")
+ql_on = q1.toggle("기록 켜기", value=querylog.enabled(), key="adm_ql_on")
+if ql_on != querylog.enabled():
+    querylog.enable(ql_on)
+slow_ms = q2.number_input("느린 쿼리 기준(ms)", min_value=1, max_value=10000, value=int(querylog.SLOW_MS), step=10, key="adm_ql_slow")
+if slow_ms != querylog.SLOW_MS:
+    querylog.set_slow_ms(slow_ms)
+if q3.button("기록 비우기", key="adm_ql_reset", width="stretch"):
+    querylog.reset()
+
+ql_order = st.radio(
+    "정렬", ["total_ms", "max_ms", "mean_ms", "calls"], horizontal=True, key="adm_ql_order",
+    format_func={"total_ms": "총 시간", "max_ms": "최대 시간", "mean_ms": "평균 시간", "calls": "실행 횟수"}.get,
+)
+top = querylog.top_statements(order=ql_order, limit=30)
+if not top:
+    st.info("기록된 SQL이 없습니다." if ql_on else "기록이 꺼져 있습니다.")
+else:
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "SQL": s.sql,
+                "실행": s.calls,
+                "총(ms)": round(s.total_ms, 1),
+                "평균(ms)": round(s.mean_ms, 2),
+                "최대(ms)": round(s.max_ms, 1),
+                "평균 행": round(s.rows / s.calls, 1),
+                "파라미터": s.params,
+                "느림": s.slow_calls,
+                "계획 경고": ", ".join(querylog.plan_warnings(s.plan)),
+            }
+            for s in top
+        ]),
+        width="stretch",
+        hide_index=True,
+    )
+
+slow = querylog.slow_queries(limit=30)
+if slow:
+    with st.expander(f"최근 느린 실행 {len(slow)}건 (실행 계획)"):
+        for q in slow:
+            warn = querylog.plan_warnings(q.plan)
+            st.markdown(f"**{q.ms:,.1f} ms** · {q.rows:,}행 · {q.at.replace('T', ' ')} · `{q.params}`" + (f" · ⚠️ {', '.join(warn)}" if warn else ""))
+            st.code(q.sql, language="sql")
+            if q.plan:
+                st.code(q.plan, language="text")
+
+st.divider()
+st.markdown('<div class="section-title">기간 마감</div>', unsafe_allow_html=True)
+st.caption("마감은 보고 화면(월 보고/년 보고)의 '기간 마감'에서 합니다. 마감한 기간은 수정할 수 없고, 보고서는 마감 때 저장한 결과표를 씁니다.")
+periods = closed_periods()
+if not periods:
+    st.info("마감한 기간이 없습니다.")
+else:
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "기간": p["period"],
+                "시작일": p["start"],
+                "종료일": p["end"],
+                "마감 시각": p["closed_at"].replace("T", " "),
+                "마감자": p["actor"] or "",
+            }
+            for p in periods
+        ]),
+        width="stretch",
+        hide_index=True,
+    )
+    r1, r2 = st.columns([2, 1], gap="small")
+    reopen_sel = r1.selectbox("마감 해제할 기간", [p["period"] for p in periods], key="adm_reopen_sel")
+    if r2.button("마감 해제", key="adm_reopen_btn", width="stretch"):
+        reopen_period(reopen_sel)
+        st.toast(f"{reopen_sel} 마감 해제", icon="🔓")
+        st.rerun()
+
+st.divider()
+st.markdown('<div class="section-title">항목 관리</div>', unsafe_allow_html=True)
+st.caption(
+    "입력 화면의 수입/지출 항목 목록입니다. '순합계 제외'로 표시한 항목은 보고서의 순합계에서 빠지고, "
+    "'영수증 대상' 수입항목은 기부금 영수증에 포함됩니다."
+)
+
+cats = load_categories()
+k1, k2 = st.columns(2, gap="small")
+for col, kind in ((k1, "income"), (k2, "expense")):
+    with col:
+        st.markdown(f"**{KIND_LABELS[kind]}항목**")
+        sub = cats[cats["kind"] == kind]
+        table = {"항목": sub["name"], "순합계 제외": sub["exclude_net"]}
+        if kind == "income":
+            table["영수증 대상"] = sub["receipt"]
+        edited = st.data_editor(
+            pd.DataFrame(table).reset_index(drop=True),
+            key=f"adm_cat_{kind}",
+            width="stretch",
+            hide_index=True,
+            disabled=["항목"],
+        )
+        for i, code in enumerate(sub["code"]):
+            if bool(sub["exclude_net"].iloc[i]) != bool(edited["순합계 제외"].iloc[i]):
+                set_category_flags(code, exclude_net=bool(edited["순합계 제외"].iloc[i]))
+            if kind == "income" and bool(sub["receipt"].iloc[i]) != bool(edited["영수증 대상"].iloc[i]):
+                set_category_flags(code, receipt=bool(edited["영수증 대상"].iloc[i]))
+
+with st.form("adm_add_category", clear_on_submit=True):
+    a1, a2 = st.columns(2, gap="small")
+    new_cat_kind = a1.selectbox("구분", ["income", "expense"], format_func=KIND_LABELS.get)
+    new_cat_name = a2.text_input("항목 이름", placeholder="예: 부활절헌금")
+    f1, f2 = st.columns(2, gap="small")
+    new_cat_excl = f1.checkbox("순합계에서 제외")
+    new_cat_receipt = f2.checkbox("기부금 영수증 대상(수입항목)")
+    if st.form_submit_button("항목 추가", width="stretch"):
+        try:
+            add_category(new_cat_kind, new_cat_name, exclude_net=new_cat_excl, receipt=new_cat_receipt)
+            st.success("항목을 추가했습니다.")
+        except ValueError as e:
+            st.error(str(e))
+
+st.divider()
+st.markdown('<div class="section-title">기부금 영수증</div>', unsafe_allow_html=True)
+st.caption(
+    "수입내역에 적힌 이름(기부자)별로 한 해 헌금을 모아 영수증을 만듭니다. 무명/익명은 제외됩니다. "
+    "여러 장을 빠르게 만들려면 서버에서 `python -m utils.receipts <연도>` 를 사용하세요."
+)
+receipt_year = st.selectbox(
+    "연도", list(range(today.year, today.year - 6, -1)), index=1 if today.month <= 2 else 0, key="adm_receipt_year"
+)
+donors = donor_year_totals(receipt_year)
+if donors.empty:
+    st.info("선택한 연도에 영수증 대상 헌금이 없습니다.")
+else:
+    per_donor = donors.groupby("기부자", as_index=False)["금액"].sum().rename(columns={"금액": "합계"})
+    st.caption(f"기부자 {len(per_donor):,}명 · 합계 ₩{per_donor['합계'].sum():,.0f}")
+    st.dataframe(per_donor, width="stretch", hide_index=True, height=240)
+    st.download_button(
+        "영수증 전체 다운로드 (.zip)",
+        data=partial(receipts_zip_bytes, receipt_year, current_ledger()),
+        file_name=f"기부금영수증_{receipt_year}.zip",
+        mime="application/zip",
+        width="stretch",
+        key=f"adm_receipt_dl_{receipt_year}",
+    )
+
+st.divider()
+st.markdown('<div class="section-title">장부(교회) 관리</div>', unsafe_allow_html=True)
+st.caption("교회마다 별도의 DB 파일에 장부를 보관합니다. 장부 선택은 기본정보 페이지에서 할 수 있습니다.")
+
+st.dataframe(
+    pd.DataFrame([{"코드": l.key, "이름": l.name, "DB 파일": l.db_path} for l in list_ledgers()]),
+    width="stretch",
+    hide_index=True,
+)
+with st.form("adm_add_ledger", clear_on_submit=True):
+    a1, a2 = st.columns(2, gap="small")
+    new_key = a1.text_input("장부 코드(영문 소문자/숫자)", placeholder="예: sarang")
+    new_name = a2.text_input("교회 이름", placeholder="예: 사랑교회")
+    if st.form_submit_button("장부 추가", width="stretch"):
+        try:
+            add_ledger(new_key, new_name)
+            st.success("장부를 추가했습니다.")
+        except ValueError as e:
+            st.error(str(e))
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+영수증 첨부(스캔/사진 파일)를 장부 행에 연결합니다.
+
+- 파일 내용은 SHA-256 해시 이름으로 저장(data/attachments/<장부>/blobs/ab/abcdef...):
+  같은 파일을 여러 번 올리거나 여러 행에 붙여도 디스크에는 1번만 저장됩니다.
+- attachment 테이블은 (종류, 행 id) ↔ 해시 연결과 원래 파일명/형식만 보관합니다.
+- 미리보기(썸네일)는 처음 볼 때 만들어 thumbs/ 아래에 저장하고, 이후에는 그 파일만 읽습니다.
+  화면에는 원본을 올리지 않고 썸네일만 표시합니다(원본은 다운로드할 때만 읽음).
+- 어떤 행에도 연결되지 않은 파일은 DB 정리(utils.maintenance) 때 지웁니다.
+"""
+import os
+import io
+import hashlib
+import tempfile
+import datetime as dt
+from typing import Optional
+
+from utils import storage, tenants
+
+# 올릴 수 있는 형식과 크기
+UPLOAD_TYPES = ["jpg", "jpeg", "png", "webp", "gif", "pdf"]
+MAX_BYTES = 20 * 1024 * 1024
+# 썸네일 긴 변(px)과 JPEG 품질
+THUMB_PX = 240
+THUMB_QUALITY = 80
+# 저장할 때 한 번에 읽는 크기
+CHUNK_BYTES = 1024 * 1024
+# 연결이 없어진 파일도 이 시간(초) 안에 만든 것은 지우지 않음(올리는 중인 파일 보호)
+PRUNE_GRACE_SEC = 3600.0
+
+KIND_LABELS = {"income": "수입", "expense": "지출"}
+
+def store_dir() -> str:
+    """현재 장부의 첨부 폴더"""
+    return os.path.join(tenants.DATA_DIR, "attachments", tenants.current_ledger())
+
+def blob_path(sha: str) -> str:
+    return os.path.join(store_dir(), "blobs", sha[:2], sha)
+
+def _thumb_path(sha: str, px: int) -> str:
+    return os.path.join(store_dir(), "thumbs", sha[:2], f"{sha}_{px}.jpg")
+
+def put_blob(fileobj) -> tuple[str, int]:
+    """
+    파일 내용을 저장하고 (sha256, 크기)를 반환합니다. 이미 있는 내용이면 새로 쓰지 않습니다.
+    조각씩 읽으면서 해시를 계산해 임시 파일에 쓰고, 다 쓴 뒤 해시 이름으로 옮깁니다.
+    """
+    tmp_dir = os.path.join(store_dir(), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_BYTES:
+                    raise ValueError(f"파일이 너무 큽니다. ({MAX_BYTES // (1024 * 1024)}MB 이하)")
+                h.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise ValueError("빈 파일입니다.")
+        sha = h.hexdigest()
+        path = blob_path(sha)
+        if os.path.exists(path):
+            os.utime(path)  # 정리 대상에서 잠시 제외
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return sha, size
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def attach(kind: str, row_id: int, fileobj, filename: str, mime: Optional[str] = None, actor: Optional[str] = None) -> int:
+    """파일을 저장하고 행에 연결합니다. 같은 행에 같은 파일이 이미 있으면 기존 첨부 id를 반환합니다."""
+    if kind not in storage.KIND_COLS:
+        raise ValueError(f"알 수 없는 장부 종류: {kind}")
+    storage.init_db()
+    sha, size = put_blob(fileobj)
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            if cur.execute(f"SELECT 1 FROM {kind} WHERE id=?", (int(row_id),)).fetchone() is None:
+                raise ValueError("첨부할 행을 찾지 못했습니다. 저장된 행인지 확인해 주세요.")
+            cur.execute(
+                "INSERT OR IGNORE INTO attachment (kind, row_id, sha256, filename, mime, size, added_at, actor) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, int(row_id), sha, filename, mime, size, dt.datetime.now().isoformat(timespec="seconds"), actor),
+            )
+            (att_id,) = cur.execute(
+                "SELECT id FROM attachment WHERE kind=? AND row_id=? AND sha256=?", (kind, int(row_id), sha)
+            ).fetchone()
+    finally:
+        conn.close()
+    return int(att_id)
+
+def day_attachments(d: dt.date) -> list[dict]:
+    """
+    해당 날짜 행들의 첨부(행 id, 첨부 순):
+    [{"id", "kind", "row_id", "sha256", "filename", "mime", "size", "added_at", "actor"}]
+    """
+    storage.init_db()
+    conn = storage._connect()
+    rows = conn.execute(
+        "SELECT a.id, a.kind, a.row_id, a.sha256, a.filename, a.mime, a.size, a.added_at, a.actor "
+        "FROM attachment a JOIN income t ON a.kind = 'income' AND t.id = a.row_id WHERE t.d = ? "
+        "UNION ALL "
+        "SELECT a.id, a.kind, a.row_id, a.sha256, a.filename, a.mime, a.size, a.added_at, a.actor "
+        "FROM attachment a JOIN expense t ON a.kind = 'expense' AND t.id = a.row_id WHERE t.d = ? "
+        "ORDER BY 2, 3, 1",
+        (d.isoformat(), d.isoformat()),
+    ).fetchall()
+    conn.close()
+    keys = ["id", "kind", "row_id", "sha256", "filename", "mime", "size", "added_at", "actor"]
+    return [dict(zip(keys, r)) for r in rows]
+
+def remove_attachment(att_id: int) -> None:
+    """첨부 연결만 지웁니다(파일은 다른 곳에서 쓰지 않으면 DB 정리 때 지움)."""
+    storage.init_db()
+    conn = storage._connect()
+    with storage._write_txn(conn) as cur:
+        cur.execute("DELETE FROM attachment WHERE id=?", (int(att_id),))
+    conn.close()
+
+def read_blob(sha: str) -> bytes:
+    """원본 파일 내용(다운로드용)"""
+    with open(blob_path(sha), "rb") as f:
+        return f.read()
+
+def thumbnail(sha: str, px: int = THUMB_PX) -> Optional[str]:
+    """
+    썸네일 파일 경로. 없으면 이때 만들어 저장합니다.
+    이미지가 아니거나(PDF 등) 열 수 없는 파일이면 None.
+    """
+    path = _thumb_path(sha, px)
+    if os.path.exists(path):
+        return path
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(blob_path(sha)) as im:
+            # JPEG는 디코딩할 때부터 작게 읽음(원본 전체를 풀지 않음)
+            im.draft("RGB", (px * 2, px * 2))
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((px, px))
+            if im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            buf = io.BytesIO()
+            im.save(buf, "JPEG", quality=THUMB_QUALITY)
+    except Exception:
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.part"
+    with open(tmp, "wb") as f:
+        f.write(buf.getvalue())
+    os.replace(tmp, path)
+    return path
+
+def prune_blobs(grace_sec: float = PRUNE_GRACE_SEC) -> tuple[int, int]:
+    """어떤 행에도 연결되지 않은 파일과 그 썸네일을 지우고 (개수, 바이트)를 반환합니다."""
+    blobs = os.path.join(store_dir(), "blobs")
+    if not os.path.isdir(blobs):
+        return 0, 0
+    storage.init_db()
+    conn = storage._connect()
+    used = {r[0] for r in conn.execute("SELECT DISTINCT sha256 FROM attachment")}
+    conn.close()
+
+    cutoff = dt.datetime.now().timestamp() - grace_sec
+    removed = freed = 0
+    for sub in os.listdir(blobs):
+        for sha in os.listdir(os.path.join(blobs, sub)):
+            path = os.path.join(blobs, sub, sha)
+            if sha in used or os.path.getmtime(path) > cutoff:
+                continue
+            freed += os.path.getsize(path)
+            os.remove(path)
+            removed += 1
+            thumbs = os.path.join(store_dir(), "thumbs", sub)
+            if os.path.isdir(thumbs):
+                for name in os.listdir(thumbs):
+                    if name.startswith(sha + "_"):
+                        os.remove(os.path.join(thumbs, name))
+    return removed, freed
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+장부 전체(또는 기간) 내보내기: 외부 감사용 CSV/Parquet 파일(Streamlit 없이 실행).
+
+수입/지출을 각각 한 파일로 저장합니다. storage.iter_range로 조각씩 읽어 바로 쓰므로
+장부가 커져도 메모리 사용량은 일정합니다. CSV는 엑셀에서 바로 열리도록 UTF-8 BOM으로 씁니다.
+
+사용 예:
+    python -m utils.audit_export                                  # 전체 기간, CSV, 현재 폴더
+    python -m utils.audit_export --start 2016-01-01 --end 2025-12-31 --format parquet --out 감사자료
+    python -m utils.audit_export --ledger sarang
+"""
+import os
+import sys
+import time
+import argparse
+import datetime as dt
+from typing import Optional
+
+from utils import tenants
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+KIND_NAMES = {"income": "수입", "expense": "지출"}
+
+def export_ledger(
+    out_dir: str,
+    fmt: str = "csv",
+    start_date: Optional[dt.date] = None,
+    end_date: Optional[dt.date] = None,
+    chunk_rows: Optional[int] = None,
+) -> list[tuple[str, int]]:
+    """현재 장부의 수입/지출을 out_dir에 저장하고 [(파일 경로, 행 수)]를 반환합니다."""
+    from utils.exporter import write_range_csv, write_range_parquet
+
+    if fmt not in FORMATS:
+        raise ValueError(f"지원하지 않는 형식입니다: {fmt} (csv 또는 parquet)")
+    write = write_range_csv if fmt == "csv" else write_range_parquet
+    period = f"{start_date.isoformat() if start_date else '처음'}_{end_date.isoformat() if end_date else '끝'}"
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = []
+    for kind, name in KIND_NAMES.items():
+        path = os.path.join(out_dir, f"{tenants.current_ledger()}_{name}_{period}{FORMATS[fmt]}")
+        # 다 쓴 뒤에 이름을 바꿔, 중간에 실패해도 반쯤 쓴 파일이 남지 않도록
+        tmp_path = path + ".part"
+        n = write(kind, tmp_path, start_date, end_date, chunk_rows)
+        os.replace(tmp_path, path)
+        results.append((path, n))
+    return results
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.audit_export", description="장부 내보내기(CSV/Parquet)")
+    parser.add_argument("--start", type=dt.date.fromisoformat, help="시작일 YYYY-MM-DD(생략하면 처음부터)")
+    parser.add_argument("--end", type=dt.date.fromisoformat, help="종료일 YYYY-MM-DD(생략하면 끝까지)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv", help="파일 형식(기본: csv)")
+    parser.add_argument("--out", default=".", help="저장할 폴더(기본: 현재 폴더)")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="한 번에 읽는 행 수")
+    parser.add_argument("--ledger", default=tenants.DEFAULT_LEDGER, help="장부 코드(기본: default)")
+    args = parser.parse_args(argv)
+    if args.start and args.end and args.end < args.start:
+        parser.error("종료일이 시작일보다 앞설 수 없습니다.")
+
+    tenants.get_ledger(args.ledger)  # 존재 확인
+    t0 = time.perf_counter()
+    with tenants.use_ledger(args.ledger):
+        results = export_ledger(args.out, args.format, args.start, args.end, args.chunk_rows)
+    for path, n in results:
+        print(f"{path}: {n:,}행")
+    print(f"완료 ({time.perf_counter() - t0:.1f}초)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
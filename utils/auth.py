@@ -16,6 +16,12 @@ ALLOWED_ADMINS = [
 def is_authenticated() -> bool:
     return bool(st.session_state.get("authenticated", False))
 
+def current_user() -> str | None:
+    """로그인한 계정 ID(변경 이력의 작성자로 기록)."""
+    if not is_authenticated():
+        return None
+    return st.session_state.get("username")
+
 def authenticate(username: str, password: str) -> bool:
     # 간단 인증(요구사항). 실제 운영 시에는 환경변수/해시/SSO 등을 권장합니다.
     u = (username or "").strip()
@@ -32,6 +38,7 @@ def login_form() -> None:
     if submitted:
         if authenticate(username.strip(), password):
             st.session_state["authenticated"] = True
+            st.session_state["username"] = username.strip()
             st.toast("로그인 완료", icon="✅")
             # 페이지 새로고침
             st.rerun()
@@ -41,6 +48,7 @@ def login_form() -> None:
 def logout_button(key: str = "logout_btn") -> None:
     if st.button("로그아웃", key=key, width="stretch"):
         st.session_state["authenticated"] = False
+        st.session_state.pop("username", None)
         st.toast("로그아웃 됨", icon="👋")
         st.rerun()
 
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+입력 페이지 자동 저장(write-behind).
+
+편집할 때마다 저장하지 않고, 날짜별로 마지막 편집 내용만 보관했다가
+입력이 IDLE_SEC 초 동안 멈추면(또는 페이지 이동/지금 저장 시 즉시) 저장 스레드 1개가
+save_day 한 번(트랜잭션 1개)으로 반영합니다. 연속 입력 수십 번 = 저장 1번.
+
+- 대기열 키: (세션, 장부, 날짜) → 같은 날짜를 여러 사람이 편집해도 서로의 대기 내용을 덮지 않음
+- 충돌: 다른 사용자가 먼저 저장했으면 상태가 "conflict"가 되고, 페이지가 기존 충돌 안내를 표시
+- 상태(status)는 화면 표시용: pending(대기) → saving(저장 중) → saved / conflict / error
+"""
+import time
+import atexit
+import threading
+import datetime as dt
+from dataclasses import dataclass, field
+from typing import Optional
+
+# 마지막 편집 후 저장까지 기다리는 시간(초)
+IDLE_SEC = 2.0
+# 상태 보관 시간(초): 오래된 세션의 상태는 정리
+STATUS_TTL_SEC = 3600.0
+
+@dataclass
+class _Pending:
+    ledger: str
+    d: dt.date
+    income: object
+    expense: object
+    actor: Optional[str]
+    expected_version: Optional[int]
+    updated: float
+    flush_now: bool = False
+
+@dataclass(frozen=True)
+class SaveStatus:
+    state: str                       # pending / saving / saved / conflict / error
+    version: Optional[int] = None    # 저장 후 날짜 버전(saved)
+    message: str = ""
+    at: float = field(default_factory=time.time)
+    writes: int = 0                  # 이 키로 실제 저장한 횟수
+
+class WriteBehindQueue:
+    def __init__(self, idle_sec: float = IDLE_SEC):
+        self.idle_sec = idle_sec
+        self._cond = threading.Condition()
+        self._pending: dict[tuple, _Pending] = {}
+        self._status: dict[tuple, SaveStatus] = {}
+        # 키별 {저장 전 버전: 저장 후 버전}: 화면이 아직 모르는 자기 저장 때문에 충돌로 보지 않도록
+        # 예전 기준 버전으로 들어온 편집을 최신 버전 기준으로 옮김
+        self._rebase: dict[tuple, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 페이지에서 호출
+    # ------------------------------------------------------------------
+    def submit(self, key: tuple, ledger: str, d: dt.date, income, expense,
+               actor: Optional[str] = None, expected_version: Optional[int] = None) -> None:
+        """편집 내용을 대기열에 넣습니다(같은 키의 이전 대기 내용은 대체)."""
+        with self._cond:
+            chain = self._rebase.get(key, {})
+            while expected_version in chain:
+                expected_version = chain[expected_version]
+            prev = self._pending.get(key)
+            if prev is not None:
+                # 아직 저장 전이면 처음 기준 버전을 유지
+                expected_version = prev.expected_version
+            self._pending[key] = _Pending(ledger, d, income, expense, actor, expected_version, time.monotonic())
+            self._set_status(key, "pending")
+            self._prune_status()
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def flush(self, keys=None, timeout: float = 30.0) -> bool:
+        """
+        대기 중인 저장을 즉시 실행하고 끝날 때까지 기다립니다.
+        keys: 대상 키 목록(None이면 전체). 시간 안에 끝나면 True.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            targets = [k for k in self._pending if keys is None or k in keys]
+            for k in targets:
+                self._pending[k].flush_now = True
+            self._cond.notify_all()
+
+            def busy():
+                return any(
+                    k in self._pending or self._status.get(k, SaveStatus("")).state == "saving"
+                    for k in (targets if keys is None else keys)
+                )
+
+            while busy():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def flush_owner(self, owner: str, timeout: float = 30.0) -> bool:
+        """세션(owner)의 대기 중인 저장을 모두 실행(페이지 이동 시)"""
+        with self._cond:
+            keys = [k for k in self._pending if k[0] == owner]
+        return self.flush(keys, timeout) if keys else True
+
+    def discard(self, key: tuple) -> None:
+        """대기 중인 저장을 버립니다(충돌 시 다시 불러오기/덮어쓰기 전)."""
+        with self._cond:
+            self._pending.pop(key, None)
+            self._rebase.pop(key, None)
+            self._status.pop(key, None)
+            self._cond.notify_all()
+
+    def status(self, key: tuple) -> Optional[SaveStatus]:
+        with self._cond:
+            return self._status.get(key)
+
+    # ------------------------------------------------------------------
+    # 저장 스레드
+    # ------------------------------------------------------------------
+    def _set_status(self, key: tuple, state: str, **kw) -> None:
+        prev = self._status.get(key)
+        kw.setdefault("writes", prev.writes if prev else 0)
+        kw.setdefault("version", prev.version if prev else None)
+        self._status[key] = SaveStatus(state, **kw)
+
+    def _prune_status(self) -> None:
+        cutoff = time.time() - STATUS_TTL_SEC
+        for k in [k for k, s in self._status.items() if s.at < cutoff and k not in self._pending]:
+            del self._status[k]
+            self._rebase.pop(k, None)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+            self._thread.start()
+
+    def _next_job(self):
+        """저장할 때가 된 항목을 꺼냅니다(없으면 기다림)."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                due = [k for k, p in self._pending.items() if p.flush_now or now - p.updated >= self.idle_sec]
+                if due:
+                    key = min(due, key=lambda k: self._pending[k].updated)
+                    job = self._pending.pop(key)
+                    self._set_status(key, "saving")
+                    return key, job
+                waits = [self.idle_sec - (now - p.updated) for p in self._pending.values()]
+                self._cond.wait(min(waits) if waits else None)
+
+    def _run(self) -> None:
+        while True:
+            key, job = self._next_job()
+            self._write(key, job)
+
+    def _write(self, key: tuple, job: _Pending) -> None:
+        from utils import storage, tenants
+
+        prev = self._status.get(key)
+        writes = (prev.writes if prev else 0) + 1
+        try:
+            with tenants.use_ledger(job.ledger):
+                version = storage.save_day(
+                    job.d, job.income, job.expense, actor=job.actor, expected_version=job.expected_version
+                )
+        except storage.SaveConflictError as e:
+            with self._cond:
+                # 같은 날짜의 이후 편집도 같은 충돌이므로 버림(편집 내용은 화면에 남아 있음)
+                self._pending.pop(key, None)
+                self._set_status(key, "conflict", message=str(e), writes=writes)
+                self._cond.notify_all()
+            return
+        except Exception as e:
+            with self._cond:
+                self._set_status(key, "error", message=str(e), writes=writes)
+                self._cond.notify_all()
+            return
+
+        with self._cond:
+            if job.expected_version is not None and version != job.expected_version:
+                self._rebase.setdefault(key, {})[job.expected_version] = version
+            p = self._pending.get(key)
+            if p is not None and p.expected_version == job.expected_version:
+                p.expected_version = version
+            if p is None:
+                self._set_status(key, "saved", version=version, writes=writes)
+            else:
+                self._set_status(key, "pending", version=version, writes=writes)
+            self._cond.notify_all()
+
+# 프로세스 전체에서 공유하는 대기열(저장 스레드 1개)
+queue = WriteBehindQueue()
+
+@atexit.register
+def _flush_on_exit() -> None:
+    queue.flush(timeout=10.0)
+
+def session_owner() -> str:
+    """현재 Streamlit 세션 id(대기열 키의 첫 요소)"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else "local"
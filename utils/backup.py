@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+장부 DB 온라인 백업/복원.
+
+- sqlite3 backup API로 몇 페이지씩 나누어 복사하므로, 앱이 실행 중이어도 저장(쓰기)이 오래 막히지 않습니다.
+- 백업 파일은 gzip으로 압축해 data/backups(기본 장부) 또는 data/backups/<장부 코드> 에 보관하고, 보관 규칙(최근 N개/일별/월별)에 따라 정리합니다.
+- 복원은 백업 파일을 먼저 검증(integrity_check)한 뒤, 현재 DB를 안전 백업하고 나서 진행합니다.
+
+명령줄 사용:
+    python -m utils.backup create
+    python -m utils.backup list
+    python -m utils.backup verify <파일>
+    python -m utils.backup restore <파일>
+    python -m utils.backup prune
+    python -m utils.backup --ledger <장부 코드> create   (기본 장부가 아닌 경우)
+"""
+import os
+import sys
+import gzip
+import shutil
+import sqlite3
+import tempfile
+import datetime as dt
+from typing import Optional
+
+from utils import storage, tenants, report_cache
+
+BACKUP_DIR = os.path.join(tenants.DATA_DIR, "backups")
+
+# 한 번에 복사할 페이지 수(작을수록 쓰기 대기가 짧고, 전체 백업 시간은 길어짐)
+PAGES_PER_STEP = 256
+STEP_SLEEP_SEC = 0.005
+# 나누어 복사하는 중 다른 연결이 쓰면 처음부터 다시 복사함. 이 횟수를 넘으면 한 번에 복사
+MAX_RESTARTS = 5
+
+# 보관 규칙: 최근 N개 + 최근 며칠의 하루 1개 + 최근 몇 달의 한 달 1개
+KEEP_LAST = 10
+KEEP_DAILY = 14
+KEEP_MONTHLY = 12
+
+_PREFIX = "church_finance-"
+_SUFFIX = ".db.gz"
+_TS_FORMAT = "%Y%m%d-%H%M%S"
+
+# 백업 파일이 갖춰야 할 테이블
+REQUIRED_TABLES = {"income", "expense"}
+
+
+def _backup_dir() -> str:
+    key = tenants.current_ledger()
+    return BACKUP_DIR if key == tenants.DEFAULT_LEDGER else os.path.join(BACKUP_DIR, key)
+
+def _backup_name(ts: dt.datetime) -> str:
+    return f"{_PREFIX}{ts.strftime(_TS_FORMAT)}{_SUFFIX}"
+
+def _parse_ts(name: str) -> Optional[dt.datetime]:
+    if not (name.startswith(_PREFIX) and name.endswith(_SUFFIX)):
+        return None
+    try:
+        return dt.datetime.strptime(name[len(_PREFIX):-len(_SUFFIX)], _TS_FORMAT)
+    except ValueError:
+        return None
+
+def _check_db(path: str) -> tuple[bool, str]:
+    """SQLite 파일의 무결성과 필수 테이블 존재 여부를 확인합니다."""
+    conn = sqlite3.connect(path)
+    try:
+        (res,) = conn.execute("PRAGMA integrity_check").fetchone()
+        if res != "ok":
+            return False, res
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        missing = REQUIRED_TABLES - names
+        if missing:
+            return False, f"테이블 없음: {', '.join(sorted(missing))}"
+        return True, "ok"
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+    finally:
+        conn.close()
+
+class _TooManyRestarts(Exception):
+    pass
+
+def _backup_pages(src: sqlite3.Connection, dest: sqlite3.Connection) -> None:
+    """
+    src를 dest로 PAGES_PER_STEP씩 복사합니다. 저장이 계속 들어와 처음부터 다시 시작하는 일이
+    MAX_RESTARTS번을 넘으면 나머지는 한 번에(pages=-1) 복사합니다(그동안 src 쓰기는 잠깐 기다림).
+    """
+    seen = {"left": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        # 남은 페이지가 늘었으면 처음부터 다시 시작한 것
+        if seen["left"] is not None and remaining > seen["left"]:
+            seen["restarts"] += 1
+            if seen["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts
+        seen["left"] = remaining
+
+    try:
+        src.backup(dest, pages=PAGES_PER_STEP, progress=progress, sleep=STEP_SLEEP_SEC)
+    except _TooManyRestarts:
+        src.backup(dest, pages=-1)
+
+def _online_copy(src: sqlite3.Connection, dest_path: str) -> None:
+    dest = sqlite3.connect(dest_path)
+    try:
+        _backup_pages(src, dest)
+    finally:
+        dest.close()
+
+def create_backup(backup_dir: Optional[str] = None) -> str:
+    """현재 DB의 일관된 스냅샷을 만들어 압축 저장하고, 백업 파일 경로를 반환합니다."""
+    backup_dir = backup_dir or _backup_dir()
+    os.makedirs(backup_dir, exist_ok=True)
+    storage.init_db()
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=backup_dir)
+    os.close(fd)
+    try:
+        src = storage._connect()
+        try:
+            _online_copy(src, tmp_path)
+        finally:
+            src.close()
+
+        ok, msg = _check_db(tmp_path)
+        if not ok:
+            raise RuntimeError(f"백업 검증 실패: {msg}")
+
+        now = dt.datetime.now()
+        out_path = os.path.join(backup_dir, _backup_name(now))
+        n = 1
+        while os.path.exists(out_path):  # 같은 초에 여러 번 만든 경우
+            out_path = os.path.join(backup_dir, _backup_name(now + dt.timedelta(seconds=n)))
+            n += 1
+        with open(tmp_path, "rb") as fi, gzip.open(out_path + ".part", "wb", compresslevel=6) as fo:
+            shutil.copyfileobj(fi, fo, length=1024 * 1024)
+        os.replace(out_path + ".part", out_path)
+        return out_path
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def list_backups(backup_dir: Optional[str] = None) -> list[dict]:
+    """백업 목록(최신순): [{"path", "name", "created", "size"}]"""
+    backup_dir = backup_dir or _backup_dir()
+    if not os.path.isdir(backup_dir):
+        return []
+    out = []
+    for name in os.listdir(backup_dir):
+        ts = _parse_ts(name)
+        if ts is None:
+            continue
+        path = os.path.join(backup_dir, name)
+        out.append({"path": path, "name": name, "created": ts, "size": os.path.getsize(path)})
+    out.sort(key=lambda b: b["created"], reverse=True)
+    return out
+
+def prune_backups(
+    backup_dir: Optional[str] = None,
+    keep_last: int = KEEP_LAST,
+    keep_daily: int = KEEP_DAILY,
+    keep_monthly: int = KEEP_MONTHLY,
+) -> list[str]:
+    """보관 규칙에 해당하지 않는 백업을 삭제하고, 삭제한 파일 경로를 반환합니다."""
+    backups = list_backups(backup_dir)
+    keep = set()
+    days, months = [], []
+    for i, b in enumerate(backups):  # 최신순이므로 각 날짜/월의 첫 항목이 가장 최근 백업
+        if i < keep_last:
+            keep.add(b["path"])
+        day = b["created"].date()
+        month = (day.year, day.month)
+        if day not in days:
+            days.append(day)
+            if len(days) <= keep_daily:
+                keep.add(b["path"])
+        if month not in months:
+            months.append(month)
+            if len(months) <= keep_monthly:
+                keep.add(b["path"])
+
+    removed = []
+    for b in backups:
+        if b["path"] not in keep:
+            os.remove(b["path"])
+            removed.append(b["path"])
+    return removed
+
+def _decompress(path: str, dest_dir: str) -> str:
+    fd, tmp_path = tempfile.mkstemp(suffix=".db", dir=dest_dir)
+    os.close(fd)
+    with gzip.open(path, "rb") as fi, open(tmp_path, "wb") as fo:
+        shutil.copyfileobj(fi, fo, length=1024 * 1024)
+    return tmp_path
+
+def verify_backup(path: str) -> tuple[bool, str]:
+    """백업 파일을 임시로 풀어 무결성을 확인합니다."""
+    try:
+        tmp_path = _decompress(path, os.path.dirname(os.path.abspath(path)))
+    except (OSError, EOFError) as e:
+        return False, str(e)
+    try:
+        return _check_db(tmp_path)
+    finally:
+        os.remove(tmp_path)
+
+def restore_backup(path: str) -> str:
+    """
+    백업 파일로 현재 DB를 복원합니다.
+    - 복원 전 백업 파일을 검증하고, 현재 DB를 먼저 안전 백업(반환값)합니다.
+    - 복원도 backup API로 진행하므로 실행 중인 앱의 연결이 깨지지 않습니다.
+    """
+    ok, msg = verify_backup(path)
+    if not ok:
+        raise RuntimeError(f"백업 파일 검증 실패: {msg}")
+
+    safety = create_backup()
+    tmp_path = _decompress(path, os.path.dirname(os.path.abspath(path)))
+    try:
+        src = sqlite3.connect(tmp_path)
+        dest = storage._connect()
+        try:
+            _backup_pages(src, dest)
+        finally:
+            dest.close()
+            src.close()
+    finally:
+        os.remove(tmp_path)
+    # 이 프로세스의 항목 목록/달력 캐시는 복원 전 DB 기준이므로 버림
+    path = storage.db_path()
+    storage._category_cache.pop(path, None)
+    storage._calendar_years.pop(path, None)
+    # 복원하면 날짜 버전이 되돌아가므로 보고서 캐시도 비움
+    report_cache.clear()
+    # 변경 이력 seq도 되돌아가므로 동기화 상대에게는 새 사본으로 보이게 함(utils.sync)
+    storage.reset_sync_node()
+    return safety
+
+def main(argv: list[str]) -> int:
+    if len(argv) >= 2 and argv[0] == "--ledger":
+        with tenants.use_ledger(argv[1]):
+            return main(argv[2:])
+    cmd = argv[0] if argv else "create"
+    if cmd == "create":
+        path = create_backup()
+        removed = prune_backups()
+        print(f"백업 완료: {path}")
+        if removed:
+            print(f"오래된 백업 {len(removed)}개 정리")
+    elif cmd == "list":
+        for b in list_backups():
+            print(f"{b['created']:%Y-%m-%d %H:%M:%S}  {b['size'] / 1024:,.0f} KB  {b['path']}")
+    elif cmd == "verify" and len(argv) > 1:
+        ok, msg = verify_backup(argv[1])
+        print("정상" if ok else f"오류: {msg}")
+        return 0 if ok else 1
+    elif cmd == "restore" and len(argv) > 1:
+        safety = restore_backup(argv[1])
+        print(f"복원 완료: {argv[1]}")
+        print(f"복원 전 DB 백업: {safety}")
+    elif cmd == "prune":
+        removed = prune_backups()
+        print(f"{len(removed)}개 삭제")
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
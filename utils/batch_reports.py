@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+재정보고 일괄 생성(Streamlit 없이 실행).
+
+선택한 연도(또는 연도 범위)의 주/월/분기/년 재정보고와 월별 현황(수입/지출)을
+엑셀(.xlsx)과 인쇄용 HTML로 만들어 zip 파일 하나로 묶습니다.
+보고서마다 별도 프로세스에서 계산하므로 CPU 코어 수만큼 동시에 생성됩니다.
+
+사용 예:
+    python -m utils.batch_reports 2025
+    python -m utils.batch_reports 2023 2025 --out 재정보고_2023-2025.zip --workers 4
+    python -m utils.batch_reports 2025 --ledger sarang
+"""
+import os
+import sys
+import time
+import zipfile
+import argparse
+import datetime as dt
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import tenants
+
+# 보고 종류별 zip 안의 폴더 이름
+_MODE_DIRS = {"주 보고": "주보고", "월 보고": "월보고", "분기 보고": "분기보고", "년 보고": "년보고"}
+
+def _safe_name(s: str) -> str:
+    return s.replace("/", "-").replace(" ", "_")
+
+def build_tasks(ledger: str, first_year: int, last_year: int) -> list[tuple]:
+    """생성할 보고서 목록: (장부, 종류, 연도, 기준일 또는 수입/지출)"""
+    from utils.storage import sundays_of_month
+
+    tasks = []
+    for y in range(first_year, last_year + 1):
+        # 주일 목록은 그 장부 DB의 calendar 테이블에서 읽음
+        with tenants.use_ledger(ledger):
+            sundays = [sun for m in range(1, 13) for sun in sundays_of_month(y, m)]
+        for sun in sundays:
+            tasks.append((ledger, "주 보고", y, sun))
+        for m in range(1, 13):
+            tasks.append((ledger, "월 보고", y, dt.date(y, m, 1)))
+        for sm in (1, 4, 7, 10):
+            tasks.append((ledger, "분기 보고", y, dt.date(y, sm, 1)))
+        tasks.append((ledger, "년 보고", y, dt.date(y, 1, 1)))
+        for kind in ("수입", "지출"):
+            tasks.append((ledger, "월별 현황", y, kind))
+    return tasks
+
+def render_task(task: tuple) -> list[tuple[str, bytes]]:
+    """보고서 1건을 계산해 [(zip 안 경로, 내용)]을 반환합니다(작업 프로세스에서 실행)."""
+    from utils.exporter import export_tables_xlsx
+    from utils.reports import (
+        MONTHLY_KINDS, date_range_for_mode, build_period_report, period_report_html,
+        build_monthly_status, monthly_money_columns, monthly_status_html,
+    )
+
+    ledger, mode, year, arg = task
+    with tenants.use_ledger(ledger):
+        church_name = tenants.current_church_name()
+        if mode == "월별 현황":
+            title = MONTHLY_KINDS[arg]["title"]
+            out = build_monthly_status(year, arg)
+            base = f"{year}/월별현황/{_safe_name(title)}_{year}"
+            xlsx = export_tables_xlsx(
+                filename_prefix=f"{title}_{year}",
+                sheets={title: out},
+                money_columns=monthly_money_columns(out),
+            )
+            html = monthly_status_html(out, f"{title} - {year}년")
+        else:
+            start, end, title_suffix = date_range_for_mode(arg, mode)
+            report = build_period_report(start, end, title_suffix)
+            base = f"{year}/{_MODE_DIRS[mode]}/재정보고_{_safe_name(title_suffix)}"
+            xlsx = export_tables_xlsx(
+                filename_prefix=f"재정보고_{title_suffix}",
+                sheets={"수입": report.income_sum, "지출": report.expense_sum},
+                money_columns=["합계"],
+            )
+            html = period_report_html(report, church_name)
+    return [(base + ".xlsx", xlsx), (base + ".html", html.encode("utf-8"))]
+
+def _write_results(zf: zipfile.ZipFile, results) -> None:
+    for files in results:
+        for name, data in files:
+            zf.writestr(name, data)
+
+def generate(
+    first_year: int,
+    last_year: int,
+    out_path: str,
+    ledger: str = tenants.DEFAULT_LEDGER,
+    workers: int | None = None,
+) -> int:
+    """보고서를 병렬로 만들어 out_path(zip)에 저장하고, 보고서 건수를 반환합니다."""
+    tenants.get_ledger(ledger)  # 존재 확인
+    tasks = build_tasks(ledger, first_year, last_year)
+    workers = workers or os.cpu_count() or 1
+
+    # fork로 부모의 SQLite 연결을 물려받지 않도록 spawn 사용
+    ctx = multiprocessing.get_context("spawn")
+    tmp_path = out_path + ".part"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        if workers <= 1:
+            _write_results(zf, map(render_task, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+                _write_results(zf, ex.map(render_task, tasks, chunksize=4))
+    os.replace(tmp_path, out_path)
+    return len(tasks)
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.batch_reports", description="재정보고 일괄 생성(zip)")
+    parser.add_argument("year", type=int, help="연도(범위의 시작 연도)")
+    parser.add_argument("last_year", type=int, nargs="?", help="범위의 마지막 연도(생략하면 한 해만)")
+    parser.add_argument("--out", help="저장할 zip 경로(기본: 재정보고_<연도>.zip)")
+    parser.add_argument("--workers", type=int, default=None, help="동시 작업 프로세스 수(기본: CPU 코어 수)")
+    parser.add_argument("--ledger", default=tenants.DEFAULT_LEDGER, help="장부 코드(기본: default)")
+    args = parser.parse_args(argv)
+
+    first, last = args.year, args.last_year or args.year
+    if last < first:
+        parser.error("마지막 연도가 시작 연도보다 앞설 수 없습니다.")
+    period = f"{first}" if first == last else f"{first}-{last}"
+    out = args.out or f"재정보고_{period}.zip"
+
+    t0 = time.perf_counter()
+    n = generate(first, last, out, ledger=args.ledger, workers=args.workers)
+    print(f"{n}건 생성 완료: {out} ({time.perf_counter() - t0:.1f}초)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+교회 달력(날짜 차원) 계산.
+
+날짜마다 연/월/분기/요일, 주차(週次), 교회 절기를 한 번 계산해 DB의 calendar 테이블에 넣어 두고
+보고서/날짜 선택기는 이 테이블을 조회합니다(storage.ensure_calendar).
+
+주차 정의(기존 보고서와 동일):
+- 매월 n번째 주일(일요일)부터 그 주 토요일까지가 n주차. 월말을 넘어가면 월말에서 끊습니다.
+- 그 달 첫 주일 이전 날짜(1일~첫 주일 전날)는 0주차.
+"""
+import calendar
+import datetime as dt
+
+# 절기(기간)
+SEASON_ADVENT = "대림절"
+SEASON_CHRISTMAS = "성탄절기"
+SEASON_LENT = "사순절"
+SEASON_EASTER = "부활절기"
+
+# 절기 주일/기념일
+HOLY_DAYS = ("부활절", "성령강림절", "맥추감사절", "추수감사절", "성탄절")
+
+def easter_sunday(year: int) -> dt.date:
+    """부활절(그레고리력, 익명의 그레고리력 계산법)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return dt.date(year, month, day + 1)
+
+def _nth_sunday(year: int, month: int, n: int) -> dt.date:
+    first = dt.date(year, month, 1)
+    return first + dt.timedelta(days=(6 - first.weekday()) % 7 + 7 * (n - 1))
+
+def holy_days(year: int) -> dict:
+    """{날짜: 이름} 한국 교회에서 감사헌금을 드리는 주요 주일/기념일"""
+    easter = easter_sunday(year)
+    return {
+        easter: "부활절",
+        easter + dt.timedelta(days=49): "성령강림절",
+        _nth_sunday(year, 7, 1): "맥추감사절",   # 7월 첫 주일
+        _nth_sunday(year, 11, 3): "추수감사절",  # 11월 셋째 주일
+        dt.date(year, 12, 25): "성탄절",
+    }
+
+def _advent_start(year: int) -> dt.date:
+    # 성탄절 전 네 번째 주일
+    christmas = dt.date(year, 12, 25)
+    return christmas - dt.timedelta(days=(christmas.weekday() + 1) % 7 or 7) - dt.timedelta(weeks=3)
+
+def season_of(d: dt.date) -> str | None:
+    easter = easter_sunday(d.year)
+    if easter - dt.timedelta(days=46) <= d < easter:
+        return SEASON_LENT
+    if easter <= d < easter + dt.timedelta(days=49):
+        return SEASON_EASTER
+    if _advent_start(d.year) <= d < dt.date(d.year, 12, 25):
+        return SEASON_ADVENT
+    if d >= dt.date(d.year, 12, 25) or d <= dt.date(d.year, 1, 5):
+        return SEASON_CHRISTMAS
+    return None
+
+def same_day_last_year(d: dt.date) -> dt.date:
+    """
+    작년의 같은 날(비교용): 절기 주일/기념일이면 작년의 같은 절기, 주일이면 작년 같은 달 n번째 주일,
+    그 밖(또는 작년 그 달에 n번째 주일이 없으면)은 52주 전 같은 요일.
+    """
+    holy = holy_days(d.year).get(d)
+    if holy is not None:
+        return next(day for day, name in holy_days(d.year - 1).items() if name == holy)
+    if d.weekday() == 6:
+        n = (d.day - 1) // 7 + 1
+        prev = _nth_sunday(d.year - 1, d.month, n)
+        if prev.month == d.month:
+            return prev
+    return d - dt.timedelta(weeks=52)
+
+def calendar_rows(year: int) -> list[tuple]:
+    """
+    연도의 날짜별 행:
+    (d, year, month, day, quarter, weekday(0=일~6=토), week_no, week_start, week_end, season, holy_day)
+    """
+    rows = []
+    holy = holy_days(year)
+    for month in range(1, 13):
+        last_day = calendar.monthrange(year, month)[1]
+        month_start = dt.date(year, month, 1)
+        month_end = dt.date(year, month, last_day)
+        first_sunday = _nth_sunday(year, month, 1)
+        for day in range(1, last_day + 1):
+            d = dt.date(year, month, day)
+            if d < first_sunday:
+                week_no, week_start, week_end = 0, month_start, first_sunday - dt.timedelta(days=1)
+            else:
+                week_no = (d - first_sunday).days // 7 + 1
+                week_start = first_sunday + dt.timedelta(weeks=week_no - 1)
+                week_end = min(week_start + dt.timedelta(days=6), month_end)
+            rows.append((
+                d.isoformat(), year, month, day, (month - 1) // 3 + 1, (d.weekday() + 1) % 7,
+                week_no, week_start.isoformat(), week_end.isoformat(), season_of(d), holy.get(d),
+            ))
+    return rows
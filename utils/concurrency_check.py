@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+동시 저장 점검: 여러 스레드가 동시에 save_day를 불러도 저장이 사라지거나 'database is locked' 오류가 나지 않는지,
+저장 중에 만든 백업이 일관된 스냅샷인지 확인합니다.
+
+saves: 스레드 N개가 동시에
+  - 같은 날짜를 '불러오기(버전 기억) → 행 1개 추가 → expected_version으로 저장'을 rounds 번 반복하고
+    (SaveConflictError면 다시 불러와서 재시도: 입력 화면의 '다시 불러오기'와 같은 흐름)
+  - 자기 날짜에는 버전 확인 없이 행 1개씩 추가 저장합니다(쓰기 잠금 경합만 일으킴).
+  끝난 뒤 점검:
+  - 충돌/재시도 외의 예외(특히 database is locked)가 없을 것
+  - 같은 날짜: 추가한 행이 모두 정확히 1번씩 남아 있고, 날짜 버전이 성공한 저장 수만큼 올랐을 것(잃어버린 저장 없음)
+  - 스레드별 날짜: 행이 rounds 개씩 늘었을 것
+  - 바뀐 날짜의 daily_totals가 원본 행 합계와 같을 것
+
+backup: 스레드 N개가 각자 날짜에 행을 1개씩 계속 추가 저장하는 동안 create_backup을 여러 번 실행하고
+  - 백업마다 verify_backup이 정상이고, 백업 안에서 날짜마다 '늘어난 행 수 = 늘어난 날짜 버전'(저장 도중이 섞이지 않은
+    스냅샷)이며 daily_totals가 원본 행 합계와 같을 것
+  - 저장을 멈춘 뒤 백업 → 행을 더 저장 → restore_backup 하면 장부 전체 행 수/금액 합계가 백업 때와 같을 것
+
+- 기본으로 데이터 폴더를 임시 폴더에 복사해 그 복사본에 저장합니다(실제 장부는 바뀌지 않음).
+- 문제가 하나라도 있으면 목록을 출력하고 종료 코드 1을 돌려줍니다.
+
+사용 예:
+    python -m utils.concurrency_check saves --threads 12 --rounds 5
+    python -m utils.concurrency_check backup --threads 6 --backups 5
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import threading
+import datetime as dt
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 같은 날짜 저장이 충돌로 계속 밀릴 때 한 번의 추가를 포기하기까지 재시도 횟수
+MAX_CONFLICT_RETRIES = 200
+
+def _add_row(df, d: dt.date, detail: str, amount: int):
+    import pandas as pd
+
+    row = {c: None for c in df.columns}
+    row.update({"날짜": d, "적요": "현금", "수입내역": detail, "금액": amount})
+    return pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+
+def _day_state(ds: str) -> tuple[int, dict]:
+    """(날짜 버전, {수입내역: 행 수})"""
+    from utils import storage
+
+    conn = storage._connect()
+    try:
+        cur = conn.cursor()
+        version = storage._day_version(cur, ds)
+        counts = dict(cur.execute("SELECT detail, COUNT(*) FROM income WHERE d=? GROUP BY detail", (ds,)).fetchall())
+    finally:
+        conn.close()
+    return version, counts
+
+def _totals_mismatch(conn, dates) -> list[str]:
+    """daily_totals와 원본 행 합계가 다른 날짜"""
+    out = []
+    for ds in dates:
+        for kind in ("income", "expense"):
+            raw = conn.execute(f"SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM {kind} WHERE d=?", (ds,)).fetchone()
+            agg = conn.execute(
+                "SELECT COALESCE(SUM(amount), 0), COALESCE(SUM(n), 0) FROM daily_totals WHERE d=? AND kind=?", (ds, kind)
+            ).fetchone()
+            if (round(raw[0], 2), raw[1]) != (round(agg[0], 2), agg[1]):
+                out.append(f"{ds} {kind}: 원본 {raw} / daily_totals {agg}")
+    return out
+
+def check_saves(shared: dt.date, threads: int, rounds: int) -> tuple[list[str], dict]:
+    """동시 저장 점검. (문제 목록, 요약) 반환"""
+    from utils import storage
+
+    storage.init_db()
+    own_days = [shared + dt.timedelta(days=i + 1) for i in range(threads)]
+    v0, _ = _day_state(shared.isoformat())
+    own_before = {d: sum(_day_state(d.isoformat())[1].values()) for d in own_days}
+
+    errors: list[str] = []
+    conflicts = [0] * threads
+    saved = [0] * threads
+    start = threading.Barrier(threads)
+
+    def worker(i: int) -> None:
+        start.wait()
+        for r in range(rounds):
+            try:
+                tries = 0
+                while True:
+                    version = storage.fetch_day_version(shared)
+                    inc, exp = storage.fetch_day(shared)
+                    inc = _add_row(inc, shared, f"점검-{i}-{r}", 1000 + i)
+                    try:
+                        storage.save_day(shared, inc, exp, actor=f"check-{i}", expected_version=version)
+                        saved[i] += 1
+                        break
+                    except storage.SaveConflictError:
+                        conflicts[i] += 1
+                        tries += 1
+                        if tries >= MAX_CONFLICT_RETRIES:
+                            raise
+                inc, exp = storage.fetch_day(own_days[i])
+                storage.save_day(own_days[i], _add_row(inc, own_days[i], f"점검-{i}-{r}", 10), exp, actor=f"check-{i}")
+            except Exception as e:
+                errors.append(f"스레드 {i} {r}회: {type(e).__name__}: {e}")
+                return
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,), name=f"save-{i}") for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    problems = list(errors)
+    v1, counts = _day_state(shared.isoformat())
+    expected = {f"점검-{i}-{r}" for i in range(threads) for r in range(rounds)}
+    missing = sorted(k for k in expected if counts.get(k, 0) == 0)
+    doubled = sorted(k for k in expected if counts.get(k, 0) > 1)
+    if missing:
+        problems.append(f"같은 날짜에서 사라진 저장 {len(missing)}건: {', '.join(missing[:10])}")
+    if doubled:
+        problems.append(f"같은 날짜에 두 번 들어간 행 {len(doubled)}건: {', '.join(doubled[:10])}")
+    if v1 - v0 != sum(saved):
+        problems.append(f"날짜 버전 증가 {v1 - v0} != 성공한 저장 {sum(saved)}")
+    for d in own_days:
+        grown = sum(_day_state(d.isoformat())[1].values()) - own_before[d]
+        if grown != rounds:
+            problems.append(f"{d} 행 증가 {grown} != {rounds}")
+    conn = storage._connect()
+    try:
+        problems += _totals_mismatch(conn, [d.isoformat() for d in [shared] + own_days])
+    finally:
+        conn.close()
+
+    summary = {"threads": threads, "rounds": rounds, "wall_sec": wall, "saves": sum(saved) + threads * rounds,
+               "conflicts": sum(conflicts)}
+    return problems, summary
+
+def _ledger_totals(conn) -> dict:
+    """장부 전체 {종류: (행 수, 금액 합계)}"""
+    return {
+        kind: tuple(conn.execute(f"SELECT COUNT(*), ROUND(COALESCE(SUM(amount), 0), 2) FROM {kind}").fetchone())
+        for kind in ("income", "expense")
+    }
+
+def check_backup(first: dt.date, threads: int, backups: int, backup_dir: str) -> tuple[list[str], dict]:
+    """저장 중 백업/복원 점검. (문제 목록, 요약) 반환"""
+    import sqlite3
+
+    from utils import storage, backup
+
+    storage.init_db()
+    days = [(first + dt.timedelta(days=i)).isoformat() for i in range(threads)]
+    conn = storage._connect()
+    try:
+        base = {ds: (sum(_day_state(ds)[1].values()), storage._day_version(conn.cursor(), ds)) for ds in days}
+    finally:
+        conn.close()
+
+    errors: list[str] = []
+    saved = [0] * threads
+    stop = threading.Event()
+
+    def writer(i: int) -> None:
+        d = dt.date.fromisoformat(days[i])
+        while not stop.is_set():
+            try:
+                inc, exp = storage.fetch_day(d)
+                storage.save_day(d, _add_row(inc, d, f"백업점검-{i}-{saved[i]}", 100), exp, actor=f"check-{i}")
+                saved[i] += 1
+            except Exception as e:
+                errors.append(f"스레드 {i}: {type(e).__name__}: {e}")
+                return
+
+    problems: list[str] = []
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=writer, args=(i,), name=f"backup-save-{i}") for i in range(threads)]
+    for t in pool:
+        t.start()
+    try:
+        for n in range(backups):
+            time.sleep(0.2)  # 백업 사이에도 저장이 쌓이도록
+            path = backup.create_backup(backup_dir)
+            ok, msg = backup.verify_backup(path)
+            if not ok:
+                problems.append(f"백업 {n + 1}: verify_backup 실패: {msg}")
+                continue
+            snap_path = backup._decompress(path, backup_dir)
+            snap = sqlite3.connect(snap_path)
+            try:
+                for ds in days:
+                    (rows,) = snap.execute("SELECT COUNT(*) FROM income WHERE d=?", (ds,)).fetchone()
+                    version = storage._day_version(snap.cursor(), ds)
+                    if rows - base[ds][0] != version - base[ds][1]:
+                        problems.append(
+                            f"백업 {n + 1} {ds}: 늘어난 행 {rows - base[ds][0]} != 늘어난 버전 {version - base[ds][1]}"
+                        )
+                problems += [f"백업 {n + 1} {m}" for m in _totals_mismatch(snap, days)]
+            finally:
+                snap.close()
+                os.remove(snap_path)
+    finally:
+        stop.set()
+        for t in pool:
+            t.join()
+    wall = time.perf_counter() - t0
+    problems = errors + problems
+
+    # 복원 왕복: 백업 → 더 저장 → 복원 → 백업 때와 같은지
+    path = backup.create_backup(backup_dir)
+    conn = storage._connect()
+    try:
+        before = _ledger_totals(conn)
+    finally:
+        conn.close()
+    for i, ds in enumerate(days):
+        d = dt.date.fromisoformat(ds)
+        inc, exp = storage.fetch_day(d)
+        storage.save_day(d, _add_row(inc, d, f"복원점검-{i}", 7), exp, actor="check")
+    backup.restore_backup(path)
+    conn = storage._connect()
+    try:
+        (integrity,) = conn.execute("PRAGMA integrity_check").fetchone()
+        after = _ledger_totals(conn)
+        if integrity != "ok":
+            problems.append(f"복원 후 integrity_check: {integrity}")
+        if after != before:
+            problems.append(f"복원 후 장부 합계 {after} != 백업 때 {before}")
+        problems += [f"복원 후 {m}" for m in _totals_mismatch(conn, days)]
+    finally:
+        conn.close()
+
+    summary = {"threads": threads, "backups": backups, "wall_sec": wall, "saves": sum(saved)}
+    return problems, summary
+
+def _report(name: str, problems: list[str], summary: dict) -> int:
+    print(f"[{name}] " + ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in summary.items()))
+    if problems:
+        print(f"[{name}] 문제 {len(problems)}건:")
+        for p in problems[:30]:
+            print(f"  {p}")
+        return 1
+    print(f"[{name}] 정상")
+    return 0
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.concurrency_check", description="동시 저장/백업 점검")
+    parser.add_argument("check", choices=["saves", "backup"], help="saves: 동시 save_day, backup: 저장 중 백업/복원")
+    parser.add_argument("--threads", type=int, default=None, help="동시 스레드 수(기본 saves 12, backup 6)")
+    parser.add_argument("--rounds", type=int, default=5, help="saves: 스레드마다 저장 횟수")
+    parser.add_argument("--backups", type=int, default=5, help="backup: 저장 중에 만들 백업 수")
+    parser.add_argument("--date", type=dt.date.fromisoformat, default=dt.date.today(), help="함께 저장할 날짜(YYYY-MM-DD)")
+    parser.add_argument("--in-place", action="store_true", help="데이터 폴더를 복사하지 않고 그대로 사용(실제 장부에 저장됨)")
+    args = parser.parse_args(argv)
+    if args.check == "backup" and args.in_place:
+        parser.error("backup 점검은 복원까지 하므로 --in-place로 실행할 수 없습니다.")
+
+    # 앱 모듈(utils.tenants)을 불러오기 전에 데이터 폴더를 정해야 함
+    os.environ["CHURCH_WARMUP"] = "0"
+    tmp_dir = None
+    if not args.in_place:
+        from utils.loadtest import copy_data_dir
+
+        src = os.environ.get("CHURCH_DATA_DIR") or os.path.join(_ROOT, "data")
+        tmp_dir = tempfile.mkdtemp(prefix="church-concheck-")
+        copy_data_dir(src, tmp_dir)
+        os.environ["CHURCH_DATA_DIR"] = tmp_dir
+    sys.path.insert(0, _ROOT)
+    try:
+        if args.check == "saves":
+            problems, summary = check_saves(args.date, args.threads or 12, args.rounds)
+        else:
+            problems, summary = check_backup(
+                args.date, args.threads or 6, args.backups, os.path.join(tmp_dir, "check-backups")
+            )
+        return _report(args.check, problems, summary)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+첫 화면(app.py) 요약: 이번 주/이번 달/올해 합계, 순잔액, 현금/은행 비율, 최근 52주 추이.
+
+원본 장부 행(fetch_range)을 읽지 않고, save_day가 날짜별로 갱신하는 daily_totals만 읽습니다
+(기간 합계 1번 + 주별 합계 1번). Streamlit에 의존하지 않습니다.
+"""
+import datetime as dt
+from dataclasses import dataclass
+
+from utils.storage import calendar_day, net_excluded_items, period_totals, weekly_totals
+from utils.reports import date_range_for_mode
+
+TREND_WEEKS = 52
+
+@dataclass(frozen=True)
+class PeriodKpi:
+    label: str
+    start: dt.date
+    end: dt.date
+    income: float
+    expense: float
+    income_cash: float
+    income_bank: float
+    expense_cash: float
+    expense_bank: float
+    net_income: float      # 순합계 제외 항목(exclude_net)과 항목 없는 행을 뺀 수입
+    net_expense: float     # 순합계 제외 항목과 항목 없는 행을 뺀 지출
+
+    @property
+    def net(self) -> float:
+        # 보고 화면의 순합계(항목별 합계표에서 제외 항목을 뺀 합)와 같은 값
+        return self.net_income - self.net_expense
+
+@dataclass(frozen=True)
+class Dashboard:
+    periods: list          # [PeriodKpi] 이번 주, 이번 달, 올해
+    net_excluded: list     # 순잔액에서 뺀 항목 이름(수입, 지출 순, 중복 없음)
+    trend: list            # [(주 시작일, 수입, 지출)] 최근 TREND_WEEKS주의 calendar 주(행이 없는 주는 0)
+
+def _kpi(label: str, start: dt.date, end: dt.date, totals: dict) -> PeriodKpi:
+    # totals: {(kind, 적요, 순합계 제외 여부): 금액} (storage.period_totals, 항목 없는 행은 제외 여부 None)
+    def total(kind: str, usage=None, net: bool = False) -> float:
+        return sum(
+            v for (k, u, excl), v in totals.items()
+            if k == kind and (usage is None or u == usage) and (not net or excl is False)
+        )
+
+    return PeriodKpi(
+        label=label,
+        start=start,
+        end=end,
+        income=total("income"),
+        expense=total("expense"),
+        income_cash=total("income", "현금"),
+        income_bank=total("income", "은행"),
+        expense_cash=total("expense", "현금"),
+        expense_bank=total("expense", "은행"),
+        net_income=total("income", net=True),
+        net_expense=total("expense", net=True),
+    )
+
+def build_dashboard(today: dt.date) -> Dashboard:
+    # 이번 주: 오늘이 들어 있는 주(calendar 테이블의 주, 달이 바뀌는 주는 이번 달 쪽만)
+    # 주 보고의 기간은 월초 첫 주일 전 날짜를 다음 주일 주로 묶으므로 쓰지 않음
+    # 이번 달/올해: 보고 화면(월 보고/년 보고)과 같은 정의
+    cal = calendar_day(today)
+    ranges = [
+        ("이번 주", cal["week_start"], cal["week_end"]),
+        ("이번 달", *date_range_for_mode(today, "월 보고")[:2]),
+        ("올해", *date_range_for_mode(today, "년 보고")[:2]),
+    ]
+    totals = period_totals([(s, e) for _, s, e in ranges])
+    periods = [_kpi(label, s, e, t) for (label, s, e), t in zip(ranges, totals)]
+
+    # 최근 52주: 52주 전 주일이 든 주부터 이번 주까지의 calendar 주(이번 주 합계와 같은 주 정의,
+    # 달이 바뀌는 주는 달마다 나뉘므로 막대 수는 52개보다 조금 많음)
+    first = calendar_day(today - dt.timedelta(days=cal["weekday"], weeks=TREND_WEEKS - 1))["week_start"]
+    trend = [(ws, i, e) for ws, _, i, e in weekly_totals(first, cal["week_end"])]
+    return Dashboard(
+        periods=periods,
+        net_excluded=list(dict.fromkeys(net_excluded_items("income") + net_excluded_items("expense"))),
+        trend=trend,
+    )
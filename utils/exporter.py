@@ -4,13 +4,16 @@ import datetime as dt
 from typing import Optional, Tuple
 
 import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+
+from utils.tenants import current_church_name
+
+# openpyxl은 불러오는 데 시간이 걸리므로 실제로 엑셀을 만들 때 불러옵니다(페이지 첫 로딩 단축).
 
 WON_FORMAT = '_-₩* #,##0_-;_-₩* -#,##0_-;_-₩* "-"_-;_-@_-'
 
 def _apply_table_style(ws, header_row: int, ncols: int, freeze_row: int):
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+
     # 헤더 스타일
     header_fill = PatternFill("solid", fgColor="1F4E79")  # 진한 파랑
     header_font = Font(color="FFFFFF", bold=True)
@@ -28,6 +31,8 @@ def _apply_table_style(ws, header_row: int, ncols: int, freeze_row: int):
     ws.freeze_panes = ws[f"A{freeze_row}"]
 
 def _autosize(ws, max_col: int, min_width=10, max_width=28):
+    from openpyxl.utils import get_column_letter
+
     for c in range(1, max_col + 1):
         col = get_column_letter(c)
         max_len = 0
@@ -40,6 +45,8 @@ def _autosize(ws, max_col: int, min_width=10, max_width=28):
         ws.column_dimensions[col].width = width
 
 def _write_df(ws, df: pd.DataFrame, title: str, start_row: int = 1, money_col: Optional[str] = None):
+    from openpyxl.styles import Font, Alignment, Border, Side
+
     # 타이틀
     ws.cell(row=start_row, column=1, value=title).font = Font(size=16, bold=True)
     ws.cell(row=start_row, column=1).alignment = Alignment(vertical="center", horizontal="left")
@@ -86,8 +93,12 @@ def export_day_xlsx(
     d: dt.date,
     income_df: pd.DataFrame,
     expense_df: pd.DataFrame,
-    church_name: str = "평안한교회",
+    church_name: Optional[str] = None,
 ) -> bytes:
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment
+
+    church_name = church_name or current_church_name()
     wb = Workbook()
     wb.remove(wb.active)
 
@@ -120,7 +131,10 @@ def export_day_xlsx(
     wb.save(bio)
     return bio.getvalue()
 
-def export_all_xlsx(income_all: pd.DataFrame, expense_all: pd.DataFrame, church_name: str = "평안한교회") -> bytes:
+def export_all_xlsx(income_all: pd.DataFrame, expense_all: pd.DataFrame, church_name: Optional[str] = None) -> bytes:
+    from openpyxl import Workbook
+
+    church_name = church_name or current_church_name()
     wb = Workbook()
     wb.remove(wb.active)
 
@@ -192,3 +206,72 @@ def export_tables_xlsx(filename_prefix: str, sheets: dict, money_columns: list[s
     bio = io.BytesIO()
     wb.save(bio)
     return bio.getvalue()
+
+# ---------------------------------------------------------------------------
+# 기간 전체 내보내기(CSV/Parquet): storage.iter_range로 조각씩 읽어 바로 파일에 씀 → 행 수와 관계없이 메모리 일정
+# ---------------------------------------------------------------------------
+def write_range_csv(
+    kind: str,
+    path: str,
+    start_date: Optional[dt.date] = None,
+    end_date: Optional[dt.date] = None,
+    chunk_rows: Optional[int] = None,
+) -> int:
+    """
+    수입/지출(kind) 행을 CSV로 저장하고 행 수를 반환합니다.
+    엑셀에서 한글이 깨지지 않도록 UTF-8 BOM(utf-8-sig)으로 씁니다. 첫 컬럼은 행 id.
+    """
+    from utils.storage import CHUNK_ROWS, iter_range
+
+    n = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        for chunk in iter_range(kind, start_date, end_date, chunk_rows or CHUNK_ROWS, with_id=True):
+            chunk.to_csv(f, header=(n == 0), index=False, date_format="%Y-%m-%d")
+            n += len(chunk)
+        if n == 0:
+            # 행이 없어도 헤더는 남김
+            from utils.storage import INCOME_COLS, EXPENSE_COLS
+
+            pd.DataFrame(columns=["id"] + (INCOME_COLS if kind == "income" else EXPENSE_COLS)).to_csv(f, index=False)
+    return n
+
+def _parquet_schema(kind: str):
+    import pyarrow as pa
+    from utils.storage import KIND_COLS
+
+    item_col, detail_col = KIND_COLS[kind]
+    return pa.schema([
+        ("id", pa.int64()),
+        ("날짜", pa.date32()),
+        ("적요", pa.string()),
+        (item_col, pa.string()),
+        (detail_col, pa.string()),
+        ("금액", pa.float64()),
+        ("비고", pa.string()),
+    ])
+
+def write_range_parquet(
+    kind: str,
+    path: str,
+    start_date: Optional[dt.date] = None,
+    end_date: Optional[dt.date] = None,
+    chunk_rows: Optional[int] = None,
+) -> int:
+    """
+    수입/지출(kind) 행을 Parquet으로 저장하고 행 수를 반환합니다(조각마다 row group 1개).
+    pyarrow가 필요합니다(Streamlit 설치 시 함께 설치됨).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet으로 내보내려면 pyarrow가 필요합니다. (pip install pyarrow)")
+    from utils.storage import CHUNK_ROWS, iter_range
+
+    schema = _parquet_schema(kind)
+    n = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in iter_range(kind, start_date, end_date, chunk_rows or CHUNK_ROWS, with_id=True):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            n += len(chunk)
+    return n
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+입력 화면 옆 비교표: 지금 입력 중인 날짜의 항목별 합계를 지난주 같은 요일, 작년 같은 주일과 나란히 보여 줍니다.
+
+비교할 날짜의 합계는 날짜를 고를 때 한 번만 daily_totals에서 읽고(날짜 2개 인덱스 조회),
+입력할 때마다 다시 실행되는 부분은 화면에 있는 표(입력 중인 값)만 pandas로 합산합니다.
+Streamlit에 의존하지 않습니다.
+"""
+import datetime as dt
+from dataclasses import dataclass
+
+import pandas as pd
+
+from utils.storage import day_item_totals, item_names, KIND_COLS
+from utils.church_calendar import same_day_last_year
+
+# 지난주 대비 이 배수 이상 크거나 작으면 확인 표시(0을 하나 더/덜 입력한 경우 등)
+TYPO_RATIO = 5.0
+
+@dataclass(frozen=True)
+class DayHistory:
+    d: dt.date
+    last_week: dt.date
+    last_year: dt.date
+    totals: dict  # {(date, kind): {항목명: 금액}}
+
+def load_history(d: dt.date) -> DayHistory:
+    last_week = d - dt.timedelta(days=7)
+    last_year = same_day_last_year(d)
+    return DayHistory(d=d, last_week=last_week, last_year=last_year, totals=day_item_totals([last_week, last_year]))
+
+def compare_table(history: DayHistory, kind: str, current: pd.DataFrame) -> pd.DataFrame:
+    """
+    항목별 [항목, 이번, 지난주, 작년, 확인] 표. current는 입력 중인 표(저장 전 값).
+    이번 값이 지난주보다 TYPO_RATIO배 이상 크거나 작으면 '확인'에 표시합니다.
+    """
+    item_col = KIND_COLS[kind][0]
+    amounts = pd.to_numeric(current["금액"], errors="coerce")
+    has_amount = amounts.notna()
+    now = amounts[has_amount].groupby(current.loc[has_amount, item_col].fillna("(항목 없음)")).sum().to_dict()
+    week = {k or "(항목 없음)": v for k, v in history.totals.get((history.last_week, kind), {}).items()}
+    year = {k or "(항목 없음)": v for k, v in history.totals.get((history.last_year, kind), {}).items()}
+
+    # 항목 순서는 입력 화면과 같게(등록 순서), 등록되지 않은 항목은 뒤로
+    order = {name: i for i, name in enumerate(item_names(kind))}
+    rows = []
+    for item in sorted(set(now) | set(week) | set(year), key=lambda x: (order.get(x, len(order)), x)):
+        cur, prev = now.get(item, 0.0), week.get(item, 0.0)
+        check = ""
+        if cur and prev and max(cur / prev, prev / cur) >= TYPO_RATIO:
+            check = f"⚠️ 지난주의 {cur / prev:.0f}배" if cur > prev else f"⚠️ 지난주의 1/{prev / cur:.0f}"
+        rows.append({"항목": item, "이번": cur, "지난주": prev, "작년": year.get(item, 0.0), "확인": check})
+    return pd.DataFrame(rows, columns=["항목", "이번", "지난주", "작년", "확인"])
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+복식부기(선택 기능): 계정과목, 분개(차변/대변), 시산표.
+
+- 지금의 수입/지출 장부(단식)는 그대로 두고, 옆에 분개장을 함께 둡니다. enable()로 켭니다.
+- 장부에서 만드는 분개: 날짜 x 수입/지출마다 1개를 daily_totals에서 만듭니다(storage._refresh_journal).
+  장부를 저장하면 같은 트랜잭션에서 바뀐 날짜의 분개만 다시 만듭니다.
+  수입: (차) 현금/은행 / (대) 항목 계정, 지출: (차) 항목 계정 / (대) 현금/은행.
+- 예치금/이월금/대출금처럼 단식 장부에서는 수입/지출로 적고 순합계에서 빼던 항목은
+  자산/순자산/부채 계정으로 연결해, 수입/지출이 아닌 자금 이동으로 분개합니다(항목별 계정은 바꿀 수 있음).
+- 현금 ↔ 은행 이체처럼 장부에 적지 않는 거래는 수기 분개(post_entry)로 입력합니다. 차변 합계 = 대변 합계여야 합니다.
+- 계정별 월 합계(account_balance)를 분개와 같은 트랜잭션에서 다시 계산해 두므로, 시산표는 기간 안의 월 합계와
+  기간 앞뒤 자투리 날짜의 분개 줄만 읽습니다(분개 전체를 합산하지 않음).
+- 수기 분개는 장부 사본 동기화(utils.sync) 대상이 아닙니다. 장부에서 만드는 분개는 각 사본에서 다시 만들어집니다.
+Streamlit에 의존하지 않습니다.
+"""
+import calendar
+import datetime as dt
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from utils import storage
+
+ACCOUNT_TYPES = {"asset": "자산", "liability": "부채", "equity": "순자산", "income": "수입", "expense": "지출"}
+# 잔액을 차변 쪽으로 보는 계정(나머지는 대변 쪽)
+DEBIT_NORMAL = {"asset", "expense"}
+
+# 기본 계정과목(항목 계정 4xxx/5xxx는 항목 목록에서 자동으로 만듦)
+BASE_ACCOUNTS = [
+    (storage.USAGE_ACCOUNTS["현금"], "현금", "asset"),
+    (storage.USAGE_ACCOUNTS["은행"], "은행", "asset"),
+    ("103", "예치금", "asset"),
+    (storage.NO_USAGE_ACCOUNT, "적요 미지정 자금", "asset"),
+    ("201", "대출금", "liability"),
+    ("301", "이월금", "equity"),
+    (storage.NO_ITEM_ACCOUNTS["income"], "항목 미지정 수입", "income"),
+    (storage.NO_ITEM_ACCOUNTS["expense"], "항목 미지정 지출", "expense"),
+]
+# 수입/지출로 적지만 실제로는 자금 이동인 항목 → 계정(수입/지출 항목 모두)
+DEFAULT_CATEGORY_ACCOUNTS = {"예치금": "103", "이월금": "301", "대출금": "201"}
+
+# 시산표에서 기간 이전 수입-지출 누계를 보여 주는 줄(순자산)
+RETAINED_CODE = "399"
+RETAINED_NAME = "전기까지 수지차액"
+
+def enabled() -> bool:
+    storage.init_db()
+    conn = storage._connect()
+    on = storage._journal_enabled(conn.cursor())
+    conn.close()
+    return on
+
+def enable() -> int:
+    """
+    복식부기를 켭니다: 기본 계정과목과 항목별 계정을 만들고 장부 전체의 분개를 만듭니다(이미 켜져 있으면 다시 만듦).
+    만든 분개 수를 반환합니다.
+    """
+    storage.init_db()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            cur.executemany("INSERT OR IGNORE INTO account (code, name, type) VALUES (?, ?, ?)", BASE_ACCOUNTS)
+            for name, account in DEFAULT_CATEGORY_ACCOUNTS.items():
+                cur.execute("UPDATE category SET account=? WHERE name=? AND account IS NULL", (account, name))
+            storage._refresh_journal(cur)
+            (n,) = cur.execute("SELECT COUNT(*) FROM journal_entry WHERE source='ledger'").fetchone()
+    finally:
+        conn.close()
+    return int(n)
+
+def accounts() -> pd.DataFrame:
+    """계정과목(code, name, type) 코드순"""
+    storage.init_db()
+    conn = storage._connect()
+    df = pd.read_sql_query("SELECT code, name, type FROM account ORDER BY code", conn)
+    conn.close()
+    return df
+
+def add_account(code: str, name: str, type_: str) -> None:
+    code, name = (code or "").strip(), (name or "").strip()
+    if type_ not in ACCOUNT_TYPES:
+        raise ValueError(f"알 수 없는 계정 구분: {type_}")
+    if not code or not name:
+        raise ValueError("계정코드와 계정 이름을 입력해 주세요.")
+    storage.init_db()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            if cur.execute("SELECT 1 FROM account WHERE code=?", (code,)).fetchone():
+                raise ValueError(f"이미 있는 계정코드입니다: {code}")
+            cur.execute("INSERT INTO account (code, name, type) VALUES (?, ?, ?)", (code, name, type_))
+    finally:
+        conn.close()
+
+def category_accounts() -> pd.DataFrame:
+    """항목별 연결 계정: code, kind, name, account(따로 정하지 않았으면 None), 실제로 쓰는 계정코드 used"""
+    cats = storage.load_categories()
+    storage.init_db()
+    conn = storage._connect()
+    mapped = dict(conn.execute("SELECT code, account FROM category").fetchall())
+    conn.close()
+    out = cats[["code", "kind", "name"]].copy()
+    out["account"] = pd.Series([mapped.get(c) for c in out["code"]], index=out.index, dtype=object)
+    out["used"] = [
+        acc or storage.category_account_code(kind, code) for code, kind, acc in zip(out["code"], out["kind"], out["account"])
+    ]
+    return out
+
+def set_category_account(category_code: int, account: Optional[str]) -> None:
+    """항목이 쓰는 계정을 바꾸고(None이면 항목 자기 계정) 장부 전체의 자동 분개를 다시 만듭니다."""
+    storage.init_db()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            if account is not None and cur.execute("SELECT 1 FROM account WHERE code=?", (account,)).fetchone() is None:
+                raise ValueError(f"없는 계정코드입니다: {account}")
+            cur.execute("UPDATE category SET account=? WHERE code=?", (account, int(category_code)))
+            storage._refresh_journal(cur)
+    finally:
+        conn.close()
+
+def post_entry(d: dt.date, memo: Optional[str], lines: list, actor: Optional[str] = None) -> int:
+    """
+    수기 분개를 저장하고 분개 번호를 반환합니다. lines: [(계정코드, 차변, 대변)], 빈 줄은 무시.
+    줄마다 차변/대변 중 한쪽에만 금액이 있어야 하고, 2줄 이상, 차변 합계 = 대변 합계여야 합니다(아니면 ValueError).
+    마감된 기간의 날짜면 PeriodClosedError.
+    """
+    clean = []
+    for account, debit, credit in lines:
+        debit = float(debit) if debit is not None and not pd.isna(debit) else 0.0
+        credit = float(credit) if credit is not None and not pd.isna(credit) else 0.0
+        account = str(account).strip() if account is not None and not pd.isna(account) else ""
+        if not account and not debit and not credit:
+            continue
+        if not account:
+            raise ValueError("계정을 고르지 않은 줄이 있습니다.")
+        if debit < 0 or credit < 0 or bool(debit) == bool(credit):
+            raise ValueError("각 줄은 차변과 대변 중 한쪽에만 0보다 큰 금액을 적습니다.")
+        clean.append((account, debit, credit))
+    if len(clean) < 2:
+        raise ValueError("분개는 2줄 이상이어야 합니다.")
+    total_dr, total_cr = sum(l[1] for l in clean), sum(l[2] for l in clean)
+    if round(total_dr - total_cr, 2) != 0:
+        raise ValueError(f"차변 합계(₩{total_dr:,.0f})와 대변 합계(₩{total_cr:,.0f})가 같아야 합니다.")
+
+    storage.init_db()
+    ds = d.isoformat()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            if not storage._journal_enabled(cur):
+                raise ValueError("복식부기를 먼저 켜 주세요.")
+            known = {r[0] for r in cur.execute("SELECT code FROM account")}
+            missing = sorted({l[0] for l in clean} - known)
+            if missing:
+                raise ValueError(f"없는 계정코드입니다: {', '.join(missing)}")
+            period = storage._closed_period(cur, ds)
+            if period is not None:
+                raise storage.PeriodClosedError(d, period)
+            cur.execute(
+                "INSERT INTO journal_entry (d, memo, source, created_at, actor) VALUES (?, ?, 'manual', ?, ?)",
+                (ds, (memo or "").strip() or None, dt.datetime.now().isoformat(timespec="seconds"), actor),
+            )
+            entry_id = cur.lastrowid
+            cur.executemany(
+                "INSERT INTO journal_line (entry_id, d, account, debit, credit) VALUES (?, ?, ?, ?, ?)",
+                [(entry_id, ds, account, dr, cr) for account, dr, cr in clean],
+            )
+            storage._refresh_account_months(cur, {ds[:7]})
+    finally:
+        conn.close()
+    return int(entry_id)
+
+def delete_entry(entry_id: int) -> bool:
+    """수기 분개를 지웁니다(장부에서 만든 분개는 장부를 고쳐야 바뀜). 지웠으면 True."""
+    storage.init_db()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            row = cur.execute("SELECT d FROM journal_entry WHERE id=? AND source='manual'", (int(entry_id),)).fetchone()
+            if row is None:
+                return False
+            period = storage._closed_period(cur, row[0])
+            if period is not None:
+                raise storage.PeriodClosedError(dt.date.fromisoformat(row[0]), period)
+            cur.execute("DELETE FROM journal_line WHERE entry_id=?", (int(entry_id),))
+            cur.execute("DELETE FROM journal_entry WHERE id=?", (int(entry_id),))
+            storage._refresh_account_months(cur, {row[0][:7]})
+    finally:
+        conn.close()
+    return True
+
+def entries(start_date: dt.date, end_date: dt.date, source: Optional[str] = None) -> pd.DataFrame:
+    """분개장(줄 단위): 번호, 날짜, 적요, 구분(source), 계정코드, 계정과목, 차변, 대변. source: 'ledger'/'manual'/None(전체)"""
+    storage.init_db()
+    conn = storage._connect()
+    sql = (
+        "SELECT e.id AS 번호, e.d AS 날짜, e.memo AS 적요, e.source AS 구분, l.account AS 계정코드, "
+        "a.name AS 계정과목, l.debit AS 차변, l.credit AS 대변 "
+        "FROM journal_entry e JOIN journal_line l ON l.entry_id = e.id LEFT JOIN account a ON a.code = l.account "
+        "WHERE e.d BETWEEN ? AND ?"
+    )
+    params = [start_date.isoformat(), end_date.isoformat()]
+    if source is not None:
+        sql += " AND e.source=?"
+        params.append(source)
+    df = pd.read_sql_query(sql + " ORDER BY e.d, e.id, l.id", conn, params=params)
+    conn.close()
+    return df
+
+# ---------------------------------------------------------------------------
+# 시산표
+# ---------------------------------------------------------------------------
+@dataclass(frozen=True)
+class TrialBalance:
+    start: dt.date
+    end: dt.date
+    rows: pd.DataFrame       # 계정코드, 계정과목, 구분, 기초, 차변, 대변, 기말(기초/기말은 계정의 잔액 쪽 기준 금액)
+    debit_total: float       # 기간 차변 합계
+    credit_total: float      # 기간 대변 합계
+    balance_debit: float     # 기말 차변 잔액 합계
+    balance_credit: float    # 기말 대변 잔액 합계
+
+    @property
+    def balanced(self) -> bool:
+        return round(self.debit_total - self.credit_total, 2) == 0 and round(self.balance_debit - self.balance_credit, 2) == 0
+
+def _month_end(d: dt.date) -> dt.date:
+    return d.replace(day=calendar.monthrange(d.year, d.month)[1])
+
+def _sums(cur, start: Optional[dt.date], end: dt.date) -> dict:
+    """
+    start~end(start가 None이면 처음부터) 계정별 [차변, 대변].
+    온전히 들어 있는 달은 월 합계(account_balance)로, 앞뒤 자투리 날짜만 분개 줄에서 더합니다.
+    """
+    out: dict = {}
+
+    def add(rows):
+        for account, dr, cr in rows:
+            acc = out.setdefault(account, [0.0, 0.0])
+            acc[0] += dr or 0.0
+            acc[1] += cr or 0.0
+
+    first_full = None if start is None else (start if start.day == 1 else _month_end(start) + dt.timedelta(days=1))
+    last_full = end if end == _month_end(end) else end.replace(day=1) - dt.timedelta(days=1)
+    if first_full is None or first_full <= last_full:
+        sql = "SELECT account, SUM(debit), SUM(credit) FROM account_balance WHERE month <= ?"
+        params = [last_full.isoformat()[:7]]
+        if first_full is not None:
+            sql += " AND month >= ?"
+            params.append(first_full.isoformat()[:7])
+        add(cur.execute(sql + " GROUP BY account", params))
+        edges = [(start, first_full - dt.timedelta(days=1))] if first_full is not None else []
+        edges.append((last_full + dt.timedelta(days=1), end))
+    else:
+        edges = [(start, end)]
+    for a, b in edges:
+        if a <= b:
+            add(cur.execute(
+                "SELECT account, SUM(debit), SUM(credit) FROM journal_line WHERE d BETWEEN ? AND ? GROUP BY account",
+                (a.isoformat(), b.isoformat()),
+            ))
+    return out
+
+def trial_balance(start_date: dt.date, end_date: dt.date) -> TrialBalance:
+    """
+    start~end 시산표. 자산/부채/순자산 계정은 기초(start 전까지 누계) + 기간 차변/대변 = 기말,
+    수입/지출 계정은 기간 발생액만 보여 주고, start 전까지의 수입-지출 누계는 순자산 '전기까지 수지차액' 줄로 보여 줍니다.
+    """
+    storage.init_db()
+    conn = storage._connect()
+    try:
+        cur = conn.cursor()
+        chart = {code: (name, type_) for code, name, type_ in cur.execute("SELECT code, name, type FROM account")}
+        opening = _sums(cur, None, start_date - dt.timedelta(days=1))
+        period = _sums(cur, start_date, end_date)
+    finally:
+        conn.close()
+
+    retained = 0.0  # 대변 쪽(+) 금액
+    rows = []
+    for code in sorted(set(opening) | set(period)):
+        name, type_ = chart.get(code, ("(삭제된 계정)", "asset"))
+        sign = 1.0 if type_ in DEBIT_NORMAL else -1.0
+        o_dr, o_cr = opening.get(code, (0.0, 0.0))
+        if type_ in ("income", "expense"):
+            retained += o_cr - o_dr
+            o_dr = o_cr = 0.0
+        p_dr, p_cr = period.get(code, (0.0, 0.0))
+        if not (o_dr or o_cr or p_dr or p_cr):
+            continue
+        rows.append({
+            "계정코드": code, "계정과목": name, "구분": ACCOUNT_TYPES.get(type_, type_),
+            "기초": sign * (o_dr - o_cr) + 0.0, "차변": p_dr, "대변": p_cr, "기말": sign * (o_dr - o_cr + p_dr - p_cr) + 0.0,
+            "_net": o_dr - o_cr + p_dr - p_cr,
+        })
+    if round(retained, 2):
+        rows.append({
+            "계정코드": RETAINED_CODE, "계정과목": RETAINED_NAME, "구분": ACCOUNT_TYPES["equity"],
+            "기초": retained, "차변": 0.0, "대변": 0.0, "기말": retained, "_net": -retained,
+        })
+    df = pd.DataFrame(rows, columns=["계정코드", "계정과목", "구분", "기초", "차변", "대변", "기말", "_net"])
+    df = df.sort_values("계정코드", kind="stable").reset_index(drop=True)
+    net = df.pop("_net")
+    return TrialBalance(
+        start=start_date, end=end_date, rows=df,
+        debit_total=float(df["차변"].sum()), credit_total=float(df["대변"].sum()),
+        balance_debit=float(net[net > 0].sum()), balance_credit=float(-net[net < 0].sum()),
+    )
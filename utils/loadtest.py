@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+동시 접속 부하 테스트(streamlit.testing.v1.AppTest).
+
+세션 N개를 동시에 돌리며(세션마다 작업 프로세스 1개), 세션마다 실제 사용자처럼
+로그인(app.py) → 입력 페이지에서 날짜 바꾸기/표 편집/지금 저장 → 보고 페이지에서 보고 모드/날짜 바꾸기
+를 rounds 번 반복하고, 동작별 재실행(rerun) 시간 백분위수와 세션당 메모리 증가량을 출력합니다.
+
+- 측정하는 시간은 서버에서 페이지 스크립트를 한 번 다시 실행하는 시간입니다(브라우저 전송/그리기 제외).
+- 기본으로 데이터 폴더를 임시 폴더에 복사해 그 복사본에 저장합니다(실제 장부는 바뀌지 않음).
+  --in-place 를 주면 복사하지 않고 현재 데이터 폴더를 그대로 사용합니다.
+- 메모리는 RSS 기준: 작업 프로세스가 준비(모듈/캐시)를 마친 뒤부터 세션을 끝까지 진행했을 때 늘어난 양입니다.
+- 세션이 서로 다른 프로세스에서 돌기 때문에 DB 잠금/디스크 경합은 실제와 같지만, 실제 서버(프로세스 1개)의
+  GIL 경합은 재현하지 않습니다. CPU 코어 수보다 세션이 많으면 그만큼 느려집니다.
+
+사용 예:
+    python -m utils.loadtest --sessions 8 --rounds 3
+    python -m utils.loadtest --sessions 20 --rounds 5 --json loadtest.json
+"""
+import os
+import sys
+import json
+import math
+import queue
+import time
+import random
+import logging
+import shutil
+import sqlite3
+import tempfile
+import argparse
+import multiprocessing
+from collections import defaultdict
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(_ROOT, "app.py")
+INPUT_PAGE = os.path.join(_ROOT, "pages", "1_재정장부_입력.py")
+REPORT_PAGE = os.path.join(_ROOT, "pages", "2_재정장부_보고.py")
+
+# 페이지 스크립트 한 번 실행 제한 시간(초)
+RUN_TIMEOUT_SEC = 120.0
+# 작업 프로세스 준비(모듈/캐시, 첫 로그인) 제한 시간, 준비 후 세션 전체를 마칠 제한 시간(초)
+READY_TIMEOUT_SEC = 600.0
+SESSION_TIMEOUT_SEC = 3600.0
+PERCENTILES = (50, 90, 95, 99)
+
+def _rss_bytes() -> int:
+    """현재 프로세스의 RSS(바이트)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource  # /proc이 없는 환경: 최대 RSS로 대신(macOS는 바이트, 리눅스는 KB)
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+def copy_data_dir(src_dir: str, dest_dir: str) -> None:
+    """장부 목록과 장부 DB를 복사합니다(DB는 backup API로 복사하므로 앱 실행 중에도 일관된 사본)."""
+    for root, _, files in os.walk(src_dir):
+        rel = os.path.relpath(root, src_dir)
+        if rel.split(os.sep)[0] == "backups":
+            continue
+        os.makedirs(os.path.join(dest_dir, rel), exist_ok=True)
+        for name in files:
+            src, dest = os.path.join(root, name), os.path.join(dest_dir, rel, name)
+            if name.endswith(".db"):
+                with sqlite3.connect(src) as s, sqlite3.connect(dest) as d:
+                    s.backup(d)
+            elif name == "ledgers.json":
+                shutil.copyfile(src, dest)
+
+def percentile(values: list[float], p: float) -> float:
+    """최근접 순위 방식 백분위수"""
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+class Session:
+    """가상 사용자 1명(페이지마다 AppTest 1개, 로그인 상태는 페이지 사이에 이어 줌)"""
+
+    def __init__(self, idx: int, username: str, password: str, seed: int):
+        self.idx = idx
+        self.username = username
+        self.password = password
+        self.rng = random.Random(seed)
+        self.timings: list[tuple[str, float]] = []
+        self.errors: list[str] = []
+        self.conflicts = 0
+        self.pages: dict = {}
+
+    def _run(self, action: str, at) -> None:
+        t0 = time.perf_counter()
+        at.run(timeout=RUN_TIMEOUT_SEC)
+        self.timings.append((action, time.perf_counter() - t0))
+        for e in at.exception:
+            self.errors.append(f"{action}: {e.value}")
+
+    def _page(self, path: str):
+        from streamlit.testing.v1 import AppTest
+
+        at = self.pages.get(path)
+        if at is None:
+            at = AppTest.from_file(path, default_timeout=RUN_TIMEOUT_SEC)
+            at.session_state["authenticated"] = True
+            at.session_state["username"] = self.username
+            self.pages[path] = at
+        return at
+
+    def login(self) -> None:
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(APP, default_timeout=RUN_TIMEOUT_SEC)
+        self._run("로그인 화면", at)
+        at.text_input[0].input(self.username)
+        at.text_input[1].input(self.password)
+        next(b for b in at.button if b.label == "로그인").click()
+        self._run("로그인", at)
+        if not at.session_state["authenticated"]:
+            self.errors.append("로그인 실패")
+        self.pages[APP] = at
+
+    def input_round(self) -> None:
+        at = self._page(INPUT_PAGE)
+        self._run("입력: 열기", at)
+        # 날짜 바꾸기(월 → 주일)
+        at.selectbox(key="in_m").select(self.rng.randint(1, 12))
+        self._run("입력: 월 변경", at)
+        sun = at.selectbox(key="in_sunday")
+        sun.select_index(self.rng.randrange(len(sun.options)))
+        self._run("입력: 주일 변경", at)
+
+        # 표 편집: 첫 빈 행에 헌금 1건 입력(편집기 상태를 바꾸는 것 = 브라우저에서 셀을 고친 것)
+        work = at.session_state["in_income_work"]
+        row = int(work.index[work["금액"].isna()][0])
+        edit = {"수입항목": "주일헌금", "수입내역": f"부하{self.idx}", "금액": self.rng.randint(1, 100) * 1000}
+        at.session_state[f"income_editor_{at.session_state['in_selected_date']}"] = {
+            "edited_rows": {row: edit}, "added_rows": [], "deleted_rows": [],
+        }
+        self._run("입력: 표 편집", at)
+        at.button(key="save_now_btn").click()
+        self._run("입력: 지금 저장", at)
+        if "in_conflict" in at.session_state and at.session_state["in_conflict"]:
+            # 다른 세션이 같은 날짜를 먼저 저장함 → 다시 불러오기
+            self.conflicts += 1
+            at.button(key="conflict_reload_btn").click()
+            self._run("입력: 충돌 후 다시 불러오기", at)
+
+    def report_round(self) -> None:
+        from utils.reports import REPORT_MODES
+
+        at = self._page(REPORT_PAGE)
+        self._run("보고: 열기", at)
+        for mode in self.rng.sample(REPORT_MODES, len(REPORT_MODES)):
+            if at.session_state["report_mode"] != mode:
+                at.checkbox(key=f"cb_{mode}").check()
+                self._run("보고: 모드 변경", at)
+        sun = at.selectbox(key="rp_sunday")
+        sun.select_index(self.rng.randrange(len(sun.options)))
+        self._run("보고: 날짜 변경", at)
+
+    def run(self, rounds: int) -> None:
+        try:
+            self.login()
+            for _ in range(rounds):
+                self.input_round()
+                self.report_round()
+        except Exception as e:
+            self.errors.append(f"중단: {type(e).__name__}: {e}")
+
+def _session_process(idx: int, rounds: int, seed: int, start, results) -> None:
+    """
+    세션 1개를 실행하는 작업 프로세스.
+    AppTest는 실행할 때마다 프로세스 전체의 Streamlit 런타임을 바꿔 끼우므로 한 프로세스에서 여러 세션을
+    동시에 돌릴 수 없어, 세션마다 프로세스를 따로 띄웁니다.
+    """
+    from utils.auth import ALLOWED_ADMINS
+    from utils.autosave import queue
+    from utils.warmup import warm_up
+
+    logging.disable(logging.WARNING)  # 페이지 실행 중 경고 로그가 결과를 가리지 않도록
+    cred = ALLOWED_ADMINS[0]
+    # 모듈 불러오기/캐시 채우기 비용이 측정에 섞이지 않도록 미리 준비하고 1회 실행
+    warm_up()
+    Session(-1, cred.username, cred.password, seed).login()
+    rss_start = _rss_bytes()
+
+    user = Session(idx, cred.username, cred.password, seed + idx)
+    start.wait(READY_TIMEOUT_SEC)  # 모든 세션이 준비되면 동시에 시작
+    user.run(rounds)
+    queue.flush()
+    results.put({
+        "timings": user.timings,
+        "errors": user.errors,
+        "conflicts": user.conflicts,
+        "rss_start": rss_start,
+        "rss_growth": _rss_bytes() - rss_start,  # 세션(AppTest)이 아직 살아 있는 상태
+    })
+
+def _check_exitcodes(procs: list) -> None:
+    failed = {p.name: p.exitcode for p in procs if p.exitcode}
+    if failed:
+        raise RuntimeError(f"작업 프로세스 실패(종료 코드): {failed}")
+
+def _wait_ready(procs: list, start) -> None:
+    """모든 작업 프로세스가 준비를 마치고 start(Barrier)에서 기다리면 함께 출발합니다."""
+    deadline = time.perf_counter() + READY_TIMEOUT_SEC
+    while start.n_waiting < len(procs):
+        # 준비 중 죽은 프로세스가 있으면 Barrier가 영영 차지 않으므로 바로 실패
+        _check_exitcodes(procs)
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"작업 프로세스가 {READY_TIMEOUT_SEC:.0f}초 안에 준비되지 않았습니다")
+        time.sleep(0.2)
+    start.wait(READY_TIMEOUT_SEC)
+
+def _collect(procs: list, results, deadline: float) -> list[dict]:
+    """작업 프로세스마다 결과 1개를 받습니다. 결과 없이 끝난 프로세스가 있거나 deadline이 지나면 RuntimeError."""
+    outs = []
+    while len(outs) < len(procs):
+        try:
+            outs.append(results.get(timeout=1.0))
+            continue
+        except queue.Empty:
+            pass
+        # 결과를 보내기 전에 끝난 프로세스(예외/강제 종료)는 종료 코드가 0이 아님
+        _check_exitcodes(procs)
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"세션이 {SESSION_TIMEOUT_SEC:.0f}초 안에 끝나지 않았습니다({len(outs)}/{len(procs)}개 완료)")
+    return outs
+
+def run_load(sessions: int, rounds: int, seed: int = 0) -> dict:
+    """세션 sessions개를 동시에 실행하고 결과(동작별 시간 백분위수, 메모리, 오류)를 반환합니다."""
+    # fork로 부모의 SQLite 연결을 물려받지 않도록 spawn 사용
+    ctx = multiprocessing.get_context("spawn")
+    start = ctx.Barrier(sessions + 1)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_session_process, args=(i, rounds, seed, start, results), name=f"load-{i}")
+        for i in range(sessions)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        _wait_ready(procs, start)
+        t0 = time.perf_counter()
+        outs = _collect(procs, results, t0 + SESSION_TIMEOUT_SEC)
+        wall = time.perf_counter() - t0
+    except BaseException:
+        # 실패/시간 초과: 남은 작업 프로세스 정리(종료 코드가 있으면 그 내용으로 알림)
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        _check_exitcodes(procs)
+        raise
+    for p in procs:
+        p.join()
+    _check_exitcodes(procs)
+
+    by_action = defaultdict(list)
+    for o in outs:
+        for action, sec in o["timings"]:
+            by_action[action].append(sec)
+    all_times = [sec for o in outs for _, sec in o["timings"]]
+
+    def summary(values: list[float]) -> dict:
+        out = {"count": len(values), "mean": sum(values) / len(values), "max": max(values)}
+        out.update({f"p{p}": percentile(values, p) for p in PERCENTILES})
+        return out
+
+    growth = sorted(o["rss_growth"] for o in outs)
+    return {
+        "sessions": sessions,
+        "rounds": rounds,
+        "wall_sec": wall,
+        "reruns_per_sec": len(all_times) / wall if wall else 0.0,
+        "overall": summary(all_times) if all_times else {},
+        "actions": {a: summary(v) for a, v in by_action.items()},
+        "rss_base": sum(o["rss_start"] for o in outs) / len(outs),
+        "rss_per_session": sum(growth) / len(growth),
+        "rss_per_session_max": growth[-1],
+        "conflicts": sum(o["conflicts"] for o in outs),
+        "errors": [e for o in outs for e in o["errors"]],
+    }
+
+def print_report(r: dict) -> None:
+    cols = ["count", "mean"] + [f"p{p}" for p in PERCENTILES] + ["max"]
+    print(f"세션 {r['sessions']}개 x {r['rounds']}회, 전체 {r['wall_sec']:.1f}초, 초당 재실행 {r['reruns_per_sec']:.1f}회")
+    print(f"{'동작':<24}" + "".join(f"{c:>9}" for c in cols))
+    rows = list(r["actions"].items()) + [("전체", r["overall"])]
+    for action, s in rows:
+        if not s:
+            continue
+        vals = [f"{s['count']:>9}"] + [f"{s[c] * 1000:>7.0f}ms" for c in cols[1:]]
+        print(f"{action:<24}" + "".join(vals))
+    mb = 1024 * 1024
+    print(
+        f"메모리(RSS): 준비 후 프로세스 {r['rss_base'] / mb:,.1f} MB, "
+        f"세션당 증가 평균 {r['rss_per_session'] / mb:,.2f} MB / 최대 {r['rss_per_session_max'] / mb:,.2f} MB"
+    )
+    print(f"저장 충돌: {r['conflicts']}건")
+    if r["errors"]:
+        print(f"오류 {len(r['errors'])}건:")
+        for e in r["errors"][:20]:
+            print(f"  {e}")
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.loadtest", description="동시 접속 부하 테스트(AppTest)")
+    parser.add_argument("--sessions", type=int, default=5, help="동시 세션 수")
+    parser.add_argument("--rounds", type=int, default=3, help="세션마다 입력/보고 반복 횟수")
+    parser.add_argument("--seed", type=int, default=0, help="날짜/금액 선택용 난수 시드")
+    parser.add_argument("--in-place", action="store_true", help="데이터 폴더를 복사하지 않고 그대로 사용(실제 장부에 저장됨)")
+    parser.add_argument("--json", help="결과를 JSON 파일로도 저장")
+    args = parser.parse_args(argv)
+
+    # 앱 모듈(utils.tenants)을 불러오기 전에 데이터 폴더를 정해야 함
+    os.environ["CHURCH_WARMUP"] = "0"  # 준비 작업은 run_load에서 직접 실행
+    tmp_dir = None
+    if not args.in_place:
+        src = os.environ.get("CHURCH_DATA_DIR") or os.path.join(_ROOT, "data")
+        tmp_dir = tempfile.mkdtemp(prefix="church-loadtest-")
+        copy_data_dir(src, tmp_dir)
+        os.environ["CHURCH_DATA_DIR"] = tmp_dir
+    sys.path.insert(0, _ROOT)
+    try:
+        result = run_load(args.sessions, args.rounds, args.seed)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 1 if result["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
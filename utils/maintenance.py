@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+장부 DB 정리(유지보수).
+
+save_day는 바뀐 행만 고치지만, 저장할 때마다 지운 행과 바뀐 날짜의 daily_totals(지우고 다시 계산)가
+빈 페이지로 남고, 변경 이력(change_log)이 계속 늘면서 인덱스 페이지가 나뉘어 파일이 조각납니다.
+데이터가 늘어도 통계 정보(sqlite_stat1)는 저절로 갱신되지 않습니다. 정리 작업은 다음을 차례로 실행합니다.
+
+1. ANALYZE + PRAGMA optimize: 쿼리 계획용 통계 갱신
+2. 증분 VACUUM(PRAGMA incremental_vacuum): 빈 페이지를 파일에서 반납
+   - auto_vacuum이 INCREMENTAL이 아닌 DB는 처음 한 번 전체 VACUUM으로 변환합니다.
+   - full=True 이면 전체 VACUUM으로 페이지 순서까지 다시 정리합니다.
+3. WAL 체크포인트(TRUNCATE): -wal 파일 내용을 DB에 반영하고 비움
+4. 어떤 행에도 연결되지 않은 영수증 첨부 파일 삭제(utils.attachments)
+
+실행 전/후의 파일 크기와 조각화 통계를 maintenance_log 테이블에 기록하고, 관리 페이지에서 보여 줍니다.
+앱 실행 중에는 백그라운드 스레드가 한 시간마다 확인해 마지막 정리 후 INTERVAL_DAYS가 지난 장부를 정리합니다
+(환경변수 CHURCH_MAINTENANCE=0 이면 하지 않음).
+
+명령줄 사용:
+    python -m utils.maintenance run            (기본 장부 정리)
+    python -m utils.maintenance run --full     (전체 VACUUM 포함)
+    python -m utils.maintenance stats
+    python -m utils.maintenance --ledger <장부 코드> run
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+import datetime as dt
+from typing import Optional
+
+from utils import storage, tenants
+
+MAINTENANCE_ENV = "CHURCH_MAINTENANCE"
+
+# 정기 정리 주기(일)와 확인 간격(초)
+INTERVAL_DAYS = 7
+CHECK_EVERY_SEC = 3600.0
+
+# ANALYZE 시 인덱스마다 살펴볼 행 수 상한(0 = 전체)
+ANALYSIS_LIMIT = 1000
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+# 같은 장부를 동시에 정리하지 않도록
+_run_lock = threading.Lock()
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def db_stats() -> dict:
+    """
+    현재 장부 DB의 크기/조각화 통계:
+    file_bytes, wal_bytes, page_size, page_count, freelist_count,
+    free_pct(빈 페이지 비율), unused_pct(사용 중 페이지의 빈 공간 비율), frag_pct(순서가 끊긴 페이지 비율), auto_vacuum
+    """
+    storage.init_db()
+    path = storage.db_path()
+    conn = storage._connect()
+    try:
+        (page_size,) = conn.execute("PRAGMA page_size").fetchone()
+        (page_count,) = conn.execute("PRAGMA page_count").fetchone()
+        (freelist,) = conn.execute("PRAGMA freelist_count").fetchone()
+        (auto_vacuum,) = conn.execute("PRAGMA auto_vacuum").fetchone()
+        unused_pct = frag_pct = None
+        try:
+            # dbstat: 테이블/인덱스 페이지를 트리 순서로 돌려줌 → 이전 페이지 바로 다음 번호가 아니면 조각난 것으로 셈
+            rows = conn.execute("SELECT name, pageno, pgsize, unused FROM dbstat ORDER BY name, path").fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # dbstat 없이 빌드된 SQLite
+        if rows:
+            total = sum(r[2] for r in rows)
+            unused_pct = round(100.0 * sum(r[3] for r in rows) / total, 1) if total else 0.0
+            jumps = sum(1 for a, b in zip(rows, rows[1:]) if a[0] == b[0] and b[1] != a[1] + 1)
+            frag_pct = round(100.0 * jumps / len(rows), 1)
+    finally:
+        conn.close()
+    return {
+        "file_bytes": _file_size(path),
+        "wal_bytes": _file_size(path + "-wal"),
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist,
+        "free_pct": round(100.0 * freelist / page_count, 1) if page_count else 0.0,
+        "unused_pct": unused_pct,
+        "frag_pct": frag_pct,
+        "auto_vacuum": auto_vacuum,
+    }
+
+def run_maintenance(full: bool = False, trigger: str = "manual", actor: Optional[str] = None) -> dict:
+    """
+    현재 장부 DB를 정리하고 기록(maintenance_log)을 남깁니다.
+    반환: {"before", "after", "steps", "elapsed_sec"}
+    """
+    with _run_lock:
+        before = db_stats()
+        t0 = time.perf_counter()
+        steps = []
+        conn = storage._connect()
+        try:
+            conn.isolation_level = None  # VACUUM은 트랜잭션 밖에서만 실행 가능
+            conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+            steps.append("analyze")
+
+            if full or before["auto_vacuum"] != AUTO_VACUUM_INCREMENTAL:
+                # auto_vacuum 모드 변경은 전체 VACUUM 때 적용됨
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+                steps.append("vacuum")
+            else:
+                # execute()는 결과 컬럼이 없는 문장을 한 단계만 실행(페이지 1개만 반납)하므로 executescript로 끝까지 실행
+                conn.executescript("PRAGMA incremental_vacuum;")
+                steps.append("incremental_vacuum")
+
+            busy, log_pages, done = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            steps.append("checkpoint" if not busy else f"checkpoint(읽는 중 {done}/{log_pages})")
+        finally:
+            conn.close()
+        # 어떤 행에도 연결되지 않은 첨부 파일 삭제
+        from utils.attachments import prune_blobs
+
+        removed, _ = prune_blobs()
+        if removed:
+            steps.append(f"attachments(-{removed})")
+        elapsed = round(time.perf_counter() - t0, 3)
+        after = db_stats()
+
+        conn = storage._connect()
+        with storage._write_txn(conn) as cur:
+            cur.execute(
+                "INSERT INTO maintenance_log(ts, trigger, actor, steps, elapsed_sec, before_json, after_json) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    dt.datetime.now().isoformat(timespec="seconds"), trigger, actor, ",".join(steps), elapsed,
+                    json.dumps(before), json.dumps(after),
+                ),
+            )
+        conn.close()
+    return {"before": before, "after": after, "steps": steps, "elapsed_sec": elapsed}
+
+def maintenance_history(limit: int = 20) -> list[dict]:
+    """최근 정리 기록(최신순): [{"ts", "trigger", "actor", "steps", "elapsed_sec", "before", "after"}]"""
+    storage.init_db()
+    conn = storage._connect()
+    rows = conn.execute(
+        "SELECT ts, trigger, actor, steps, elapsed_sec, before_json, after_json "
+        "FROM maintenance_log ORDER BY id DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+    conn.close()
+    return [
+        {
+            "ts": ts, "trigger": trigger, "actor": actor, "steps": steps, "elapsed_sec": elapsed,
+            "before": json.loads(b), "after": json.loads(a),
+        }
+        for ts, trigger, actor, steps, elapsed, b, a in rows
+    ]
+
+def is_due(interval_days: int = INTERVAL_DAYS) -> bool:
+    """마지막 정리 후 interval_days가 지났으면(또는 정리한 적이 없으면) True"""
+    last = maintenance_history(limit=1)
+    if not last:
+        return True
+    return dt.datetime.now() - dt.datetime.fromisoformat(last[0]["ts"]) >= dt.timedelta(days=interval_days)
+
+def run_due_all(interval_days: int = INTERVAL_DAYS) -> list[str]:
+    """정리할 때가 된 모든 장부를 정리하고, 정리한 장부 코드 목록을 반환합니다."""
+    done = []
+    for ledger in tenants.list_ledgers():
+        with tenants.use_ledger(ledger.key):
+            if is_due(interval_days):
+                run_maintenance(trigger="schedule")
+                done.append(ledger.key)
+    return done
+
+def _scheduler_loop() -> None:
+    while True:
+        try:
+            run_due_all()
+        except Exception as e:
+            print(f"[maintenance] 정기 정리 실패: {e}", file=sys.stderr)
+        time.sleep(CHECK_EVERY_SEC)
+
+def start_scheduler() -> bool:
+    """프로세스당 한 번만 정기 정리 스레드를 시작합니다. 시작했으면 True."""
+    global _scheduler_started
+    if os.environ.get(MAINTENANCE_ENV, "1") == "0":
+        return False
+    with _scheduler_lock:
+        if _scheduler_started:
+            return False
+        _scheduler_started = True
+    threading.Thread(target=_scheduler_loop, name="maintenance", daemon=True).start()
+    return True
+
+def _print_stats(label: str, s: dict) -> None:
+    unused = "-" if s["unused_pct"] is None else f"{s['unused_pct']}%"
+    frag = "-" if s["frag_pct"] is None else f"{s['frag_pct']}%"
+    print(
+        f"{label}: 파일 {s['file_bytes'] / 1024:,.0f} KB, WAL {s['wal_bytes'] / 1024:,.0f} KB, "
+        f"빈 페이지 {s['freelist_count']:,}/{s['page_count']:,} ({s['free_pct']}%), 페이지 내 빈 공간 {unused}, 조각화 {frag}"
+    )
+
+def main(argv: list[str]) -> int:
+    if len(argv) >= 2 and argv[0] == "--ledger":
+        with tenants.use_ledger(argv[1]):
+            return main(argv[2:])
+    cmd = argv[0] if argv else "run"
+    if cmd == "run":
+        result = run_maintenance(full="--full" in argv, trigger="cli")
+        _print_stats("정리 전", result["before"])
+        _print_stats("정리 후", result["after"])
+        print(f"완료: {', '.join(result['steps'])} ({result['elapsed_sec']:.2f}초)")
+    elif cmd == "stats":
+        _print_stats("현재", db_stats())
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
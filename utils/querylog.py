@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+SQL 실행 기록(선택 기능): 느린 쿼리와 그 이유(실행 계획)를 찾기 위한 계측.
+
+- 기본은 꺼져 있습니다. CHURCH_QUERY_LOG=1 로 켜거나 관리 페이지에서 켭니다(enable()).
+- 켜져 있을 때만 tenants 라우터의 연결이 QueryLogCursor를 씁니다(꺼져 있으면 계측 비용 없음).
+- 문장마다 SQL, 파라미터 형태(값은 남기지 않음: 헌금자 이름 등), 반환 행 수, 걸린 시간(실행 + 행 읽기)을 기록합니다.
+- 같은 문장(공백 정리 후)끼리 합산하고, SLOW_MS 이상 걸린 실행은 EXPLAIN QUERY PLAN 결과와 함께
+  최근 SLOW_KEEP개를 따로 보관합니다. 모두 프로세스 메모리에만 있습니다(재시작하면 비워짐).
+"""
+import os
+import re
+import time
+import sqlite3
+import threading
+import datetime as dt
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Optional
+
+QUERY_LOG_ENV = "CHURCH_QUERY_LOG"
+SLOW_MS_ENV = "CHURCH_SLOW_QUERY_MS"
+
+# 이 시간(ms) 이상 걸린 실행은 느린 쿼리로 보고 실행 계획을 남김
+SLOW_MS = float(os.environ.get(SLOW_MS_ENV) or 50.0)
+# 합산해 둘 서로 다른 문장 수(넘으면 새 문장은 기록하지 않음)
+MAX_STATEMENTS = 500
+# 보관할 느린 실행 수(최근 것부터)
+SLOW_KEEP = 200
+
+# 실행 계획을 볼 수 있는 문장
+_PLAN_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+# 계획에서 인덱스 없이 테이블 전체를 읽는 줄: "SCAN income", "SCAN t" (USING ... INDEX 가 없는 것)
+_FULL_SCAN_RE = re.compile(r"^SCAN (\S+)(?: AS \S+)?$")
+
+@dataclass
+class QueryStat:
+    sql: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+    params: str = ""              # 가장 오래 걸린 실행의 파라미터 형태
+    slow_calls: int = 0
+    plan: Optional[str] = None    # 가장 오래 걸린 느린 실행의 실행 계획
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+@dataclass(frozen=True)
+class SlowQuery:
+    at: str
+    db: str
+    sql: str
+    params: str
+    rows: int
+    ms: float
+    plan: Optional[str]
+
+_enabled = os.environ.get(QUERY_LOG_ENV, "0") == "1"
+_lock = threading.Lock()
+_stats: dict[str, QueryStat] = {}
+_slow: deque = deque(maxlen=SLOW_KEEP)
+
+def enabled() -> bool:
+    return _enabled
+
+def enable(on: bool = True) -> None:
+    """기록 켜기/끄기. 이미 열려 있는 커서는 영향 없고, 이후 실행부터 적용됩니다."""
+    global _enabled
+    _enabled = bool(on)
+
+def set_slow_ms(ms: float) -> None:
+    global SLOW_MS
+    SLOW_MS = float(ms)
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _slow.clear()
+
+def normalize_sql(sql: str) -> str:
+    return " ".join(sql.split())
+
+def params_shape(params) -> str:
+    """파라미터의 개수와 형태만: (str, str, int), {d: str}, 없으면 ()"""
+    if params is None:
+        return "()"
+    name = lambda v: "null" if v is None else type(v).__name__
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {name(v)}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(name(v) for v in params) + ")"
+
+def plan_warnings(plan: Optional[str]) -> list[str]:
+    """실행 계획에서 인덱스가 빠졌을 수 있는 부분: 전체 스캔한 테이블, 임시 정렬"""
+    if not plan:
+        return []
+    out = []
+    for line in plan.splitlines():
+        line = line.strip()
+        m = _FULL_SCAN_RE.match(line)
+        if m:
+            out.append(f"전체 스캔: {m.group(1)}")
+        elif line.startswith("USE TEMP B-TREE"):
+            out.append("임시 정렬: " + line[len("USE TEMP B-TREE FOR "):])
+    return out
+
+def _explain(conn: sqlite3.Connection, sql: str, params) -> Optional[str]:
+    """EXPLAIN QUERY PLAN 결과를 들여쓴 트리 문자열로. 계측하지 않는 기본 커서를 씀."""
+    if not normalize_sql(sql).upper().startswith(_PLAN_PREFIXES):
+        return None
+    try:
+        cur = sqlite3.Cursor(conn)
+        rows = cur.execute("EXPLAIN QUERY PLAN " + sql, params if params is not None else ()).fetchall()
+        cur.close()
+    except sqlite3.Error:
+        return None
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return "\n".join(lines)
+
+def _record(conn: sqlite3.Connection, sql: str, params, rows: int, ms: float, explain: bool = True) -> None:
+    key = normalize_sql(sql)
+    slow = ms >= SLOW_MS
+    plan = _explain(conn, sql, params) if slow and explain else None
+    shape = params_shape(params)
+    with _lock:
+        st = _stats.get(key)
+        if st is None:
+            if len(_stats) >= MAX_STATEMENTS:
+                return
+            st = _stats[key] = QueryStat(sql=key)
+        st.calls += 1
+        st.total_ms += ms
+        st.rows += rows
+        if ms >= st.max_ms:
+            st.max_ms = ms
+            st.params = shape
+            if plan is not None:
+                st.plan = plan
+        if slow:
+            st.slow_calls += 1
+            _slow.append(SlowQuery(
+                at=dt.datetime.now().isoformat(timespec="seconds"),
+                db=os.path.basename(getattr(conn, "_pool_key", None) or ""),
+                sql=key, params=shape, rows=rows, ms=round(ms, 2), plan=plan,
+            ))
+
+class QueryLogCursor(sqlite3.Cursor):
+    """
+    실행 시간과 반환 행 수를 재는 커서.
+    SELECT는 행을 다 읽었을 때(또는 다음 실행/close 때) 실행 시간 + 행 읽는 시간을 합쳐 기록합니다.
+    """
+
+    _pending = None  # [sql, params, 걸린 초, 행 수]
+
+    def _finish(self, explain: bool = True) -> None:
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, params, secs, rows = pending
+            _record(self.connection, sql, params, rows, secs * 1000.0, explain=explain)
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        t0 = time.perf_counter()
+        super().execute(sql, parameters)
+        self._pending = [sql, parameters, time.perf_counter() - t0, 0]
+        if self.description is None:
+            # 행을 돌려주지 않는 문장: 바뀐 행 수를 기록하고 바로 마무리
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        params = list(seq_of_parameters)
+        t0 = time.perf_counter()
+        super().executemany(sql, params)
+        self._pending = [sql, params[0] if params else (), time.perf_counter() - t0, max(self.rowcount, 0)]
+        self._finish(explain=False)
+        return self
+
+    def _fetched(self, t0: float, n: int, done: bool) -> None:
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - t0
+            self._pending[3] += n
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t0, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        t0 = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(t0, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t0, len(rows), True)
+        return rows
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(t0, 0, True)
+            raise
+        self._fetched(t0, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # 끝까지 읽지 않고 버린 커서(fetchone 한 번 등): 계획 없이 기록만
+        try:
+            self._finish(explain=False)
+        except Exception:
+            pass
+
+def cursor_factory():
+    """기록이 켜져 있으면 QueryLogCursor, 아니면 None(기본 커서)"""
+    return QueryLogCursor if _enabled else None
+
+def top_statements(order: str = "total_ms", limit: int = 20) -> list[QueryStat]:
+    """합산 기록 상위 문장(order: total_ms, max_ms, mean_ms, calls, rows)"""
+    with _lock:
+        stats = [replace(s) for s in _stats.values()]
+    return sorted(stats, key=lambda s: getattr(s, order), reverse=True)[:limit]
+
+def slow_queries(limit: int = 50) -> list[SlowQuery]:
+    """최근 느린 실행(최근 것부터)"""
+    with _lock:
+        return list(_slow)[::-1][:limit]
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+기부금 영수증 일괄 생성(Streamlit 없이 실행).
+
+선택 연도의 헌금을 기부자(수입내역에 적힌 이름)별로 모아 기부자마다 인쇄용 영수증(HTML) 1개와
+요약 엑셀(기부자 x 월 합계, 기부자 x 항목 합계)을 만들어 zip 파일 하나로 묶습니다.
+영수증은 여러 프로세스에서 나누어 만듭니다.
+
+- 대상 항목: 관리 페이지 '항목 관리'의 영수증 대상(기본: 헌금 항목. 기타/대출금/예치금/이월금 제외)
+- 무명/익명은 제외. 부부 등 여러 이름을 함께 적은 경우 적힌 그대로 한 장 발행
+- 주민등록번호/주소 칸은 비워 두고 발행 후 기입합니다.
+- 기부금 단체 정보(고유번호/소재지/대표자)는 data/ledgers.json 의 reg_no/address/representative
+
+사용 예:
+    python -m utils.receipts 2025
+    python -m utils.receipts 2025 --out 기부금영수증_2025.zip --workers 4 --ledger sarang
+"""
+import io
+import os
+import sys
+import html
+import time
+import zipfile
+import argparse
+import datetime as dt
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import tenants
+
+# 기부금 유형/코드(종교단체 기부금)
+DONATION_TYPE = "종교단체"
+DONATION_CODE = "41"
+
+def _safe_name(s: str) -> str:
+    return "".join(ch if ch not in '\\/:*?"<>|' else "-" for ch in s).replace(" ", "_")
+
+def build_tasks(year: int, ledger: str = tenants.DEFAULT_LEDGER, issue_date: dt.date | None = None) -> list[tuple]:
+    """
+    기부자별 영수증 작업 목록: (일련번호, 연도, 기부자, [(월, 항목, 금액)], 단체 정보, 발행일)
+    DB는 여기서 한 번만 읽고, 작업 프로세스는 받은 값으로 영수증만 만듭니다.
+    """
+    from utils.storage import donor_year_totals
+
+    issue_date = issue_date or dt.date.today()
+    with tenants.use_ledger(ledger):
+        info = tenants.get_ledger(ledger)
+        df = donor_year_totals(year)
+    issuer = {
+        "name": info.name,
+        "reg_no": info.reg_no,
+        "address": info.address,
+        "representative": info.representative,
+    }
+
+    tasks = []
+    for n, (donor, g) in enumerate(df.groupby("기부자", sort=True), start=1):
+        rows = [(int(m), item, float(amt)) for m, item, amt in zip(g["월"], g["항목"], g["금액"])]
+        tasks.append((f"{year}-{n:04d}", year, donor, rows, issuer, issue_date))
+    return tasks
+
+def receipt_html(serial: str, year: int, donor: str, rows: list, issuer: dict, issue_date: dt.date) -> str:
+    """기부자 1명의 인쇄용 기부금 영수증 HTML"""
+    e = html.escape
+    total = sum(amt for _, _, amt in rows)
+    body = "\n".join(
+        f"<tr><td>{DONATION_TYPE}</td><td>{DONATION_CODE}</td><td>헌금</td>"
+        f"<td>{year}.{m:02d}</td><td>{e(item)}</td><td class='num'>₩{amt:,.0f}</td></tr>"
+        for m, item, amt in rows
+    )
+    return f"""
+    <html>
+    <head>
+      <meta charset="utf-8"/>
+      <title>기부금 영수증 {e(serial)} {e(donor)}</title>
+      <style>
+        body {{ font-family: Arial, sans-serif; padding: 16px; }}
+        h1 {{ text-align: center; font-size: 28px; margin: 4px 0 12px 0; }}
+        .serial {{ font-size: 12px; color: #444; }}
+        h3 {{ font-size: 15px; margin: 14px 0 6px 0; }}
+        table {{ width: 100%; border-collapse: collapse; }}
+        th, td {{ border: 1px solid #333; padding: 6px; font-size: 13px; }}
+        th {{ background: #f5f5f5; width: 18%; }}
+        td.num {{ text-align: right; }}
+        .total td {{ font-weight: 800; }}
+        .confirm {{ margin-top: 18px; font-size: 14px; line-height: 1.8; text-align: center; }}
+        @media print {{ body {{ padding: 0; }} }}
+      </style>
+    </head>
+    <body>
+      <div class="serial">일련번호: {e(serial)}</div>
+      <h1>기부금 영수증</h1>
+
+      <h3>1. 기부자</h3>
+      <table>
+        <tr><th>성명</th><td>{e(donor)}</td><th>주민등록번호</th><td>&nbsp;</td></tr>
+        <tr><th>주소</th><td colspan="3">&nbsp;</td></tr>
+      </table>
+
+      <h3>2. 기부금 단체</h3>
+      <table>
+        <tr><th>단체명</th><td>{e(issuer["name"])}</td><th>고유번호</th><td>{e(issuer["reg_no"])}</td></tr>
+        <tr><th>소재지</th><td>{e(issuer["address"])}</td><th>대표자</th><td>{e(issuer["representative"])}</td></tr>
+      </table>
+
+      <h3>3. 기부내용 ({year}년 1월 1일 ~ {year}년 12월 31일)</h3>
+      <table>
+        <thead><tr><th>유형</th><th>코드</th><th>구분</th><th>연월</th><th>내용</th><th>금액</th></tr></thead>
+        <tbody>
+          {body}
+          <tr class="total"><td colspan="5">합계</td><td class="num">₩{total:,.0f}</td></tr>
+        </tbody>
+      </table>
+
+      <div class="confirm">
+        위와 같이 기부금을 기부받았음을 증명합니다.<br/>
+        {issue_date.year}년 {issue_date.month}월 {issue_date.day}일<br/>
+        기부금 수령인: {e(issuer["name"])} {e(issuer["representative"])} (인)
+      </div>
+    </body>
+    </html>
+    """
+
+def render_task(task: tuple) -> tuple[str, bytes]:
+    """영수증 1건을 만들어 (zip 안 경로, 내용)을 반환합니다(작업 프로세스에서 실행)."""
+    serial, year, donor, rows, issuer, issue_date = task
+    page = receipt_html(serial, year, donor, rows, issuer, issue_date)
+    return f"{year}/영수증/{serial}_{_safe_name(donor)}.html", page.encode("utf-8")
+
+def summary_xlsx(tasks: list[tuple], year: int, item_order: list[str]) -> bytes:
+    """요약 엑셀: 기부자 x 월 합계, 기부자 x 항목 합계"""
+    import pandas as pd
+    from utils.exporter import export_tables_xlsx
+
+    long = pd.DataFrame(
+        [(serial, donor, m, item, amt) for serial, _, donor, rows, _, _ in tasks for m, item, amt in rows],
+        columns=["일련번호", "기부자", "월", "항목", "금액"],
+    )
+    if long.empty:
+        by_month = pd.DataFrame(columns=["일련번호", "기부자"] + [f"{m}월" for m in range(1, 13)] + ["합계"])
+        by_item = pd.DataFrame(columns=["일련번호", "기부자", "합계"])
+    else:
+        by_month = long.pivot_table(index=["일련번호", "기부자"], columns="월", values="금액", aggfunc="sum", fill_value=0)
+        by_month = by_month.reindex(columns=range(1, 13), fill_value=0)
+        by_month.columns = [f"{m}월" for m in by_month.columns]
+        by_month["합계"] = by_month.sum(axis=1)
+        by_month = by_month.reset_index()
+        by_item = long.pivot_table(index=["일련번호", "기부자"], columns="항목", values="금액", aggfunc="sum", fill_value=0)
+        by_item = by_item[[c for c in item_order if c in by_item.columns]]
+        by_item["합계"] = by_item.sum(axis=1)
+        by_item = by_item.reset_index()
+    money = [c for c in list(by_month.columns) + list(by_item.columns) if c not in ("일련번호", "기부자")]
+    return export_tables_xlsx(
+        filename_prefix=f"기부금영수증_{year}",
+        sheets={"기부자별 월 합계": by_month, "기부자별 항목 합계": by_item},
+        money_columns=money,
+    )
+
+def write_receipts_zip(
+    fileobj,
+    year: int,
+    ledger: str = tenants.DEFAULT_LEDGER,
+    workers: int | None = None,
+    issue_date: dt.date | None = None,
+) -> int:
+    """영수증 zip을 fileobj(경로 또는 파일 객체)에 쓰고 영수증 건수를 반환합니다."""
+    from utils.storage import item_names
+
+    tasks = build_tasks(year, ledger, issue_date)
+    workers = workers or os.cpu_count() or 1
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        if workers <= 1:
+            results = map(render_task, tasks)
+            for name, data in results:
+                zf.writestr(name, data)
+        else:
+            # fork로 부모의 SQLite 연결을 물려받지 않도록 spawn 사용
+            ctx = multiprocessing.get_context("spawn")
+            chunksize = max(1, len(tasks) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+                for name, data in ex.map(render_task, tasks, chunksize=chunksize):
+                    zf.writestr(name, data)
+        with tenants.use_ledger(ledger):
+            item_order = item_names("income")
+        zf.writestr(f"{year}/기부금영수증_요약_{year}.xlsx", summary_xlsx(tasks, year, item_order))
+    return len(tasks)
+
+def receipts_zip_bytes(year: int, ledger: str = tenants.DEFAULT_LEDGER) -> bytes:
+    """화면 다운로드용(한 프로세스에서 생성)"""
+    bio = io.BytesIO()
+    write_receipts_zip(bio, year, ledger, workers=1)
+    return bio.getvalue()
+
+def generate(
+    year: int,
+    out_path: str,
+    ledger: str = tenants.DEFAULT_LEDGER,
+    workers: int | None = None,
+) -> int:
+    tenants.get_ledger(ledger)  # 존재 확인
+    tmp_path = out_path + ".part"
+    n = write_receipts_zip(tmp_path, year, ledger, workers)
+    os.replace(tmp_path, out_path)
+    return n
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.receipts", description="기부금 영수증 일괄 생성(zip)")
+    parser.add_argument("year", type=int, help="연도")
+    parser.add_argument("--out", help="저장할 zip 경로(기본: 기부금영수증_<연도>.zip)")
+    parser.add_argument("--workers", type=int, default=None, help="동시 작업 프로세스 수(기본: CPU 코어 수)")
+    parser.add_argument("--ledger", default=tenants.DEFAULT_LEDGER, help="장부 코드(기본: default)")
+    args = parser.parse_args(argv)
+
+    out = args.out or f"기부금영수증_{args.year}.zip"
+    t0 = time.perf_counter()
+    n = generate(args.year, out, ledger=args.ledger, workers=args.workers)
+    print(f"영수증 {n}건 생성 완료: {out} ({time.perf_counter() - t0:.1f}초)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
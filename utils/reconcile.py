@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+통장 거래내역 대조(은행 대조).
+
+은행에서 내려받은 거래내역(CSV/xlsx)을 한 줄씩 읽어(파일 전체를 표로 올리지 않음)
+장부에서 적요가 '은행'인 행과 맞춰 봅니다. 금액은 입금 +, 출금 -(장부는 수입 +, 지출 -).
+
+1. 같은 날짜·같은 금액: (금액, 날짜) 해시 인덱스로 바로 짝지음
+2. 날짜가 며칠 어긋난 경우: 남은 거래를 금액별로 묶어 날짜순 정렬한 뒤, 양쪽을 한 번에 훑으며(sort-merge)
+   window_days 이내에서 가장 가까운 날짜의 장부 행과 짝지음.
+   가장 가까운 후보가 앞뒤로 같은 거리에 둘 이상이면 '확인 필요(애매)'로 남깁니다.
+
+비교 횟수는 거래 수에 비례(정렬 제외)하므로 1년치 통장 x 1년치 장부도 금방 끝납니다.
+"""
+import io
+import csv
+import codecs
+import datetime as dt
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+# 날짜가 이만큼(일) 어긋나도 같은 거래로 봄(주일 헌금을 월요일에 입금하는 경우 등)
+DEFAULT_WINDOW_DAYS = 3
+
+# 은행별 거래내역 파일의 컬럼 이름(공백 제거 후 비교)
+DATE_HEADERS = ("거래일시", "거래일자", "거래일", "거래날짜", "날짜", "일자")
+IN_HEADERS = ("입금액", "입금금액", "맡기신금액", "입금")
+OUT_HEADERS = ("출금액", "출금금액", "찾으신금액", "지급액", "출금")
+AMOUNT_HEADERS = ("거래금액", "금액")  # 입금/출금 구분 없이 부호로 표시하는 은행
+TEXT_HEADERS = ("적요", "기재내용", "거래내용", "내용", "보낸분/받는분", "받는분/보낸분", "의뢰인/수취인", "메모")
+
+# 머리글 줄을 찾을 때 살펴볼 최대 줄 수(은행 파일 위쪽의 계좌 정보 등은 건너뜀)
+HEADER_SCAN_ROWS = 30
+
+@dataclass(frozen=True)
+class StatementTxn:
+    line: int           # 파일에서의 줄 번호(1부터)
+    d: dt.date
+    amount: int         # 입금 +, 출금 -
+    text: str
+
+@dataclass(frozen=True)
+class LedgerTxn:
+    kind: str           # income / expense
+    id: int
+    d: dt.date
+    amount: int         # 수입 +, 지출 -
+    item: str
+    detail: str
+
+@dataclass
+class ReconcileResult:
+    matched: list = field(default_factory=list)              # [(StatementTxn, LedgerTxn)]
+    ambiguous: list = field(default_factory=list)            # [(StatementTxn, [LedgerTxn 후보])]
+    unmatched_statement: list = field(default_factory=list)  # [StatementTxn] 통장에만 있음
+    unmatched_ledger: list = field(default_factory=list)     # [LedgerTxn] 장부에만 있음
+    skipped: int = 0                                         # 기간 밖이라 건너뛴 통장 거래 수
+
+# ---------------------------------------------------------------------------
+# 거래내역 파일 읽기
+# ---------------------------------------------------------------------------
+def _norm_header(v) -> str:
+    return "".join(str(v or "").split())
+
+def _find_col(header: list[str], names: tuple) -> Optional[int]:
+    for name in names:  # 앞의 이름일수록 우선
+        for i, h in enumerate(header):
+            if h == name:
+                return i
+    for name in names:
+        for i, h in enumerate(header):
+            if name in h:
+                return i
+    return None
+
+def parse_date(v) -> Optional[dt.date]:
+    if isinstance(v, dt.datetime):
+        return v.date()
+    if isinstance(v, dt.date):
+        return v
+    s = str(v or "").strip()
+    if not s:
+        return None
+    digits = "".join(ch for ch in s.split()[0] if ch.isdigit())
+    if len(digits) == 8:
+        try:
+            return dt.date(int(digits[:4]), int(digits[4:6]), int(digits[6:]))
+        except ValueError:
+            return None
+    return None
+
+def parse_amount(v) -> int:
+    if v is None:
+        return 0
+    if isinstance(v, (int, float)):
+        return int(round(v))
+    s = str(v).strip().replace(",", "").replace("원", "").replace("₩", "")
+    if s in ("", "-"):
+        return 0
+    try:
+        return int(round(float(s)))
+    except ValueError:
+        return 0
+
+def _cell(row, i: Optional[int]):
+    return row[i] if i is not None and i < len(row) else None
+
+def _rows_to_txns(rows: Iterable[list]) -> Iterator[StatementTxn]:
+    """머리글 줄을 찾은 뒤 거래 행을 하나씩 StatementTxn으로 변환"""
+    cols = None
+    for n, row in enumerate(rows, start=1):
+        if cols is None:
+            if n > HEADER_SCAN_ROWS:
+                break
+            header = [_norm_header(v) for v in row]
+            date_i = _find_col(header, DATE_HEADERS)
+            in_i, out_i = _find_col(header, IN_HEADERS), _find_col(header, OUT_HEADERS)
+            amount_i = _find_col(header, AMOUNT_HEADERS)
+            if date_i is not None and ((in_i is not None and out_i is not None) or amount_i is not None):
+                cols = (date_i, in_i, out_i, amount_i, _find_col(header, TEXT_HEADERS))
+            continue
+
+        date_i, in_i, out_i, amount_i, text_i = cols
+        d = parse_date(_cell(row, date_i))
+        if d is None:
+            continue  # 합계 줄/빈 줄
+        if in_i is not None and out_i is not None:
+            amount = parse_amount(_cell(row, in_i)) - parse_amount(_cell(row, out_i))
+        else:
+            amount = parse_amount(_cell(row, amount_i))
+        if amount == 0:
+            continue
+        yield StatementTxn(n, d, amount, str(_cell(row, text_i) or "").strip())
+    if cols is None:
+        raise ValueError("거래내역 파일에서 날짜/입금/출금(또는 금액) 컬럼을 찾지 못했습니다.")
+
+def _detect_encoding(fileobj) -> str:
+    head = fileobj.read(64 * 1024)
+    fileobj.seek(0)
+    for enc in ("utf-8-sig", "cp949"):
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+def read_statement(fileobj, filename: str) -> Iterator[StatementTxn]:
+    """거래내역 파일(CSV 또는 xlsx)을 한 줄씩 읽어 StatementTxn을 돌려줍니다."""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            yield from _rows_to_txns(wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+        return
+    text = io.TextIOWrapper(fileobj, encoding=_detect_encoding(fileobj), newline="")
+    try:
+        yield from _rows_to_txns(csv.reader(text))
+    finally:
+        text.detach()  # 업로드 파일 객체는 닫지 않음
+
+def ledger_txns(start_date: dt.date, end_date: dt.date) -> list[LedgerTxn]:
+    from utils.storage import bank_rows
+
+    return [
+        LedgerTxn(kind, rid, d, int(round(amount or 0)), item or "", detail or "")
+        for kind, rid, d, item, detail, amount in bank_rows(start_date, end_date)
+    ]
+
+# ---------------------------------------------------------------------------
+# 대조
+# ---------------------------------------------------------------------------
+def _merge_by_date(stmts: list, ledger: list, window: int, result: ReconcileResult) -> None:
+    """
+    금액이 같은 통장 거래/장부 행(각각 날짜순)을 한 번에 훑으며 짝지음.
+    장부 쪽은 아직 짝이 없는 후보만 날짜순으로 유지합니다.
+    """
+    free = list(ledger)  # 날짜순, 짝지으면 제거
+    dates = [l.d for l in free]
+    in_question = set()  # '확인 필요' 후보로 보여 준 장부 행
+    lo = 0  # 이 앞의 장부 행은 이미 window 밖(이후 통장 거래와도 짝이 될 수 없음)
+    for s in stmts:
+        while lo < len(free) and (s.d - free[lo].d).days > window:
+            lo += 1
+        hi = bisect_left(dates, s.d + dt.timedelta(days=window + 1), lo)
+        if lo == hi:
+            result.unmatched_statement.append(s)
+            continue
+        best = min(abs((free[i].d - s.d).days) for i in range(lo, hi))
+        nearest = [i for i in range(lo, hi) if abs((free[i].d - s.d).days) == best]
+        if len({free[i].d for i in nearest}) > 1:
+            # 앞뒤로 같은 거리의 후보 → 사람이 확인
+            result.ambiguous.append((s, [free[i] for i in range(lo, hi)]))
+            in_question.update((free[i].kind, free[i].id) for i in range(lo, hi))
+            continue
+        i = nearest[0]
+        result.matched.append((s, free.pop(i)))
+        dates.pop(i)
+    result.unmatched_ledger.extend(l for l in free if (l.kind, l.id) not in in_question)
+
+def reconcile(
+    statement: Iterable[StatementTxn],
+    ledger: list[LedgerTxn],
+    start_date: dt.date,
+    end_date: dt.date,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+) -> ReconcileResult:
+    """
+    통장 거래(기간 안의 것만)와 장부 행을 대조합니다.
+    ledger는 [start_date - window_days, end_date + window_days] 범위를 넘겨 주면 기간 경계의 거래도 맞춰집니다.
+    """
+    result = ReconcileResult()
+
+    # 1) 같은 날짜·같은 금액: 해시 인덱스
+    index: dict = defaultdict(list)
+    for l in ledger:
+        index[(l.amount, l.d)].append(l)
+    rest = []
+    for s in statement:
+        if not (start_date <= s.d <= end_date):
+            result.skipped += 1
+            continue
+        bucket = index.get((s.amount, s.d))
+        if bucket:
+            result.matched.append((s, bucket.pop(0)))
+        else:
+            rest.append(s)
+
+    # 2) 며칠 어긋난 거래: 금액별 sort-merge
+    by_amount_s: dict = defaultdict(list)
+    for s in rest:
+        by_amount_s[s.amount].append(s)
+    by_amount_l: dict = defaultdict(list)
+    for bucket in index.values():
+        for l in bucket:
+            by_amount_l[l.amount].append(l)
+    for amount in set(by_amount_s) | set(by_amount_l):
+        stmts = sorted(by_amount_s.get(amount, []), key=lambda s: (s.d, s.line))
+        rows = sorted(by_amount_l.get(amount, []), key=lambda l: (l.d, l.kind, l.id))
+        _merge_by_date(stmts, rows, window_days, result)
+
+    # 기간 밖 장부 행(경계 대조용으로 가져온 것)은 '장부에만 있음'에서 제외
+    result.unmatched_ledger = sorted(
+        (l for l in result.unmatched_ledger if start_date <= l.d <= end_date), key=lambda l: (l.d, l.kind, l.id)
+    )
+    result.unmatched_statement.sort(key=lambda s: (s.d, s.line))
+    result.matched.sort(key=lambda m: (m[0].d, m[0].line))
+    result.ambiguous.sort(key=lambda a: (a[0].d, a[0].line))
+    return result
+
+def reconcile_file(
+    fileobj,
+    filename: str,
+    start_date: dt.date,
+    end_date: dt.date,
+    window_days: int = DEFAULT_WINDOW_DAYS,
+) -> ReconcileResult:
+    """거래내역 파일을 현재 장부와 대조합니다."""
+    pad = dt.timedelta(days=window_days)
+    ledger = ledger_txns(start_date - pad, end_date + pad)
+    return reconcile(read_statement(fileobj, filename), ledger, start_date, end_date, window_days)
+
+# ---------------------------------------------------------------------------
+# 화면/엑셀용 표
+# ---------------------------------------------------------------------------
+KIND_LABELS = {"income": "수입", "expense": "지출"}
+
+def _ledger_desc(l: LedgerTxn) -> str:
+    return f"{l.d.isoformat()} {KIND_LABELS.get(l.kind, l.kind)} {l.item} {l.detail} ₩{l.amount:,}".replace("  ", " ")
+
+def result_tables(result: ReconcileResult) -> dict:
+    """{"일치", "확인 필요", "통장에만", "장부에만"} → DataFrame"""
+    import pandas as pd
+
+    matched = pd.DataFrame(
+        [
+            {
+                "통장 날짜": s.d, "통장 내용": s.text, "금액": s.amount,
+                "장부 날짜": l.d, "구분": KIND_LABELS.get(l.kind, l.kind), "항목": l.item, "내역": l.detail,
+                "날짜 차이(일)": (l.d - s.d).days,
+            }
+            for s, l in result.matched
+        ],
+        columns=["통장 날짜", "통장 내용", "금액", "장부 날짜", "구분", "항목", "내역", "날짜 차이(일)"],
+    )
+    ambiguous = pd.DataFrame(
+        [
+            {"통장 날짜": s.d, "통장 내용": s.text, "금액": s.amount, "장부 후보": " / ".join(_ledger_desc(l) for l in cands)}
+            for s, cands in result.ambiguous
+        ],
+        columns=["통장 날짜", "통장 내용", "금액", "장부 후보"],
+    )
+    only_statement = pd.DataFrame(
+        [{"통장 날짜": s.d, "통장 내용": s.text, "금액": s.amount, "파일 줄": s.line} for s in result.unmatched_statement],
+        columns=["통장 날짜", "통장 내용", "금액", "파일 줄"],
+    )
+    only_ledger = pd.DataFrame(
+        [
+            {"장부 날짜": l.d, "구분": KIND_LABELS.get(l.kind, l.kind), "항목": l.item, "내역": l.detail, "금액": l.amount}
+            for l in result.unmatched_ledger
+        ],
+        columns=["장부 날짜", "구분", "항목", "내역", "금액"],
+    )
+    return {"일치": matched, "확인 필요": ambiguous, "통장에만": only_statement, "장부에만": only_ledger}
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+보고서 결과(집계표, 인쇄용 HTML, 엑셀) 디스크 캐시.
+
+- 장부마다 SQLite 파일 1개(data/cache/<장부>.db). 장부 DB와 따로 두어 백업 크기와 쓰기 잠금에 영향을 주지 않습니다.
+- 키는 (보고 종류, 기간, 산출물)이고, 값과 함께 만들 때의 데이터 버전(storage.range_version)을 저장합니다.
+  읽을 때 버전이 같으면 저장된 값을 그대로 쓰고, 다르면(기간 안 날짜가 저장됨) 다시 만들어 덮어씁니다.
+  → 지난 기간 보고서는 한 번 만든 뒤로는 캐시 읽기만 하고, 저장이 있었던 기간만 다시 계산합니다.
+- 버전은 계산을 시작하기 전에 읽습니다. 계산 중에 저장이 끼어들면 다음 조회 때 버전이 달라 다시 만듭니다.
+- 캐시는 언제 지워도 되므로, 캐시 파일 오류는 캐시 없이 계산하는 것으로 처리합니다.
+"""
+import os
+import sqlite3
+import datetime as dt
+from typing import Callable, Optional
+
+from utils import tenants
+
+# 저장 형식이나 보고서 계산 방식이 바뀌면 올림(이전 항목은 버전이 달라 다시 만듦)
+CACHE_FORMAT = 1
+# 장부별 최대 항목 수(넘으면 오래 만든 것부터 삭제)
+MAX_ENTRIES = 5000
+BUSY_TIMEOUT_SEC = 2.0
+
+def cache_path(ledger: Optional[str] = None) -> str:
+    return os.path.join(tenants.DATA_DIR, "cache", f"{tenants.get_ledger(ledger).key}.db")
+
+def _open(ledger: Optional[str] = None) -> sqlite3.Connection:
+    path = cache_path(ledger)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SEC)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS report_cache ("
+        "kind TEXT NOT NULL, period TEXT NOT NULL, artifact TEXT NOT NULL, "
+        "version TEXT NOT NULL, value BLOB NOT NULL, created_at TEXT NOT NULL, "
+        "PRIMARY KEY (kind, period, artifact))"
+    )
+    return conn
+
+def get_or_build(kind: str, period: str, artifact: str, version: Optional[str], build: Callable[[], bytes]) -> bytes:
+    """
+    캐시에 같은 버전의 값이 있으면 반환하고, 없으면 build()로 만들어 저장한 뒤 반환합니다.
+    version이 None이면 캐시를 쓰지 않습니다.
+    """
+    if version is None:
+        return build()
+    version = f"{CACHE_FORMAT}:{version}"
+    try:
+        conn = _open()
+    except sqlite3.Error:
+        return build()
+    try:
+        row = conn.execute(
+            "SELECT value FROM report_cache WHERE kind=? AND period=? AND artifact=? AND version=?",
+            (kind, period, artifact, version),
+        ).fetchone()
+        if row is not None:
+            return bytes(row[0])
+        value = build()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO report_cache (kind, period, artifact, version, value, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, period, artifact, version, sqlite3.Binary(value), dt.datetime.now().isoformat(timespec="seconds")),
+                )
+                conn.execute(
+                    "DELETE FROM report_cache WHERE rowid IN ("
+                    "SELECT rowid FROM report_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (MAX_ENTRIES,),
+                )
+        except sqlite3.Error:
+            pass  # 저장 실패(잠금 등)는 다음 조회 때 다시 만듦
+        return value
+    finally:
+        conn.close()
+
+def clear(ledger: Optional[str] = None) -> int:
+    """장부의 캐시를 모두 지우고 지운 항목 수를 반환합니다(백업 복원 등 데이터 버전이 되돌아갈 때)."""
+    if not os.path.exists(cache_path(ledger)):
+        return 0
+    conn = _open(ledger)
+    try:
+        with conn:
+            removed = conn.execute("DELETE FROM report_cache").rowcount
+    finally:
+        conn.close()
+    return removed
+
+def cache_stats(ledger: Optional[str] = None) -> dict:
+    """{"entries": 항목 수, "bytes": 값 크기 합계}"""
+    if not os.path.exists(cache_path(ledger)):
+        return {"entries": 0, "bytes": 0}
+    conn = _open(ledger)
+    entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(length(value)), 0) FROM report_cache").fetchone()
+    conn.close()
+    return {"entries": int(entries), "bytes": int(size)}
@@ -0,0 +1,516 @@
+# -*- coding: utf-8 -*-
+"""
+재정보고/월별현황 계산(화면과 일괄 생성기에서 함께 사용).
+Streamlit에 의존하지 않습니다.
+"""
+import json
+import calendar
+import datetime as dt
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from utils.storage import (
+    item_names, net_excluded_items, item_totals, usage_totals, monthly_item_totals,
+    calendar_day, journal_high_water, period_snapshots, save_period_close,
+    closed_periods, range_version,
+)
+from utils import report_cache
+
+REPORT_MODES = ["일 보고", "주 보고", "월 보고", "분기 보고", "년 보고"]
+
+# ---------------------------------------------------------------------------
+# 기간
+# ---------------------------------------------------------------------------
+# 주차/주일은 DB의 calendar 테이블(utils.church_calendar) 기준
+def closest_past_sunday(d: dt.date) -> dt.date:
+    day = calendar_day(d)
+    # 첫 주일 이전 날짜(0주차)는 그 달 첫 주일
+    return day["week_start"] if day["week_no"] > 0 else day["week_end"] + dt.timedelta(days=1)
+
+def date_range_for_mode(d: dt.date, mode: str):
+    if mode == "일 보고":
+        return d, d, f"{d.year}년 {d.month}월 {d.day}일"
+    if mode == "주 보고":
+        day = calendar_day(closest_past_sunday(d))
+        return day["week_start"], day["week_end"], f"{d.year}년 {d.month}월 {day['week_no']}주차"
+    if mode == "월 보고":
+        start = dt.date(d.year, d.month, 1)
+        end = dt.date(d.year, d.month, calendar.monthrange(d.year, d.month)[1])
+        return start, end, f"{d.year}년 {d.month}월"
+    if mode == "분기 보고":
+        q = (d.month - 1) // 3 + 1
+        sm = (q - 1) * 3 + 1
+        em = sm + 2
+        start = dt.date(d.year, sm, 1)
+        end = dt.date(d.year, em, calendar.monthrange(d.year, em)[1])
+        return start, end, f"{d.year}년 {q}/4분기"
+    if mode == "년 보고":
+        start = dt.date(d.year, 1, 1)
+        end = dt.date(d.year, 12, 31)
+        return start, end, f"{d.year}년"
+    return d, d, f"{d.year}-{d.month}-{d.day}"
+
+# ---------------------------------------------------------------------------
+# 재정보고(기간별 항목 합계/비율)
+# ---------------------------------------------------------------------------
+def usage_stats(df: pd.DataFrame, total: float) -> dict:
+    """적요(현금/은행) 기준 합계/비율"""
+    if df is None or df.empty or "적요" not in df.columns:
+        cash = 0.0
+        bank = 0.0
+    else:
+        cash = float(df.loc[df["적요"] == "현금", "금액"].sum())
+        bank = float(df.loc[df["적요"] == "은행", "금액"].sum())
+    denom = total if total > 0 else 0.0
+    cash_ratio = (cash / denom * 100.0) if denom > 0 else 0.0
+    bank_ratio = (bank / denom * 100.0) if denom > 0 else 0.0
+    return {"cash": cash, "bank": bank, "cash_ratio": cash_ratio, "bank_ratio": bank_ratio}
+
+def make_summary(df: pd.DataFrame, item_col: str, full_items: list[str]) -> pd.DataFrame:
+    base = pd.DataFrame({item_col: full_items})
+    if df.empty or item_col not in df.columns:
+        s = base.copy()
+        s["합계"] = 0
+    else:
+        s = (
+            df.groupby(item_col, dropna=False)["금액"].sum()
+              .reset_index()
+              .rename(columns={"금액": "합계"})
+        )
+        s[item_col] = s[item_col].fillna("(미지정)")
+        s = base.merge(s, on=item_col, how="left")
+        s["합계"] = s["합계"].fillna(0)
+
+    denom = float(s["합계"].sum())
+    if denom <= 0:
+        s["비율(%)"] = 0.0
+    else:
+        s["비율(%)"] = s.apply(lambda r: (float(r["합계"]) / denom * 100.0), axis=1)
+
+    s["합계"] = s["합계"].round(0).astype(int)
+    s["비율(%)"] = s["비율(%)"].round(1)
+    return s
+
+# 표 최하단에 합계/순합계 행 추가(사용자 요청)
+def with_totals(summary: pd.DataFrame, item_col: str, total_amount: float, exclude: list[str]) -> pd.DataFrame:
+    summary = summary.copy()
+    try:
+        net_sum = int(summary[~summary[item_col].isin(exclude)]["합계"].sum())
+    except Exception:
+        net_sum = 0
+    net_label = f"순합계({'/'.join(exclude)} 제외)" if exclude else "순합계"
+    total_row = {item_col: "합계 금액", "합계": int(round(total_amount, 0)), "비율(%)": float("nan")}
+    net_row = {item_col: net_label, "합계": int(round(net_sum, 0)), "비율(%)": float("nan")}
+    return pd.concat([summary, pd.DataFrame([total_row, net_row])], ignore_index=True)
+
+@dataclass
+class PeriodReport:
+    start: dt.date
+    end: dt.date
+    title_suffix: str
+    income_sum: pd.DataFrame
+    expense_sum: pd.DataFrame
+    income_total: float
+    expense_total: float
+    income_usage: dict
+    expense_usage: dict
+    # 마감 기간의 저장된 결과표를 쓴 경우 {"period", "closed_at", "actor"}
+    closed: Optional[dict] = None
+    # 계산에 쓴 데이터 버전(storage.range_version, 인쇄용 HTML/엑셀 캐시 키)
+    version: Optional[str] = None
+
+def build_period_report(start: dt.date, end: dt.date, title_suffix: str) -> PeriodReport:
+    """
+    기간(start~end 포함)의 수입/지출 항목 합계표와 적요별 합계.
+    마감한 기간(또는 마감한 년 안의 월/분기)이면 다시 계산하지 않고 마감 때 저장한 결과표를 그대로 씁니다.
+    그 밖의 기간은 디스크 캐시(utils.report_cache)에서 읽고, 기간 안 날짜가 저장된 경우에만 다시 계산합니다.
+    """
+    snap = _find_snapshot(start, end, "reports", _range_key(start, end))
+    if snap is not None:
+        data, info = snap
+        return _report_from_json(data, title_suffix, info)
+    version = range_version(start, end)
+    raw = report_cache.get_or_build(
+        "period", _range_key(start, end), "data", version,
+        lambda: json.dumps(_range_report_json(start, end), ensure_ascii=False).encode("utf-8"),
+    )
+    return _report_from_json(json.loads(raw), title_suffix, None, version=version)
+
+def _compute_period_report(start: dt.date, end: dt.date, title_suffix: str) -> PeriodReport:
+    # 행 전체 대신 DB에서 항목 code/적요별로 미리 합계를 낸 결과만 가져옴
+    income_df = item_totals("income", start, end)
+    expense_df = item_totals("expense", start, end)
+    income_df["금액"] = pd.to_numeric(income_df["금액"], errors="coerce").fillna(0)
+    expense_df["금액"] = pd.to_numeric(expense_df["금액"], errors="coerce").fillna(0)
+
+    income_total = float(income_df["금액"].sum())
+    expense_total = float(expense_df["금액"].sum())
+
+    income_sum = with_totals(
+        make_summary(income_df, "수입항목", item_names("income")), "수입항목", income_total, net_excluded_items("income")
+    )
+    expense_sum = with_totals(
+        make_summary(expense_df, "지출항목", item_names("expense")), "지출항목", expense_total, net_excluded_items("expense")
+    )
+
+    return PeriodReport(
+        start=start,
+        end=end,
+        title_suffix=title_suffix,
+        income_sum=income_sum,
+        expense_sum=expense_sum,
+        income_total=income_total,
+        expense_total=expense_total,
+        income_usage=usage_stats(usage_totals("income", start, end), income_total),
+        expense_usage=usage_stats(usage_totals("expense", start, end), expense_total),
+    )
+
+def _summary_html(df: pd.DataFrame, kind: str, total: float) -> str:
+    rows = []
+    for _, r in df.iterrows():
+        ratio = r.get("비율(%)")
+        ratio_txt = "" if pd.isna(ratio) else f"{float(ratio):.1f}%"
+        rows.append(
+            f"<tr><td>{r.iloc[0]}</td><td style='text-align:right'>₩{int(r['합계']):,}</td><td style='text-align:right'>{ratio_txt}</td></tr>"
+        )
+    body = "\n".join(rows)
+    return f"""
+    <div class='box'>
+      <h3>{kind}</h3>
+      <div class='total'>총 합계금액: <b>₩{total:,.0f}</b></div>
+      <table>
+        <thead><tr><th>항목</th><th>합계</th><th>비율</th></tr></thead>
+        <tbody>{body}</tbody>
+      </table>
+    </div>
+    """
+
+def period_report_html(report: PeriodReport, church_name: str) -> str:
+    """인쇄용 재정보고 HTML"""
+    approval = """
+    <table class='approval'>
+      <tr>
+        <th>담당</th><th>부장</th><th>목사</th>
+      </tr>
+      <tr>
+        <td class='sign'>&nbsp;</td><td class='sign'>&nbsp;</td><td class='sign'>&nbsp;</td>
+      </tr>
+    </table>
+    """
+
+    return f"""
+    <html>
+    <head>
+      <meta charset="utf-8"/>
+      <style>
+        body {{ font-family: Arial, sans-serif; padding: 10px; }}
+        .titlebar {{ display:flex; justify-content: space-between; align-items:flex-start; gap: 12px; }}
+        .titletext {{ font-size: 32px; font-weight: 800; line-height: 1.2; }}
+        .period {{ margin: 6px 0 10px 0; font-size: 12px; color:#666; }}
+
+        .approval {{ border-collapse: collapse; font-size: 9px; width: 150px; margin-left:auto; }}
+        .approval th, .approval td {{ border: 1px solid #333; padding: 3px; text-align:center; width: 50px; }}
+        .approval .sign {{ height: 45px; }}
+
+        .grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 16px; }}
+        .box {{ border: 1px solid #ddd; border-radius: 10px; padding: 12px; }}
+        table {{ width: 100%; border-collapse: collapse; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; font-size: 13px; }}
+        th {{ background: #f5f5f5; }}
+        .total {{ margin: 8px 0 10px 0; }}
+
+        table.mini th, table.mini td {{ font-size: 12px; padding: 6px; }}
+        table.mini thead th {{ background: #f5f5f5; }}
+
+        @media print {{
+          body {{ padding: 0; }}
+          .box {{ break-inside: avoid; }}
+        }}
+      </style>
+    </head>
+    <body>
+      <div class="titlebar">
+        <div class="titletext">{report.title_suffix}<br/>{church_name} 재정보고</div>
+        {approval}
+      </div>
+
+      <div class='grid'>
+        {_summary_html(report.income_sum, "수입", report.income_total)}
+        {_summary_html(report.expense_sum, "지출", report.expense_total)}
+      </div>
+    </body>
+    </html>
+    """
+
+# ---------------------------------------------------------------------------
+# 월별 현황(연간 항목 x 월 합계표)
+# ---------------------------------------------------------------------------
+MONTHLY_KINDS = {
+    "수입": {"kind": "income", "item_col": "수입항목", "title": "월별 현황(수입)", "net_label": "순입금액"},
+    "지출": {"kind": "expense", "item_col": "지출항목", "title": "월별 현황(지출)", "net_label": "순지출액"},
+}
+
+def build_monthly_status(year: int, kind: str) -> pd.DataFrame:
+    """
+    선택 연도의 항목별 1~12월 합계 + 합계/비율 + 하단 합계/순합계 행.
+    마감한 년이면 저장된 결과표, 아니면 디스크 캐시(그 해 날짜가 저장된 경우에만 다시 계산).
+    """
+    snap = _find_snapshot(dt.date(year, 1, 1), dt.date(year, 12, 31), "monthly", kind)
+    if snap is not None:
+        return _df_from_json(snap[0])
+    raw = report_cache.get_or_build(
+        "monthly", str(year), f"data:{kind}", range_version(dt.date(year, 1, 1), dt.date(year, 12, 31)),
+        lambda: json.dumps(_df_to_json(_compute_monthly_status(year, kind)), ensure_ascii=False).encode("utf-8"),
+    )
+    return _df_from_json(json.loads(raw))
+
+def _compute_monthly_status(year: int, kind: str) -> pd.DataFrame:
+    spec = MONTHLY_KINDS[kind]
+    item_col = spec["item_col"]
+    items = item_names(spec["kind"])
+    exclude = net_excluded_items(spec["kind"])
+
+    # 항목 code x 월 합계(DB에서 GROUP BY)
+    pivot = monthly_item_totals(spec["kind"], year)
+    pivot["금액"] = pd.to_numeric(pivot["금액"], errors="coerce").fillna(0)
+
+    rows = []
+    for item in items:
+        row = {"구분": item}
+        total = 0.0
+        for m in range(1, 13):
+            if pivot.empty:
+                val = 0.0
+            else:
+                val = float(pivot[(pivot[item_col] == item) & (pivot["월"] == m)]["금액"].sum())
+            row[f"{m}월"] = int(round(val, 0))
+            total += val
+        row["합계"] = int(round(total, 0))
+        rows.append(row)
+
+    out = pd.DataFrame(rows)
+
+    total_all = float(out["합계"].sum())
+    excluded_sum = float(out[out["구분"].isin(exclude)]["합계"].sum())
+    net_total = total_all - excluded_sum
+
+    def ratio(item: str, item_sum: float) -> float:
+        if item in exclude:
+            return 0.0
+        if net_total <= 0:
+            return 0.0
+        return (item_sum / net_total) * 100.0
+
+    out["비율(%)"] = out.apply(lambda r: round(ratio(r["구분"], float(r["합계"])), 1), axis=1)
+
+    # 하단 요약(월별 합계/순합계)
+    sum_row = {"구분": "합계 금액"}
+    net_row = {"구분": spec["net_label"]}
+
+    for m in range(1, 13):
+        col = f"{m}월"
+        month_total = float(out[col].sum())
+        month_excl = float(out[out["구분"].isin(exclude)][col].sum())
+        sum_row[col] = int(round(month_total, 0))
+        net_row[col] = int(round(month_total - month_excl, 0))
+
+    sum_row["합계"] = int(round(total_all, 0))
+    sum_row["비율(%)"] = 100.0 if net_total > 0 else 0.0
+    net_row["합계"] = int(round(net_total, 0))
+    net_row["비율(%)"] = 100.0 if net_total > 0 else 0.0
+
+    return pd.concat([out, pd.DataFrame([sum_row, net_row])], ignore_index=True)
+
+# ---------------------------------------------------------------------------
+# 기간 마감(월/년)
+# ---------------------------------------------------------------------------
+# 마감 시 결과표를 JSON으로 저장(period_close 테이블)해 두고, 이후 조회는 저장된 결과만 읽음.
+# 년 마감에는 그 해의 월/분기 보고와 월별 현황(수입/지출)도 함께 저장합니다.
+CLOSE_MODES = ("월 보고", "년 보고")
+
+# 마감 중 장부가 바뀌면 결과표를 다시 만드는 횟수
+CLOSE_RETRIES = 3
+
+def _range_key(start: dt.date, end: dt.date) -> str:
+    return f"{start.isoformat()}~{end.isoformat()}"
+
+def closing_period(d: dt.date, mode: str):
+    """마감 단위(월/년 보고)면 (마감 코드 'YYYY-MM' / 'YYYY', 시작일, 종료일), 아니면 None"""
+    if mode not in CLOSE_MODES:
+        return None
+    start, end, _ = date_range_for_mode(d, mode)
+    period = f"{d.year}-{d.month:02d}" if mode == "월 보고" else f"{d.year}"
+    return period, start, end
+
+def _df_to_json(df: pd.DataFrame) -> dict:
+    values = df.astype(object).where(df.notna(), None).values.tolist()
+    return {"columns": list(df.columns), "dtypes": {c: str(t) for c, t in df.dtypes.items()}, "data": values}
+
+def _df_from_json(obj: dict) -> pd.DataFrame:
+    return pd.DataFrame(obj["data"], columns=obj["columns"]).astype(obj["dtypes"])
+
+def _report_to_json(report: PeriodReport) -> dict:
+    return {
+        "income_sum": _df_to_json(report.income_sum),
+        "expense_sum": _df_to_json(report.expense_sum),
+        "income_total": report.income_total,
+        "expense_total": report.expense_total,
+        "income_usage": report.income_usage,
+        "expense_usage": report.expense_usage,
+    }
+
+def _report_from_json(data: dict, title_suffix: str, closed: Optional[dict], version: Optional[str] = None) -> PeriodReport:
+    start, end = (dt.date.fromisoformat(x) for x in data["range"].split("~"))
+    return PeriodReport(
+        start=start,
+        end=end,
+        title_suffix=title_suffix,
+        income_sum=_df_from_json(data["income_sum"]),
+        expense_sum=_df_from_json(data["expense_sum"]),
+        income_total=data["income_total"],
+        expense_total=data["expense_total"],
+        income_usage=data["income_usage"],
+        expense_usage=data["expense_usage"],
+        closed=closed,
+        version=version,
+    )
+
+def _range_report_json(start: dt.date, end: dt.date) -> dict:
+    data = _report_to_json(_compute_period_report(start, end, ""))
+    data["range"] = _range_key(start, end)
+    return data
+
+def _find_snapshot(start: dt.date, end: dt.date, section: str, key: str):
+    """start~end를 포함하는 마감 기간의 저장된 결과 중 section[key]가 있으면 (데이터, 마감 정보), 없으면 None"""
+    for snap in period_snapshots(start, end):
+        payload = json.loads(snap["snapshot"])
+        data = payload.get(section, {}).get(key)
+        if data is not None:
+            return data, {"period": snap["period"], "closed_at": snap["closed_at"], "actor": snap["actor"]}
+    return None
+
+def _snapshot_payload(mode: str, start: dt.date, end: dt.date) -> dict:
+    ranges = [(start, end)]
+    if mode == "년 보고":
+        for m in range(1, 13):
+            ranges.append(date_range_for_mode(dt.date(start.year, m, 1), "월 보고")[:2])
+        for m in (1, 4, 7, 10):
+            ranges.append(date_range_for_mode(dt.date(start.year, m, 1), "분기 보고")[:2])
+    reports = {_range_key(s, e): _range_report_json(s, e) for s, e in ranges}
+    payload = {"format": 1, "reports": reports}
+    if mode == "년 보고":
+        payload["monthly"] = {kind: _df_to_json(_compute_monthly_status(start.year, kind)) for kind in MONTHLY_KINDS}
+    return payload
+
+def close_period(d: dt.date, mode: str, actor: Optional[str] = None) -> str:
+    """
+    d가 속한 월(월 보고) 또는 년(년 보고)을 마감하고 마감 코드를 반환합니다.
+    이후 그 기간은 저장(save_day)이 거부되고, 보고서는 지금 만든 결과표를 그대로 씁니다.
+    """
+    target = closing_period(d, mode)
+    if target is None:
+        raise ValueError("월 보고 또는 년 보고 단위로만 마감할 수 있습니다.")
+    period, start, end = target
+    for _ in range(CLOSE_RETRIES):
+        seq = journal_high_water()
+        payload = json.dumps(_snapshot_payload(mode, start, end), ensure_ascii=False)
+        if save_period_close(period, start, end, payload, seq, actor=actor):
+            return period
+    raise RuntimeError("마감하는 동안 장부가 계속 바뀌어 마감하지 못했습니다. 잠시 후 다시 시도해 주세요.")
+
+def monthly_money_columns(out: pd.DataFrame) -> list[str]:
+    return [c for c in out.columns if c.endswith("월") or c == "합계"]
+
+def monthly_status_html(out: pd.DataFrame, title: str) -> str:
+    """인쇄용 월별 현황 HTML"""
+    # 표시용(콤마)
+    disp = out.copy()
+    for c in monthly_money_columns(disp):
+        disp[c] = disp[c].apply(lambda x: "" if pd.isna(x) else f"{int(x):,}")
+    disp["비율(%)"] = disp["비율(%)"].apply(lambda v: "" if pd.isna(v) else f"{float(v):.1f}%")
+
+    # HTML 테이블 생성
+    th = "".join([f"<th>{c}</th>" for c in disp.columns])
+    rows = []
+    for _, r in disp.iterrows():
+        tds = "".join([f"<td style='text-align:right'>&nbsp;{r[c]}</td>" if (c.endswith("월") or c in ["합계","비율(%)"]) else f"<td>{r[c]}</td>" for c in disp.columns])
+        rows.append(f"<tr>{tds}</tr>")
+    body = "\n".join(rows)
+
+    return f"""
+    <html><head><meta charset='utf-8'/>
+    <style>
+      body {{ font-family: Arial, sans-serif; padding: 10px; }}
+      h2 {{ margin: 0 0 8px 0; }}
+      table {{ width: 100%; border-collapse: collapse; }}
+      th, td {{ border: 1px solid #ddd; padding: 6px; font-size: 12px; }}
+      th {{ background: #f5f5f5; }}
+      @media print {{ body {{ padding:0; }} }}
+    </style>
+    </head>
+    <body>
+      <h2>{title}</h2>
+      <table>
+        <thead><tr>{th}</tr></thead>
+        <tbody>{body}</tbody>
+      </table>
+    </body></html>
+    """
+
+# ---------------------------------------------------------------------------
+# 인쇄용 HTML/엑셀(디스크 캐시): 같은 데이터 버전이면 다시 만들지 않음
+# ---------------------------------------------------------------------------
+def _report_artifact_version(report: PeriodReport) -> Optional[str]:
+    if report.closed:
+        return f"closed:{report.closed['period']}:{report.closed['closed_at']}"
+    return report.version
+
+def period_report_html_cached(report: PeriodReport, church_name: str) -> str:
+    """period_report_html과 같고, 같은 데이터 버전이면 캐시에서 읽습니다."""
+    return report_cache.get_or_build(
+        "period", _range_key(report.start, report.end), f"html:{church_name}:{report.title_suffix}",
+        _report_artifact_version(report), lambda: period_report_html(report, church_name).encode("utf-8"),
+    ).decode("utf-8")
+
+def period_report_xlsx(report: PeriodReport) -> bytes:
+    """재정보고 엑셀(수입/지출 시트). 같은 데이터 버전이면 캐시에서 읽습니다."""
+    from utils.exporter import export_tables_xlsx
+
+    return report_cache.get_or_build(
+        "period", _range_key(report.start, report.end), "xlsx", _report_artifact_version(report),
+        lambda: export_tables_xlsx(
+            filename_prefix=f"재정보고_{report.title_suffix}",
+            sheets={"수입": report.income_sum, "지출": report.expense_sum},
+            money_columns=["합계"],
+        ),
+    )
+
+def _monthly_version(year: int) -> str:
+    start, end = dt.date(year, 1, 1), dt.date(year, 12, 31)
+    for c in closed_periods():
+        if c["start"] <= start and c["end"] >= end:
+            return f"closed:{c['period']}:{c['closed_at']}"
+    return range_version(start, end)
+
+def monthly_status_html_cached(year: int, kind: str, title: str) -> str:
+    """monthly_status_html(build_monthly_status(year, kind), title)과 같고, 같은 데이터 버전이면 캐시에서 읽습니다."""
+    return report_cache.get_or_build(
+        "monthly", str(year), f"html:{kind}:{title}", _monthly_version(year),
+        lambda: monthly_status_html(build_monthly_status(year, kind), title).encode("utf-8"),
+    ).decode("utf-8")
+
+def monthly_status_xlsx(year: int, kind: str) -> bytes:
+    """월별 현황 엑셀. 같은 데이터 버전이면 캐시에서 읽습니다."""
+    from utils.exporter import export_tables_xlsx
+
+    title = MONTHLY_KINDS[kind]["title"]
+
+    def build() -> bytes:
+        out = build_monthly_status(year, kind)
+        return export_tables_xlsx(
+            filename_prefix=f"{title}_{year}", sheets={title: out}, money_columns=monthly_money_columns(out)
+        )
+
+    return report_cache.get_or_build("monthly", str(year), f"xlsx:{kind}", _monthly_version(year), build)
@@ -1,49 +1,766 @@
 # -*- coding: utf-8 -*-
 import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import random
+import secrets
 import sqlite3
+import threading
 import datetime as dt
-from typing import Tuple
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
 import pandas as pd
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "church_finance.db")
+from utils import tenants
+from utils.church_calendar import calendar_rows
+
+# 기본 장부 DB(장부별 DB 경로는 tenants.get_ledger().db_path)
+DB_PATH = tenants.DEFAULT_DB_PATH
 
 INCOME_COLS = ["날짜", "적요", "수입항목", "수입내역", "금액", "비고"]
 EXPENSE_COLS = ["날짜", "적요", "지출항목", "지출내역", "금액", "비고"]
 
+# 장부 종류별 (항목, 내역) 컬럼명
+KIND_COLS = {"income": ("수입항목", "수입내역"), "expense": ("지출항목", "지출내역")}
+
+def _donor_key_sql(col: str = "detail") -> str:
+    # 탭/줄바꿈/전각 공백(U+3000)/NBSP를 공백으로 바꾼 뒤 '  '→' '를 5번(공백 32칸까지 1칸으로), 앞뒤 공백 제거
+    expr = col
+    for code in (9, 10, 13, 160, 12288):
+        expr = f"replace({expr}, char({code}), ' ')"
+    for _ in range(5):
+        expr = f"replace({expr}, '  ', ' ')"
+    return f"trim({expr})"
+
+# 기부자 키: 수입내역(헌금자 이름)의 공백 정리(저장된 값은 그대로 두고 조회 때만 정리).
+# 한계: 위 문자 외의 공백류(U+2009 등, 폭 없는 공백)와 33칸 이상 이어진 공백은 다 정리되지 않고,
+# 이름 사이 공백 유무("홍 길동"/"홍길동")나 대소문자는 다른 기부자로 봅니다.
+# idx_income_donor 인덱스 식과 조회 식이 글자 그대로 같아야 인덱스를 씁니다(식이 바뀌면 init_db가 인덱스를 다시 만듦).
+DONOR_KEY_SQL = _donor_key_sql()
+# 영수증을 발행하지 않는 이름(공백 제거 후 비교)
+ANONYMOUS_DONORS = {"무명", "익명"}
+
+# 동시 저장 시 잠금 대기(busy timeout)와 BEGIN IMMEDIATE 재시도 설정
+BUSY_TIMEOUT_SEC = 10.0
+WRITE_RETRIES = 5
+
+class SaveConflictError(Exception):
+    """다른 사용자가 먼저 같은 날짜를 저장해 버전이 달라졌을 때 발생합니다."""
+
+    def __init__(self, d: dt.date, expected: int, current: int):
+        super().__init__(f"{d.isoformat()} 장부가 다른 사용자에 의해 변경되었습니다. (불러온 버전 {expected}, 현재 버전 {current})")
+        self.d = d
+        self.expected = expected
+        self.current = current
+
+class PeriodClosedError(Exception):
+    """마감된 기간(월/년)의 날짜를 저장하려 할 때 발생합니다."""
+
+    def __init__(self, d: dt.date, period: str):
+        super().__init__(f"{d.isoformat()}은(는) 마감된 기간({period})이라 수정할 수 없습니다. 마감을 해제한 뒤 수정해 주세요.")
+        self.d = d
+        self.period = period
+
 def _connect():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    return conn
+    """현재 장부(tenants.current_ledger())의 연결. close()하면 재사용을 위해 라우터로 돌아갑니다."""
+    return tenants.router.connect(timeout=BUSY_TIMEOUT_SEC)
+
+def db_path() -> str:
+    """현재 장부의 DB 파일 경로"""
+    return tenants.get_ledger().db_path
+
+def _is_locked(e: Exception) -> bool:
+    msg = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in msg or "busy" in msg)
+
+@contextmanager
+def _write_txn(conn):
+    """
+    쓰기 트랜잭션(BEGIN IMMEDIATE).
+    - 시작 시점에 쓰기 잠금을 잡아, 읽은 뒤 쓰기로 넘어갈 때 생기는 'database is locked'를 방지
+    - 잠금 획득 실패 시 짧게 쉬었다가 재시도
+    - 블록이 정상 종료되면 COMMIT, 예외면 ROLLBACK
+    """
+    conn.isolation_level = None  # 트랜잭션을 직접 관리
+    for attempt in range(WRITE_RETRIES):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            break
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e) or attempt == WRITE_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (2 ** attempt) + random.uniform(0, 0.05))
+    try:
+        yield conn.cursor()
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+# 스키마 준비가 끝난 DB 파일(프로세스당 장부별 1회만 실행)
+_initialized: set = set()
+_init_lock = threading.Lock()
 
 def init_db() -> None:
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS income (
+    path = db_path()
+    if path in _initialized:
+        return
+    with _init_lock:
+        if path in _initialized:
+            return
+        _create_schema()
+        _initialized.add(path)
+
+# 항목(카테고리) 기본값: 새 장부/기존 장부 변환 시 이 순서로 등록
+DEFAULT_CATEGORIES = {
+    "income": [
+        "십일조", "주정헌금", "감사헌금", "선교헌금", "건축헌금", "차량헌금", "구제헌금",
+        "신년감사헌금", "부활절감사헌금", "맥추감사헌금", "추수감사헌금", "성탄감사헌금",
+        "작정헌금", "기타", "대출금", "예치금", "이월금"
+    ],
+    "expense": [
+        "재정부", "예배부", "선교부", "사량부", "관리부", "식당봉사부", "새신자전도부",
+        "주일학교", "중고청년", "사례비1", "사례비2", "전기요금", "전화요금등", "상하수도요금",
+        "사택관리", "대출금이자", "화재보험료", "대출금", "예치금", "이월금"
+    ],
+}
+# 순합계(순입금/순지출)에서 제외하는 항목 기본값
+DEFAULT_EXCLUDE_FOR_NET = {"예치금", "이월금"}
+# 기부금 영수증에서 제외하는 수입항목 기본값(헌금이 아닌 항목)
+DEFAULT_NON_RECEIPT = {"기타", "대출금", "예치금", "이월금"}
+
+def _default_receipt(kind: str, name: str) -> int:
+    return int(kind == "income" and name not in DEFAULT_NON_RECEIPT)
+
+def _ledger_table_sql(name: str) -> str:
+    # 항목은 category.code(정수)로 저장
+    # uid: 장부 사본끼리 같은 행을 가리키는 고정 id, rev: 행이 바뀔 때마다 새로 붙는 버전 표식(utils.sync)
+    return f"""
+        CREATE TABLE IF NOT EXISTS {name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             d TEXT NOT NULL,
             usage TEXT,
-            item TEXT,
+            item_code INTEGER REFERENCES category(code),
             detail TEXT,
             amount REAL,
-            note TEXT
+            note TEXT,
+            uid TEXT,
+            rev TEXT
+        )
+    """
+
+def _seed_categories(cur) -> None:
+    if cur.execute("SELECT COUNT(*) FROM category").fetchone()[0]:
+        return
+    for kind, names in DEFAULT_CATEGORIES.items():
+        for i, name in enumerate(names, start=1):
+            cur.execute(
+                "INSERT INTO category (kind, name, sort_order, exclude_net, receipt) VALUES (?, ?, ?, ?, ?)",
+                (kind, name, i, int(name in DEFAULT_EXCLUDE_FOR_NET), _default_receipt(kind, name)),
+            )
+
+def _migrate_item_codes(cur, kind: str) -> None:
+    """예전 형식(item 문자열 컬럼) 장부 테이블을 item_code 형식으로 변환합니다(행 id 유지)."""
+    # 기본 목록에 없는 항목명도 잃지 않도록 항목으로 등록
+    for (name,) in cur.execute(
+        f"SELECT DISTINCT item FROM {kind} WHERE item IS NOT NULL AND item NOT IN "
+        "(SELECT name FROM category WHERE kind=?)", (kind,)
+    ).fetchall():
+        cur.execute(
+            "INSERT INTO category (kind, name, sort_order, exclude_net, receipt) "
+            "VALUES (?, ?, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM category WHERE kind=?), 0, ?)",
+            (kind, name, kind, _default_receipt(kind, name)),
+        )
+    cur.execute(_ledger_table_sql(f"{kind}_new"))
+    cur.execute(
+        f"INSERT INTO {kind}_new (id, d, usage, item_code, detail, amount, note) "
+        f"SELECT t.id, t.d, t.usage, c.code, t.detail, t.amount, t.note "
+        f"FROM {kind} t LEFT JOIN category c ON c.kind=? AND c.name=t.item",
+        (kind,),
+    )
+    # 새 테이블의 AUTOINCREMENT 위치는 MAX(id)가 되므로, 지운 마지막 행 id가 다시 쓰이지 않게 예전 위치를 되살림
+    # (change_log.row_id가 다른 행을 가리키지 않도록)
+    seq = cur.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (kind,)).fetchone()
+    cur.execute(f"DROP TABLE {kind}")
+    cur.execute(f"ALTER TABLE {kind}_new RENAME TO {kind}")
+    if seq is not None:
+        cur.execute("UPDATE sqlite_sequence SET seq=MAX(seq, ?) WHERE name=?", (seq[0], kind))
+        if cur.rowcount == 0:
+            cur.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (kind, seq[0]))
+
+def _create_schema() -> None:
+    conn = _connect()
+    # 항목(카테고리) 마스터 + 장부 테이블(필요하면 예전 형식에서 변환)
+    with _write_txn(conn) as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS category (
+                code INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                sort_order INTEGER NOT NULL,
+                exclude_net INTEGER NOT NULL DEFAULT 0,
+                receipt INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (kind, name)
+            )
+        """)
+        # 기부금 영수증 대상 여부(receipt) 컬럼이 없던 DB
+        if "receipt" not in [r[1] for r in cur.execute("PRAGMA table_info(category)").fetchall()]:
+            cur.execute("ALTER TABLE category ADD COLUMN receipt INTEGER NOT NULL DEFAULT 0")
+            for code, kind, name in cur.execute("SELECT code, kind, name FROM category").fetchall():
+                cur.execute("UPDATE category SET receipt=? WHERE code=?", (_default_receipt(kind, name), code))
+        # 복식부기 분개에서 이 항목이 쓰는 계정(utils.journal). NULL이면 항목마다 자기 수입/지출 계정
+        if "account" not in [r[1] for r in cur.execute("PRAGMA table_info(category)").fetchall()]:
+            cur.execute("ALTER TABLE category ADD COLUMN account TEXT")
+        _seed_categories(cur)
+        for kind in ("income", "expense"):
+            cols = [r[1] for r in cur.execute(f"PRAGMA table_info({kind})").fetchall()]
+            if "item" in cols:
+                _migrate_item_codes(cur, kind)
+            else:
+                cur.execute(_ledger_table_sql(kind))
+            if cols and "uid" not in cols:
+                if "item" not in cols:
+                    cur.execute(f"ALTER TABLE {kind} ADD COLUMN uid TEXT")
+                    cur.execute(f"ALTER TABLE {kind} ADD COLUMN rev TEXT")
+                # 기존 행: 행 id로 정한 uid(같은 파일에서 나온 사본끼리는 같은 값) + 공통 버전 '0'
+                cur.execute(f"UPDATE {kind} SET uid = '{kind}-' || id, rev = '0' WHERE uid IS NULL")
+            cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{kind}_uid ON {kind}(uid)")
+
+    cur = conn.cursor()
+    # 변경 이력(append-only): save_day와 같은 트랜잭션에서 기록
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT NOT NULL,
+            actor TEXT,
+            kind TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            d TEXT,
+            old_json TEXT,
+            new_json TEXT,
+            uid TEXT,
+            base_rev TEXT,
+            rev TEXT,
+            origin TEXT
+        )
+    """)
+    # 동기화용 컬럼(uid/이전 버전/새 버전/변경한 사본)이 없던 DB
+    log_cols = [r[1] for r in cur.execute("PRAGMA table_info(change_log)").fetchall()]
+    for col in ("uid", "base_rev", "rev", "origin"):
+        if col not in log_cols:
+            cur.execute(f"ALTER TABLE change_log ADD COLUMN {col} TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_change_log_d ON change_log(d)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_change_log_uid ON change_log(uid, seq)")
+    # 장부 사본 간 동기화(utils.sync): 이 사본의 id, 상대 사본별 주고받은 위치, 충돌 기록
+    cur.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_peer (
+            node TEXT PRIMARY KEY,
+            acked_seq INTEGER NOT NULL DEFAULT 0,
+            received_seq INTEGER NOT NULL DEFAULT 0,
+            last_export TEXT,
+            last_import TEXT
         )
     """)
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS expense (
+        CREATE TABLE IF NOT EXISTS sync_conflict (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
+            peer TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            d TEXT,
+            local_rev TEXT,
+            change_json TEXT NOT NULL,
+            reason TEXT NOT NULL,
+            detected_at TEXT NOT NULL,
+            resolved_at TEXT,
+            resolution TEXT,
+            actor TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sync_conflict_uid ON sync_conflict(uid, resolved_at)")
+    # 동기화 시작 위치: 이 기능 이전의 변경 이력에는 uid가 없으므로 내보내지 않음
+    cur.execute(
+        "INSERT OR IGNORE INTO sync_state (key, value) SELECT 'base_seq', COALESCE(MAX(seq), 0) FROM change_log"
+    )
+    # 파일을 다른 위치/컴퓨터로 복사한 사본은 원본과 다른 id를 받음
+    home = f"{socket.gethostname()}:{os.path.abspath(db_path())}"
+    row = cur.execute("SELECT value FROM sync_state WHERE key='home'").fetchone()
+    if row is None or row[0] != home:
+        _new_sync_node(cur, home)
+    # 날짜 조회/정렬 및 (d, id) 기준 페이지 나누기용
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_income_d_id ON income(d, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expense_d_id ON expense(d, id)")
+    # 거래 내역 화면/API의 항목 필터 + (d, id) 키셋 페이지 나누기용
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_income_item_d_id ON income(item_code, d, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_expense_item_d_id ON expense(item_code, d, id)")
+    # 기부자별 조회용(수입내역의 헌금자 이름 기준)
+    old = cur.execute("SELECT sql FROM sqlite_master WHERE type='index' AND name='idx_income_donor'").fetchone()
+    if old is not None and DONOR_KEY_SQL not in old[0]:
+        cur.execute("DROP INDEX idx_income_donor")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_income_donor ON income({DONOR_KEY_SQL}, d)")
+    # 날짜별 버전(동시 편집 충돌 감지용): 저장으로 내용이 바뀔 때마다 1씩 증가
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS day_version (
+            d TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    # 날짜 차원(주차/분기/절기): ensure_calendar()로 연도 단위로 채움
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS calendar (
+            d TEXT PRIMARY KEY,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            quarter INTEGER NOT NULL,
+            weekday INTEGER NOT NULL,
+            week_no INTEGER NOT NULL,
+            week_start TEXT NOT NULL,
+            week_end TEXT NOT NULL,
+            season TEXT,
+            holy_day TEXT
+        ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_calendar_ym ON calendar(year, month, weekday)")
+    # DB 정리(ANALYZE/VACUUM/체크포인트) 기록: utils.maintenance
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT NOT NULL,
+            trigger TEXT NOT NULL,
+            actor TEXT,
+            steps TEXT NOT NULL,
+            elapsed_sec REAL NOT NULL,
+            before_json TEXT NOT NULL,
+            after_json TEXT NOT NULL
+        )
+    """)
+    # 기간 마감(월 'YYYY-MM' / 년 'YYYY'): 마감한 기간은 save_day가 거부하고, 보고서는 저장된 결과표(snapshot)를 그대로 사용
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS period_close (
+            period TEXT PRIMARY KEY,
+            start_d TEXT NOT NULL,
+            end_d TEXT NOT NULL,
+            closed_at TEXT NOT NULL,
+            actor TEXT,
+            snapshot_json TEXT NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_period_close_range ON period_close(start_d, end_d)")
+    # 영수증 첨부(utils.attachments): 파일 내용은 해시 이름으로 디스크에 1번만 저장하고, 여기서는 행과 연결만 보관
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS attachment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            filename TEXT,
+            mime TEXT,
+            size INTEGER NOT NULL,
+            added_at TEXT NOT NULL,
+            actor TEXT,
+            UNIQUE (kind, row_id, sha256)
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attachment_sha ON attachment(sha256)")
+    # 날짜별 합계(수입/지출 x 적요 x 항목): save_day가 바뀐 날짜만 다시 계산 → 첫 화면 요약은 원본 행을 읽지 않음
+    new_totals = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_totals'").fetchone() is None
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_totals (
             d TEXT NOT NULL,
+            kind TEXT NOT NULL,
             usage TEXT,
-            item TEXT,
-            detail TEXT,
-            amount REAL,
-            note TEXT
+            item_code INTEGER,
+            amount REAL NOT NULL,
+            n INTEGER NOT NULL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_daily_totals_d ON daily_totals(d, kind)")
+    if new_totals:
+        for kind in ("income", "expense"):
+            cur.execute(_DAILY_TOTALS_INSERT.format(kind=kind, where=""), (kind,))
+    # 복식부기(선택, utils.journal): 계정과목, 분개(장부에서 날짜별로 자동 생성 + 수기 입력), 계정별 월 합계
+    # 계정이 하나라도 있으면 켜진 것으로 보고, 장부 저장 때 바뀐 날짜의 자동 분개와 그 달 합계를 다시 만듦
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS account (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS journal_entry (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            d TEXT NOT NULL,
+            memo TEXT,
+            source TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            actor TEXT
         )
     """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_journal_entry_d ON journal_entry(d, source)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS journal_line (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_id INTEGER NOT NULL REFERENCES journal_entry(id),
+            d TEXT NOT NULL,
+            account TEXT NOT NULL,
+            debit REAL NOT NULL DEFAULT 0,
+            credit REAL NOT NULL DEFAULT 0
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_journal_line_entry ON journal_line(entry_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_journal_line_d ON journal_line(d, account)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS account_balance (
+            account TEXT NOT NULL,
+            month TEXT NOT NULL,
+            debit REAL NOT NULL,
+            credit REAL NOT NULL,
+            PRIMARY KEY (month, account)
+        ) WITHOUT ROWID
+    """)
     conn.commit()
     conn.close()
 
+    # 장부에 있는 연도 ~ 올해+5년(날짜 선택기 범위)까지 미리 채움
+    this_year = dt.date.today().year
+    first, last = this_year - 5, this_year + 5
+    conn = _connect()
+    for kind in ("income", "expense"):
+        lo, hi = conn.execute(f"SELECT MIN(d), MAX(d) FROM {kind}").fetchone()
+        if lo:
+            first = min(first, int(lo[:4]))
+        if hi:
+            last = max(last, int(hi[:4]))
+    conn.close()
+    for year in range(first, last + 1):
+        _fill_calendar_year(year)
+
+# ---------------------------------------------------------------------------
+# 날짜 차원(calendar)
+# ---------------------------------------------------------------------------
+# 장부별로 채워 둔 연도: {db 경로: {연도}}
+_calendar_years: dict = {}
+
+def _fill_calendar_year(year: int) -> None:
+    conn = _connect()
+    try:
+        with _write_txn(conn) as cur:
+            if cur.execute("SELECT 1 FROM calendar WHERE d=?", (f"{year:04d}-12-31",)).fetchone() is None:
+                cur.executemany(
+                    "INSERT OR REPLACE INTO calendar VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", calendar_rows(year)
+                )
+    finally:
+        conn.close()
+    _calendar_years.setdefault(db_path(), set()).add(year)
+
+def ensure_calendar(*years: int) -> None:
+    """calendar 테이블에 해당 연도가 없으면 채웁니다."""
+    init_db()
+    done = _calendar_years.get(db_path(), set())
+    for year in years:
+        if year not in done:
+            _fill_calendar_year(year)
+
+def calendar_day(d: dt.date) -> dict:
+    """날짜의 달력 정보(year, month, quarter, weekday(0=일), week_no, week_start, week_end, season, holy_day)"""
+    ensure_calendar(d.year)
+    conn = _connect()
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM calendar WHERE d=?", (d.isoformat(),)).fetchone()
+    out = dict(row)
+    conn.close()
+    out["week_start"] = dt.date.fromisoformat(out["week_start"])
+    out["week_end"] = dt.date.fromisoformat(out["week_end"])
+    return out
+
+def sundays_of_month(year: int, month: int) -> list[dt.date]:
+    """그 달의 주일 목록(n번째가 n주차)"""
+    ensure_calendar(year)
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT d FROM calendar WHERE year=? AND month=? AND weekday=0 ORDER BY d", (year, month)
+    ).fetchall()
+    conn.close()
+    return [dt.date.fromisoformat(r[0]) for r in rows]
+
+# ---------------------------------------------------------------------------
+# 항목(카테고리)
+# ---------------------------------------------------------------------------
+# 장부별 항목 목록 캐시: {db 경로: (읽은 시각, DataFrame)}
+_category_cache: dict = {}
+CATEGORY_CACHE_TTL_SEC = 60.0
+
+def load_categories() -> pd.DataFrame:
+    """
+    현재 장부의 항목 목록(code, kind, name, sort_order, exclude_net, receipt)을 정렬 순서대로 반환합니다.
+    장부별로 캐시하며(CATEGORY_CACHE_TTL_SEC), 이 프로세스에서 항목을 바꾸면 즉시 다시 읽습니다.
+    """
+    init_db()
+    path = db_path()
+    hit = _category_cache.get(path)
+    if hit is not None and time.monotonic() - hit[0] < CATEGORY_CACHE_TTL_SEC:
+        return hit[1]
+    conn = _connect()
+    df = pd.read_sql_query(
+        "SELECT code, kind, name, sort_order, exclude_net, receipt FROM category ORDER BY kind, sort_order, code", conn
+    )
+    conn.close()
+    df["exclude_net"] = df["exclude_net"].astype(bool)
+    df["receipt"] = df["receipt"].astype(bool)
+    _category_cache[path] = (time.monotonic(), df)
+    return df
+
+def item_names(kind: str) -> list[str]:
+    """입력/보고 화면에 표시할 항목명(정렬 순서)"""
+    cats = load_categories()
+    return cats.loc[cats["kind"] == kind, "name"].tolist()
+
+def net_excluded_items(kind: str) -> list[str]:
+    """순합계에서 제외하는 항목명(예: 예치금, 이월금), 정렬 순서대로"""
+    cats = load_categories()
+    return cats.loc[(cats["kind"] == kind) & cats["exclude_net"], "name"].tolist()
+
+def add_category(kind: str, name: str, exclude_net: bool = False, receipt: bool = False) -> int:
+    """항목을 목록 끝에 추가하고 code를 반환합니다."""
+    if kind not in KIND_COLS:
+        raise ValueError(f"알 수 없는 장부 종류: {kind}")
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("항목 이름을 입력해 주세요.")
+    init_db()
+    conn = _connect()
+    try:
+        with _write_txn(conn) as cur:
+            if cur.execute("SELECT 1 FROM category WHERE kind=? AND name=?", (kind, name)).fetchone():
+                raise ValueError(f"이미 있는 항목입니다: {name}")
+            cur.execute(
+                "INSERT INTO category (kind, name, sort_order, exclude_net, receipt) "
+                "VALUES (?, ?, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM category WHERE kind=?), ?, ?)",
+                (kind, name, kind, int(bool(exclude_net)), int(bool(receipt) and kind == "income")),
+            )
+            code = cur.lastrowid
+    finally:
+        conn.close()
+    _category_cache.pop(db_path(), None)
+    return int(code)
+
+def set_category_flags(code: int, exclude_net: Optional[bool] = None, receipt: Optional[bool] = None) -> None:
+    """항목의 순합계 제외/기부금 영수증 대상 여부를 바꿉니다(None이면 그대로)."""
+    init_db()
+    conn = _connect()
+    try:
+        with _write_txn(conn) as cur:
+            if exclude_net is not None:
+                cur.execute("UPDATE category SET exclude_net=? WHERE code=?", (int(bool(exclude_net)), int(code)))
+            if receipt is not None:
+                cur.execute("UPDATE category SET receipt=? WHERE code=?", (int(bool(receipt)), int(code)))
+    finally:
+        conn.close()
+    _category_cache.pop(db_path(), None)
+
+def _item_codes(cur, kind: str) -> dict:
+    return {name: code for code, name in cur.execute("SELECT code, name FROM category WHERE kind=?", (kind,))}
+
+def _rows_sql(
+    kind: str, where: str = "", order: str = "t.d, t.id", with_id: bool = False, with_uid: bool = False
+) -> str:
+    """장부 행 조회 SQL(항목 code → 항목명 JOIN, 화면용 한글 컬럼명)"""
+    item_col, detail_col = KIND_COLS[kind]
+    return (
+        f"SELECT {'t.id, ' if with_id else ''}{'t.uid, ' if with_uid else ''}t.d as 날짜, t.usage as 적요, c.name as {item_col}, "
+        f"t.detail as {detail_col}, t.amount as 금액, t.note as 비고 "
+        f"FROM {kind} t LEFT JOIN category c ON c.code = t.item_code"
+        + (f" WHERE {where}" if where else "")
+        + f" ORDER BY {order}"
+    )
+
+# ---------------------------------------------------------------------------
+# 집계(항목 code 기준 GROUP BY)
+# ---------------------------------------------------------------------------
+def item_totals(kind: str, start_date: dt.date, end_date: dt.date) -> pd.DataFrame:
+    """기간(포함)의 항목별 금액 합계: [항목명 컬럼, 금액]"""
+    init_db()
+    item_col = KIND_COLS[kind][0]
+    conn = _connect()
+    df = pd.read_sql_query(
+        f"SELECT c.name as {item_col}, s.amount as 금액 "
+        f"FROM (SELECT item_code, SUM(amount) AS amount FROM {kind} WHERE d >= ? AND d <= ? GROUP BY item_code) s "
+        f"LEFT JOIN category c ON c.code = s.item_code",
+        conn,
+        params=(start_date.isoformat(), end_date.isoformat()),
+    )
+    conn.close()
+    return df
+
+def usage_totals(kind: str, start_date: dt.date, end_date: dt.date) -> pd.DataFrame:
+    """기간(포함)의 적요(현금/은행)별 금액 합계: [적요, 금액]"""
+    init_db()
+    conn = _connect()
+    df = pd.read_sql_query(
+        f"SELECT usage as 적요, SUM(amount) as 금액 FROM {kind} WHERE d >= ? AND d <= ? GROUP BY usage",
+        conn,
+        params=(start_date.isoformat(), end_date.isoformat()),
+    )
+    conn.close()
+    return df
+
+def monthly_item_totals(kind: str, year: int) -> pd.DataFrame:
+    """연도의 항목별/월별 금액 합계: [항목명 컬럼, 월, 금액]"""
+    ensure_calendar(year)
+    item_col = KIND_COLS[kind][0]
+    conn = _connect()
+    df = pd.read_sql_query(
+        f"SELECT c.name as {item_col}, s.month as 월, s.amount as 금액 "
+        f"FROM (SELECT t.item_code, cal.month, SUM(t.amount) AS amount "
+        f"      FROM {kind} t JOIN calendar cal ON cal.d = t.d "
+        f"      WHERE cal.year = ? GROUP BY t.item_code, cal.month) s "
+        f"LEFT JOIN category c ON c.code = s.item_code",
+        conn,
+        params=(year,),
+    )
+    conn.close()
+    return df
+
+def period_totals(ranges: list) -> list[dict]:
+    """
+    여러 기간의 수입/지출 x 적요 합계를 daily_totals에서 한 번에 계산합니다.
+    ranges: [(시작일, 종료일), ...] → 같은 순서로 [{(kind, 적요, 순합계 제외 여부): 금액}, ...]
+    순합계 제외 여부는 항목(category)의 exclude_net이며, 항목이 없는 행은 None입니다.
+    """
+    init_db()
+    if not ranges:
+        return []
+    cols = ", ".join(
+        "COALESCE(SUM(CASE WHEN t.d >= ? AND t.d <= ? THEN t.amount END), 0)" for _ in ranges
+    )
+    params = [x.isoformat() for start, end in ranges for x in (start, end)]
+    params += [min(r[0] for r in ranges).isoformat(), max(r[1] for r in ranges).isoformat()]
+    conn = _connect()
+    rows = conn.execute(
+        f"SELECT t.kind, t.usage, c.exclude_net AS excl, {cols} "
+        "FROM daily_totals t LEFT JOIN category c ON c.code = t.item_code "
+        "WHERE t.d >= ? AND t.d <= ? GROUP BY t.kind, t.usage, excl",
+        params,
+    ).fetchall()
+    conn.close()
+    out = [{} for _ in ranges]
+    for kind, usage, excl, *sums in rows:
+        for i, v in enumerate(sums):
+            if v:
+                out[i][(kind, usage, None if excl is None else bool(excl))] = float(v)
+    return out
+
+def weekly_totals(start_date: dt.date, end_date: dt.date) -> list[tuple]:
+    """
+    기간의 주별 합계: [(주 시작일, 주 끝날, 수입, 지출)]
+    주는 calendar 테이블의 주(calendar_day의 week_start~week_end, 달이 바뀌는 주는 달마다 나눔)로,
+    "이번 주" 합계와 보고 화면의 주와 같습니다. 주 시작일순이며, 행이 없는 주도 0으로 들어갑니다.
+    """
+    ensure_calendar(*range(start_date.year, end_date.year + 1))
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT c.week_start, MAX(c.week_end), "
+        "       COALESCE(SUM(CASE WHEN t.kind='income' THEN t.amount END), 0), "
+        "       COALESCE(SUM(CASE WHEN t.kind='expense' THEN t.amount END), 0) "
+        "FROM calendar c LEFT JOIN daily_totals t ON t.d = c.d "
+        "WHERE c.d >= ? AND c.d <= ? GROUP BY c.week_start ORDER BY c.week_start",
+        (start_date.isoformat(), end_date.isoformat()),
+    ).fetchall()
+    conn.close()
+    return [
+        (dt.date.fromisoformat(ws), dt.date.fromisoformat(we), float(i), float(e)) for ws, we, i, e in rows
+    ]
+
+def day_item_totals(dates: list) -> dict:
+    """
+    지정한 날짜들의 항목별 합계를 daily_totals에서 읽습니다(날짜 인덱스로 바로 찾음, 원본 행은 읽지 않음).
+    반환: {(date, kind): {항목명: 금액}} (행이 없는 날짜/종류는 빠짐, 항목 없는 행은 항목명 None)
+    """
+    init_db()
+    if not dates:
+        return {}
+    marks = ", ".join("?" for _ in dates)
+    conn = _connect()
+    rows = conn.execute(
+        f"SELECT t.d, t.kind, c.name, SUM(t.amount) FROM daily_totals t LEFT JOIN category c ON c.code = t.item_code "
+        f"WHERE t.d IN ({marks}) GROUP BY t.d, t.kind, t.item_code",
+        [d.isoformat() for d in dates],
+    ).fetchall()
+    conn.close()
+    out: dict = {}
+    for d, kind, name, amount in rows:
+        out.setdefault((dt.date.fromisoformat(d), kind), {})[name] = float(amount or 0)
+    return out
+
+# ---------------------------------------------------------------------------
+# 기부자별 집계(기부금 영수증)
+# ---------------------------------------------------------------------------
+def donor_year_totals(year: int) -> pd.DataFrame:
+    """
+    연도의 기부자 x 월 x 항목 합계(영수증 대상 항목만): [기부자, 월, 항목, 금액]
+    연도 범위를 한 번만 읽어 모든 기부자를 한꺼번에 집계합니다(기부자마다 다시 읽지 않음). 무명/익명은 제외합니다.
+    """
+    init_db()
+    conn = _connect()
+    df = pd.read_sql_query(
+        f"SELECT s.donor as 기부자, s.m as 월, c.name as 항목, s.amount as 금액 "
+        f"FROM (SELECT {DONOR_KEY_SQL} AS donor, CAST(substr(d, 6, 2) AS INTEGER) AS m, item_code, SUM(amount) AS amount "
+        f"      FROM income "
+        f"      WHERE {DONOR_KEY_SQL} <> '' AND d >= ? AND d <= ? "
+        f"        AND item_code IN (SELECT code FROM category WHERE kind='income' AND receipt=1) "
+        f"      GROUP BY {DONOR_KEY_SQL}, m, item_code) s "
+        f"JOIN category c ON c.code = s.item_code "
+        f"ORDER BY s.donor, s.m, c.sort_order",
+        conn,
+        params=(f"{year:04d}-01-01", f"{year:04d}-12-31"),
+    )
+    conn.close()
+    anonymous = df["기부자"].str.replace(" ", "", regex=False).isin(ANONYMOUS_DONORS)
+    return df.loc[~anonymous].reset_index(drop=True)
+
+def donor_rows(donor: str, year: int) -> pd.DataFrame:
+    """한 기부자의 연도별 헌금 내역(영수증 대상 항목만, 인덱스 조회)"""
+    init_db()
+    conn = _connect()
+    df = pd.read_sql_query(
+        f"SELECT t.d as 날짜, c.name as 수입항목, t.detail as 수입내역, t.amount as 금액 "
+        f"FROM income t JOIN category c ON c.code = t.item_code AND c.receipt = 1 "
+        f"WHERE {_donor_key_sql('t.detail')} = ? AND t.d >= ? AND t.d <= ? ORDER BY t.d, t.id",
+        conn,
+        params=(donor, f"{year:04d}-01-01", f"{year:04d}-12-31"),
+    )
+    conn.close()
+    return df
+
+def bank_rows(start_date: dt.date, end_date: dt.date) -> list[tuple]:
+    """
+    적요가 '은행'인 수입/지출 행(통장 거래내역 대조용), 날짜순.
+    (구분 "income"/"expense", id, 날짜, 항목, 내역, 금액) — 금액은 수입 +, 지출 -
+    """
+    init_db()
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT kind, id, d, item, detail, amount FROM ("
+        "  SELECT 'income' AS kind, t.id, t.d, c.name AS item, t.detail, t.amount"
+        "  FROM income t LEFT JOIN category c ON c.code = t.item_code"
+        "  WHERE t.d >= ? AND t.d <= ? AND t.usage = '은행'"
+        "  UNION ALL"
+        "  SELECT 'expense', t.id, t.d, c.name, t.detail, -t.amount"
+        "  FROM expense t LEFT JOIN category c ON c.code = t.item_code"
+        "  WHERE t.d >= ? AND t.d <= ? AND t.usage = '은행'"
+        ") ORDER BY d, kind, id",
+        (start_date.isoformat(), end_date.isoformat()) * 2,
+    ).fetchall()
+    conn.close()
+    return [(kind, rid, dt.date.fromisoformat(d), item, detail, amount) for kind, rid, d, item, detail, amount in rows]
+
 def _normalize_amount(x):
     if x is None:
         return None
@@ -96,22 +813,25 @@ def _clean_df(df: pd.DataFrame, cols) -> pd.DataFrame:
     return df
 
 
-def fetch_range(start_date: dt.date, end_date: dt.date) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """start_date ~ end_date(포함) 범위의 수입/지출 데이터를 반환합니다."""
+def fetch_range(
+    start_date: dt.date, end_date: dt.date, with_uid: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    start_date ~ end_date(포함) 범위의 수입/지출 데이터를 반환합니다.
+    with_uid=True 이면 맨 앞에 행 uid 컬럼(save_days에 그대로 넘기면 같은 행을 고침)
+    """
     init_db()
     conn = _connect()
     sd = start_date.isoformat()
     ed = end_date.isoformat()
 
     income = pd.read_sql_query(
-        "SELECT d as 날짜, usage as 적요, item as 수입항목, detail as 수입내역, amount as 금액, note as 비고 "
-        "FROM income WHERE d >= ? AND d <= ? ORDER BY d, id",
+        _rows_sql("income", "t.d >= ? AND t.d <= ?", with_uid=with_uid),
         conn,
         params=(sd, ed),
     )
     expense = pd.read_sql_query(
-        "SELECT d as 날짜, usage as 적요, item as 지출항목, detail as 지출내역, amount as 금액, note as 비고 "
-        "FROM expense WHERE d >= ? AND d <= ? ORDER BY d, id",
+        _rows_sql("expense", "t.d >= ? AND t.d <= ?", with_uid=with_uid),
         conn,
         params=(sd, ed),
     )
@@ -124,23 +844,65 @@ def fetch_range(start_date: dt.date, end_date: dt.date) -> Tuple[pd.DataFrame, p
         expense["날짜"] = pd.to_datetime(expense["날짜"]).dt.date
 
     # 컬럼 정리/정규화
-    income = _clean_df(income, INCOME_COLS)
-    expense = _clean_df(expense, EXPENSE_COLS)
+    uid_col = ["uid"] if with_uid else []
+    income = _clean_df(income, uid_col + INCOME_COLS)
+    expense = _clean_df(expense, uid_col + EXPENSE_COLS)
     return income, expense
 
-def fetch_day(d: dt.date) -> Tuple[pd.DataFrame, pd.DataFrame]:
+# 한 번에 읽어 DataFrame으로 만드는 행 수(iter_range 기본값)
+CHUNK_ROWS = 5000
+
+def iter_range(
+    kind: str,
+    start_date: Optional[dt.date] = None,
+    end_date: Optional[dt.date] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    with_id: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    기간(생략하면 처음/끝까지)의 장부 행을 (날짜, id) 순서로 chunk_rows개씩 나눠 돌려줍니다.
+    각 조각은 fetch_range와 같은 형태로 정리되어 있고(with_id=True 이면 맨 앞에 id), 메모리에는 한 조각만 올라갑니다.
+    하나의 읽기 트랜잭션으로 읽으므로 도중에 저장이 있어도 시작 시점의 내용이 그대로 나옵니다.
+    """
+    if kind not in KIND_COLS:
+        raise ValueError(f"알 수 없는 장부 종류: {kind}")
+    init_db()
+    cols = (["id"] if with_id else []) + (INCOME_COLS if kind == "income" else EXPENSE_COLS)
+    where, params = ["1=1"], []
+    if start_date is not None:
+        where.append("t.d >= ?")
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        where.append("t.d <= ?")
+        params.append(end_date.isoformat())
+
+    conn = _connect()
+    cur = conn.execute(_rows_sql(kind, " AND ".join(where), with_id=True), params)
+    try:
+        names = [c[0] for c in cur.description]
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            df = pd.DataFrame.from_records(rows, columns=names)
+            df["날짜"] = pd.to_datetime(df["날짜"]).dt.date
+            yield _clean_df(df, cols)
+    finally:
+        # 중간에 그만 읽어도(generator close) 읽기 트랜잭션을 끝내고 연결을 돌려줌
+        cur.close()
+        conn.close()
+
+def fetch_day(d: dt.date, with_uid: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    선택일자의 수입/지출 행(id 순).
+    with_uid=True 이면 맨 앞에 행 uid 컬럼: 편집 후 save_day에 그대로 넘기면 내용을 고친 행도 같은 행(id, 첨부 유지)으로 저장됩니다.
+    """
     init_db()
     conn = _connect()
     ds = d.isoformat()
 
-    income = pd.read_sql_query(
-        "SELECT d as 날짜, usage as 적요, item as 수입항목, detail as 수입내역, amount as 금액, note as 비고 FROM income WHERE d=? ORDER BY id",
-        conn, params=(ds,)
-    )
-    expense = pd.read_sql_query(
-        "SELECT d as 날짜, usage as 적요, item as 지출항목, detail as 지출내역, amount as 금액, note as 비고 FROM expense WHERE d=? ORDER BY id",
-        conn, params=(ds,)
-    )
+    income = pd.read_sql_query(_rows_sql("income", "t.d=?", order="t.id", with_uid=with_uid), conn, params=(ds,))
+    expense = pd.read_sql_query(_rows_sql("expense", "t.d=?", order="t.id", with_uid=with_uid), conn, params=(ds,))
     conn.close()
 
     # 날짜 컬럼을 date로
@@ -150,69 +912,652 @@ def fetch_day(d: dt.date) -> Tuple[pd.DataFrame, pd.DataFrame]:
         expense["날짜"] = pd.to_datetime(expense["날짜"]).dt.date
 
     # 컬럼 정리
-    income = _clean_df(income, INCOME_COLS)
-    expense = _clean_df(expense, EXPENSE_COLS)
+    uid_col = ["uid"] if with_uid else []
+    income = _clean_df(income, uid_col + INCOME_COLS)
+    expense = _clean_df(expense, uid_col + EXPENSE_COLS)
 
     return income, expense
 
-def save_day(d: dt.date, income_df: pd.DataFrame, expense_df: pd.DataFrame) -> None:
+# DB 컬럼 순서(장부 테이블 공통)
+ROW_FIELDS = ["d", "usage", "item", "detail", "amount", "note"]
+
+def _df_to_rows(df: pd.DataFrame, item_col: str, detail_col: str, ds: str) -> list:
+    rows = []
+    for _, r in df.iterrows():
+        rows.append((
+            (r["날짜"].isoformat() if hasattr(r["날짜"], "isoformat") else ds),
+            (r["적요"] if pd.notna(r["적요"]) else None),
+            (r[item_col] if pd.notna(r[item_col]) and str(r[item_col]).strip() else None),
+            (r[detail_col] if pd.notna(r[detail_col]) else None),
+            (float(r["금액"]) if pd.notna(r["금액"]) else None),
+            (r["비고"] if pd.notna(r["비고"]) else None),
+        ))
+    return rows
+
+def _log_change(
+    cur, ts: str, actor: Optional[str], kind: str, op: str, row_id: int, old=None, new=None,
+    uid: Optional[str] = None, base_rev: Optional[str] = None, rev: Optional[str] = None, origin: Optional[str] = None,
+) -> None:
+    d = (new or old)[0]
+    cur.execute(
+        "INSERT INTO change_log (ts, actor, kind, op, row_id, d, old_json, new_json, uid, base_rev, rev, origin) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            ts, actor, kind, op, row_id, d,
+            (json.dumps(dict(zip(ROW_FIELDS, old)), ensure_ascii=False) if old is not None else None),
+            (json.dumps(dict(zip(ROW_FIELDS, new)), ensure_ascii=False) if new is not None else None),
+            uid, base_rev, rev, origin,
+        ),
+    )
+
+def _new_rev() -> str:
+    """행 버전 표식(사본끼리 겹치지 않는 임의 값). 같은지만 비교합니다."""
+    return secrets.token_hex(8)
+
+def _new_sync_node(cur, home: Optional[str] = None) -> str:
+    node = uuid.uuid4().hex[:12]
+    cur.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('node', ?)", (node,))
+    if home is not None:
+        cur.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('home', ?)", (home,))
+    return node
+
+def _sync_node(cur) -> str:
+    """이 장부 사본의 id(변경 이력의 origin)"""
+    return cur.execute("SELECT value FROM sync_state WHERE key='node'").fetchone()[0]
+
+def reset_sync_node() -> str:
+    """
+    이 사본에 새 id를 줍니다(백업 복원처럼 변경 이력 seq가 되돌아갔을 때).
+    상대 사본은 새 사본으로 보고 처음부터 주고받으며, 이미 가진 행은 버전 표식이 같아 건너뜁니다.
+    """
+    _initialized.discard(db_path())  # 복원한 파일이 예전 형식이면 스키마부터 다시 준비
     init_db()
     conn = _connect()
-    cur = conn.cursor()
+    try:
+        with _write_txn(conn) as cur:
+            node = _new_sync_node(cur)
+    finally:
+        conn.close()
+    return node
+
+def _row_uids(df: pd.DataFrame) -> list:
+    """행마다 uid(_clean_df에 'uid' 컬럼을 포함해 정리한 df). 비어 있으면 None"""
+    return [u if isinstance(u, str) and u else None for u in df["uid"]]
+
+def _apply_rows(
+    cur, kind: str, start: str, end: str, new_rows: list, uids: list, ts: str, actor: Optional[str]
+) -> set:
+    """
+    기간(start~end)의 기존 행과 새 행을 비교해 바뀐 부분만 반영하고 이력에 남깁니다.
+    uids는 new_rows와 같은 순서의 행 uid(화면이 불러온 행의 uid, 새 행은 화면에서 만든 uid 또는 None).
+    - uid가 기간 안의 기존 행을 가리키면 그 행과 비교해 바뀐 경우만 UPDATE(행 id/uid/첨부 유지, 다른 날짜로 옮기기 포함)
+    - uid로 짝이 없는 새 행은 내용이 같은 기존 행이 남아 있으면 그대로 둠
+    - 그래도 짝이 없는 기존 행은 DELETE, 새 행은 INSERT(남은 행끼리 순서로 짝짓지 않음)
+    반환값: 내용이 바뀐 날짜(문자열) 집합
+    """
+    existing = cur.execute(
+        f"SELECT t.id, t.d, t.usage, c.name, t.detail, t.amount, t.note, t.uid, t.rev "
+        f"FROM {kind} t LEFT JOIN category c ON c.code = t.item_code WHERE t.d BETWEEN ? AND ? ORDER BY t.id",
+        (start, end),
+    ).fetchall()
+
+    # 항목명 → code (등록되지 않은 항목은 저장하지 않음)
+    codes = _item_codes(cur, kind)
+    for new in new_rows:
+        if new[2] is not None and new[2] not in codes:
+            raise ValueError(f"등록되지 않은 {KIND_COLS[kind][0]}입니다: {new[2]}")
+
+    def _db_values(row):
+        return (row[0], row[1], codes.get(row[2]), row[3], row[4], row[5])
+
+    by_uid = {row[7]: row for row in existing}
+    claimed = set()
+    updates, rest = [], []
+    for new, uid in zip(new_rows, uids):
+        row = by_uid.get(uid) if uid else None
+        if row is not None and row[0] not in claimed:
+            claimed.add(row[0])
+            if tuple(row[1:7]) != new:
+                updates.append((row, new))
+        else:
+            rest.append((new, uid))
+    unmatched = [row for row in existing if row[0] not in claimed]
+    inserts = []
+    for new, uid in rest:
+        for j, row in enumerate(unmatched):
+            if tuple(row[1:7]) == new:
+                del unmatched[j]
+                break
+        else:
+            inserts.append((new, uid))
+
+    touched = set()
+    if not updates and not inserts and not unmatched:
+        return touched
+
+    # 바뀐 행마다 새 버전 표식을 붙이고, 이력에 이전/새 표식과 이 사본의 id를 남김(utils.sync가 내보냄)
+    origin = _sync_node(cur)
+    for row in unmatched:
+        cur.execute(f"DELETE FROM {kind} WHERE id=?", (row[0],))
+        # 지운 행의 첨부 연결도 삭제(파일은 다른 행이 쓰지 않으면 DB 정리 때 지움)
+        cur.execute("DELETE FROM attachment WHERE kind=? AND row_id=?", (kind, row[0]))
+        _log_change(cur, ts, actor, kind, "delete", row[0], old=tuple(row[1:7]),
+                    uid=row[7], base_rev=row[8], rev=_new_rev(), origin=origin)
+        touched.add(row[1])
+
+    for row, new in updates:
+        rev = _new_rev()
+        cur.execute(
+            f"UPDATE {kind} SET d=?, usage=?, item_code=?, detail=?, amount=?, note=?, rev=? WHERE id=?",
+            (*_db_values(new), rev, row[0]),
+        )
+        _log_change(cur, ts, actor, kind, "update", row[0], old=tuple(row[1:7]), new=new,
+                    uid=row[7], base_rev=row[8], rev=rev, origin=origin)
+        touched.update((row[1], new[0]))
+
+    for new, uid in inserts:
+        base_rev = None
+        if uid is None or cur.execute(f"SELECT 1 FROM {kind} WHERE uid=?", (uid,)).fetchone():
+            # uid가 없거나 기간 밖의 다른 행이 쓰는 uid(오래된 화면)면 새 uid
+            uid = uuid.uuid4().hex
+        else:
+            # 지웠던 행을 같은 uid로 다시 입력: 삭제 때 표식 위에 고친 것으로 기록(utils.sync가 같은 행으로 봄)
+            tomb = cur.execute(
+                "SELECT rev FROM change_log WHERE uid=? AND op='delete' ORDER BY seq DESC LIMIT 1", (uid,)
+            ).fetchone()
+            base_rev = tomb[0] if tomb else None
+        rev = _new_rev()
+        cur.execute(
+            f"INSERT INTO {kind} (d, usage, item_code, detail, amount, note, uid, rev) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (*_db_values(new), uid, rev),
+        )
+        _log_change(cur, ts, actor, kind, "insert", cur.lastrowid, new=new,
+                    uid=uid, base_rev=base_rev, rev=rev, origin=origin)
+        touched.add(new[0])
+    return touched
+
+_DAILY_TOTALS_INSERT = (
+    "INSERT INTO daily_totals (d, kind, usage, item_code, amount, n) "
+    "SELECT d, ?, usage, item_code, COALESCE(SUM(amount), 0), COUNT(*) FROM {kind} {where} "
+    "GROUP BY d, usage, item_code"
+)
+
+def _refresh_daily_totals(cur, dates) -> None:
+    """바뀐 날짜의 daily_totals를 원본 행에서 다시 계산(save_day와 같은 트랜잭션). 복식부기를 쓰면 자동 분개도 다시 만듦."""
+    for ds in dates:
+        cur.execute("DELETE FROM daily_totals WHERE d=?", (ds,))
+        for kind in ("income", "expense"):
+            cur.execute(_DAILY_TOTALS_INSERT.format(kind=kind, where="WHERE d=?"), (kind, ds))
+    _refresh_journal(cur, dates)
+
+# ---------------------------------------------------------------------------
+# 복식부기 자동 분개(utils.journal): 장부(단식)의 날짜별 합계(daily_totals)에서 만듦
+# ---------------------------------------------------------------------------
+# 적요 → 자금 계정(적요가 비어 있으면 '적요 미지정')
+USAGE_ACCOUNTS = {"현금": "101", "은행": "102"}
+NO_USAGE_ACCOUNT = "109"
+# 항목이 비어 있는 행의 계정
+NO_ITEM_ACCOUNTS = {"income": "4999", "expense": "5999"}
+
+def category_account_code(kind: str, code: int) -> str:
+    """항목의 기본 계정코드(수입 4xxx, 지출 5xxx)"""
+    return f"{4 if kind == 'income' else 5}{int(code):03d}"
+
+def _journal_enabled(cur) -> bool:
+    return cur.execute("SELECT 1 FROM account LIMIT 1").fetchone() is not None
+
+def _category_accounts(cur) -> dict:
+    """항목 code → 계정코드. 계정을 따로 정하지 않은 항목은 기본 계정(없으면 계정과목에 추가)"""
+    for kind in ("income", "expense"):
+        cur.execute(
+            "INSERT OR IGNORE INTO account (code, name, type) "
+            "SELECT ?1 || printf('%03d', code), name, ?2 FROM category WHERE kind=?3 AND account IS NULL",
+            (str(4 if kind == "income" else 5), kind, kind),
+        )
+    return {
+        code: account or category_account_code(kind, code)
+        for code, kind, account in cur.execute("SELECT code, kind, account FROM category")
+    }
+
+def _post_ledger_entries(cur, dates=None) -> None:
+    """
+    daily_totals로 날짜 x 수입/지출마다 분개 1개를 만듦(dates가 None이면 전체).
+    수입: (차) 자금 계정 / (대) 항목 계정, 지출: (차) 항목 계정 / (대) 자금 계정. 음수 금액은 차대를 바꿈.
+    """
+    accounts = _category_accounts(cur)
+    sql = "SELECT d, kind, usage, item_code, amount FROM daily_totals"
+    if dates is None:
+        rows = cur.execute(sql + " ORDER BY d, kind").fetchall()
+    else:
+        rows = []
+        for ds in sorted(dates):
+            rows += cur.execute(sql + " WHERE d=? ORDER BY kind", (ds,)).fetchall()
+    entries: dict = {}
+    for ds, kind, usage, code, amount in rows:
+        if not amount:
+            continue
+        cash = USAGE_ACCOUNTS.get(usage, NO_USAGE_ACCOUNT)
+        other = accounts.get(code, NO_ITEM_ACCOUNTS[kind])
+        debit, credit = (cash, other) if kind == "income" else (other, cash)
+        if amount < 0:
+            debit, credit, amount = credit, debit, -amount
+        lines = entries.setdefault((ds, kind), {})
+        lines.setdefault(debit, [0.0, 0.0])[0] += amount
+        lines.setdefault(credit, [0.0, 0.0])[1] += amount
+    ts = dt.datetime.now().isoformat(timespec="seconds")
+    for (ds, kind), lines in entries.items():
+        cur.execute(
+            "INSERT INTO journal_entry (d, memo, source, created_at) VALUES (?, ?, 'ledger', ?)",
+            (ds, f"{'수입' if kind == 'income' else '지출'} 장부 합계", ts),
+        )
+        entry_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO journal_line (entry_id, d, account, debit, credit) VALUES (?, ?, ?, ?, ?)",
+            [(entry_id, ds, account, dr, cr) for account, (dr, cr) in sorted(lines.items())],
+        )
+
+def _refresh_account_months(cur, months=None) -> None:
+    """계정별 월 합계(account_balance)를 분개에서 다시 계산(months가 None이면 전체)"""
+    if months is None:
+        cur.execute("DELETE FROM account_balance")
+        cur.execute(
+            "INSERT INTO account_balance (account, month, debit, credit) "
+            "SELECT account, substr(d, 1, 7), SUM(debit), SUM(credit) FROM journal_line GROUP BY 1, 2"
+        )
+        return
+    for month in sorted(months):
+        cur.execute("DELETE FROM account_balance WHERE month=?", (month,))
+        cur.execute(
+            "INSERT INTO account_balance (account, month, debit, credit) "
+            "SELECT account, ?1, SUM(debit), SUM(credit) FROM journal_line "
+            "WHERE d BETWEEN ?1 || '-01' AND ?1 || '-31' GROUP BY account",
+            (month,),
+        )
+
+def _refresh_journal(cur, dates=None) -> None:
+    """복식부기를 쓰는 장부면 날짜(None이면 전체)의 자동 분개와 그 달의 계정별 합계를 다시 만듦"""
+    if not _journal_enabled(cur):
+        return
+    if dates is None:
+        cur.execute("DELETE FROM journal_line WHERE entry_id IN (SELECT id FROM journal_entry WHERE source='ledger')")
+        cur.execute("DELETE FROM journal_entry WHERE source='ledger'")
+        _post_ledger_entries(cur)
+        _refresh_account_months(cur)
+        return
+    dates = sorted(dates)
+    if not dates:
+        return
+    for ds in dates:
+        cur.execute(
+            "DELETE FROM journal_line WHERE entry_id IN (SELECT id FROM journal_entry WHERE d=? AND source='ledger')", (ds,)
+        )
+        cur.execute("DELETE FROM journal_entry WHERE d=? AND source='ledger'", (ds,))
+    _post_ledger_entries(cur, dates)
+    _refresh_account_months(cur, {ds[:7] for ds in dates})
+
+def _day_version(cur, ds: str) -> int:
+    row = cur.execute("SELECT version FROM day_version WHERE d=?", (ds,)).fetchone()
+    return int(row[0]) if row else 0
+
+def _bump_versions(cur, dates) -> None:
+    for ds in dates:
+        cur.execute(
+            "INSERT INTO day_version (d, version) VALUES (?, 1) "
+            "ON CONFLICT(d) DO UPDATE SET version = version + 1",
+            (ds,),
+        )
+
+def fetch_day_rows(kind: str, d: dt.date) -> pd.DataFrame:
+    """해당 날짜의 저장된 행(id 포함, fetch_day와 같은 순서). 첨부처럼 행 id가 필요한 곳에서 사용합니다."""
+    if kind not in KIND_COLS:
+        raise ValueError(f"알 수 없는 장부 종류: {kind}")
+    init_db()
+    conn = _connect()
+    df = pd.read_sql_query(_rows_sql(kind, "t.d=?", order="t.id", with_id=True), conn, params=(d.isoformat(),))
+    conn.close()
+    return df
+
+def fetch_day_version(d: dt.date) -> int:
+    """해당 날짜 장부의 현재 버전(저장된 적 없으면 0). fetch_day와 함께 읽어 save_day에 넘깁니다."""
+    init_db()
+    conn = _connect()
+    v = _day_version(conn.cursor(), d.isoformat())
+    conn.close()
+    return v
+
+def save_day(
+    d: dt.date,
+    income_df: pd.DataFrame,
+    expense_df: pd.DataFrame,
+    actor: Optional[str] = None,
+    expected_version: Optional[int] = None,
+) -> int:
+    """
+    선택일자 장부를 저장하고 저장 후 버전을 반환합니다.
+    expected_version을 주면(불러올 때의 버전) 그 사이 다른 사용자가 저장한 경우 SaveConflictError를 발생시킵니다.
+    마감된 기간의 날짜(선택일자 또는 행을 옮겨 간 날짜)가 바뀌면 PeriodClosedError를 발생시킵니다(저장 안 함).
+    """
+    init_db()
     ds = d.isoformat()
+    ts = dt.datetime.now().isoformat(timespec="seconds")
 
-    income_df = _clean_df(income_df, INCOME_COLS)
-    expense_df = _clean_df(expense_df, EXPENSE_COLS)
+    # uid 컬럼이 있으면(입력 화면/API가 불러온 행) 그 uid로 기존 행과 짝지음
+    income_df = _clean_df(income_df, INCOME_COLS + ["uid"])
+    expense_df = _clean_df(expense_df, EXPENSE_COLS + ["uid"])
 
     # 날짜가 비어 있으면 선택일자로 채움
     income_df.loc[income_df["날짜"].isna(), "날짜"] = d
     expense_df.loc[expense_df["날짜"].isna(), "날짜"] = d
 
-    # 선택일자 외 날짜가 들어오면 그대로 저장(하지만 이 페이지는 선택일자 중심이므로 경고를 원하면 추가 가능)
-    # 저장은 단순화를 위해: 선택일자 레코드 전체 삭제 후 재삽입
-    cur.execute("DELETE FROM income WHERE d=?", (ds,))
-    cur.execute("DELETE FROM expense WHERE d=?", (ds,))
+    income_rows = _df_to_rows(income_df, "수입항목", "수입내역", ds)
+    expense_rows = _df_to_rows(expense_df, "지출항목", "지출내역", ds)
 
-    for _, r in income_df.iterrows():
-        cur.execute(
-            "INSERT INTO income (d, usage, item, detail, amount, note) VALUES (?, ?, ?, ?, ?, ?)",
-            (
-                (r["날짜"].isoformat() if hasattr(r["날짜"], "isoformat") else ds),
-                (r["적요"] if pd.notna(r["적요"]) else None),
-                (r["수입항목"] if pd.notna(r["수입항목"]) else None),
-                (r["수입내역"] if pd.notna(r["수입내역"]) else None),
-                (float(r["금액"]) if pd.notna(r["금액"]) else None),
-                (r["비고"] if pd.notna(r["비고"]) else None),
-            )
-        )
+    conn = _connect()
+    try:
+        with _write_txn(conn) as cur:
+            current = _day_version(cur, ds)
+            if expected_version is not None and int(expected_version) != current:
+                raise SaveConflictError(d, int(expected_version), current)
 
-    for _, r in expense_df.iterrows():
-        cur.execute(
-            "INSERT INTO expense (d, usage, item, detail, amount, note) VALUES (?, ?, ?, ?, ?, ?)",
-            (
-                (r["날짜"].isoformat() if hasattr(r["날짜"], "isoformat") else ds),
-                (r["적요"] if pd.notna(r["적요"]) else None),
-                (r["지출항목"] if pd.notna(r["지출항목"]) else None),
-                (r["지출내역"] if pd.notna(r["지출내역"]) else None),
-                (float(r["금액"]) if pd.notna(r["금액"]) else None),
-                (r["비고"] if pd.notna(r["비고"]) else None),
+            # 선택일자 외 날짜가 들어오면 그대로 저장(하지만 이 페이지는 선택일자 중심이므로 경고를 원하면 추가 가능)
+            # 저장은 선택일자 레코드와 비교해 변경분만 반영(행 id 유지) + 변경 이력 기록
+            touched = _apply_rows(cur, "income", ds, ds, income_rows, _row_uids(income_df), ts, actor)
+            touched |= _apply_rows(cur, "expense", ds, ds, expense_rows, _row_uids(expense_df), ts, actor)
+            # 바뀐 날짜(선택일자, 행을 옮겨 간 날짜)가 마감 기간이면 전체 취소(ROLLBACK).
+            # 아무것도 바뀌지 않은 저장은 마감 기간이어도 통과(save_days와 같음)
+            for other in sorted(touched):
+                period = _closed_period(cur, other)
+                if period is not None:
+                    raise PeriodClosedError(dt.date.fromisoformat(other), period)
+
+            # 내용이 바뀐 날짜만 버전 증가(변경 없는 저장은 다른 사용자와 충돌을 만들지 않음)
+            _bump_versions(cur, sorted(touched))
+            _refresh_daily_totals(cur, sorted(touched))
+            new_version = _day_version(cur, ds)
+    finally:
+        conn.close()
+    return new_version
+
+def fetch_day_versions(start_date: dt.date, end_date: dt.date) -> dict:
+    """start~end(포함) 날짜별 현재 버전 {date: version}. 저장된 적 없는 날짜는 빠집니다(버전 0)."""
+    init_db()
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT d, version FROM day_version WHERE d BETWEEN ? AND ?", (start_date.isoformat(), end_date.isoformat())
+    ).fetchall()
+    conn.close()
+    return {dt.date.fromisoformat(d): int(v) for d, v in rows}
+
+def range_version(start_date: dt.date, end_date: dt.date) -> str:
+    """
+    기간 데이터 버전(보고서 캐시 키): 기간 안 날짜들의 저장 버전 합계/개수 + 항목 목록 지문.
+    기간 안 날짜가 저장되면(날짜 버전 증가) 또는 항목/순합계 제외 설정이 바뀌면 달라집니다.
+    """
+    init_db()
+    conn = _connect()
+    total, days = conn.execute(
+        "SELECT COALESCE(SUM(version), 0), COUNT(*) FROM day_version WHERE d BETWEEN ? AND ?",
+        (start_date.isoformat(), end_date.isoformat()),
+    ).fetchone()
+    (cats,) = conn.execute(
+        "SELECT group_concat(code || '|' || kind || '|' || name || '|' || sort_order || '|' || exclude_net || '|' || receipt, ';') "
+        "FROM (SELECT * FROM category ORDER BY code)"
+    ).fetchone()
+    conn.close()
+    return f"{total}.{days}.{hashlib.sha1((cats or '').encode('utf-8')).hexdigest()[:12]}"
+
+def save_days(
+    start_date: dt.date,
+    end_date: dt.date,
+    income_df: pd.DataFrame,
+    expense_df: pd.DataFrame,
+    actor: Optional[str] = None,
+    expected_versions: Optional[dict] = None,
+) -> dict:
+    """
+    여러 날짜(start~end, 한 주/한 달 등)의 장부를 트랜잭션 1개로 저장하고 저장 후 날짜별 버전 {date: version}을 반환합니다.
+    - 각 행은 자기 '날짜'의 장부로 저장합니다. 날짜가 비었거나 범위 밖인 행이 있으면 ValueError.
+    - 범위 안에서 행이 모두 빠진 날짜는 그 날짜의 행을 지웁니다.
+    - save_day와 같은 방식(uid로 짝지음, 범위 안에서 날짜를 옮긴 행도 같은 행)으로 바뀐 행만 반영하고,
+      내용이 바뀐 날짜만 버전을 올립니다.
+    - expected_versions(불러올 때의 fetch_day_versions)를 주면 그 사이 범위 안 날짜가 저장된 경우 SaveConflictError.
+    - 내용이 바뀌는 날짜가 마감된 기간이면 PeriodClosedError. 오류가 나면 어느 날짜도 저장하지 않습니다.
+    """
+    init_db()
+    sd, ed = start_date.isoformat(), end_date.isoformat()
+    ts = dt.datetime.now().isoformat(timespec="seconds")
+
+    # 종류별 (행 목록, uid 목록)
+    new_rows: dict = {}
+    for kind, df, cols in (("income", income_df, INCOME_COLS), ("expense", expense_df, EXPENSE_COLS)):
+        df = _clean_df(df, cols + ["uid"])
+        if df["날짜"].isna().any():
+            raise ValueError(f"{'수입' if kind == 'income' else '지출'} 행 중 날짜가 비어 있는 행이 있습니다.")
+        rows = _df_to_rows(df, *KIND_COLS[kind], sd)
+        for row in rows:
+            if not sd <= row[0] <= ed:
+                raise ValueError(f"{row[0]}은(는) 저장 범위({sd} ~ {ed}) 밖의 날짜입니다.")
+        new_rows[kind] = (rows, _row_uids(df))
+
+    conn = _connect()
+    try:
+        with _write_txn(conn) as cur:
+            current = dict(cur.execute("SELECT d, version FROM day_version WHERE d BETWEEN ? AND ?", (sd, ed)).fetchall())
+            if expected_versions is not None:
+                expected = {d.isoformat(): int(v) for d, v in expected_versions.items()}
+                for ds in sorted(set(current) | set(expected)):
+                    if expected.get(ds, 0) != current.get(ds, 0):
+                        raise SaveConflictError(dt.date.fromisoformat(ds), expected.get(ds, 0), current.get(ds, 0))
+
+            touched = set()
+            for kind, (rows, uids) in new_rows.items():
+                touched |= _apply_rows(cur, kind, sd, ed, rows, uids, ts, actor)
+            for ds in sorted(touched):
+                period = _closed_period(cur, ds)
+                if period is not None:
+                    raise PeriodClosedError(dt.date.fromisoformat(ds), period)
+
+            _bump_versions(cur, sorted(touched))
+            _refresh_daily_totals(cur, sorted(touched))
+            versions = cur.execute("SELECT d, version FROM day_version WHERE d BETWEEN ? AND ?", (sd, ed)).fetchall()
+    finally:
+        conn.close()
+    return {dt.date.fromisoformat(d): int(v) for d, v in versions}
+
+# ---------------------------------------------------------------------------
+# 기간 마감(period_close): 결과표는 utils.reports가 만들어 JSON으로 넘김
+# ---------------------------------------------------------------------------
+def _closed_period(cur, ds: str) -> Optional[str]:
+    row = cur.execute(
+        "SELECT period FROM period_close WHERE start_d <= ? AND end_d >= ? ORDER BY start_d, end_d DESC LIMIT 1", (ds, ds)
+    ).fetchone()
+    return row[0] if row else None
+
+def closed_period_of(d: dt.date) -> Optional[str]:
+    """날짜가 속한 마감 기간(없으면 None). 월과 년이 모두 마감됐으면 년."""
+    init_db()
+    conn = _connect()
+    period = _closed_period(conn.cursor(), d.isoformat())
+    conn.close()
+    return period
+
+def closed_periods() -> list[dict]:
+    """마감한 기간 목록(시작일순): [{"period", "start", "end", "closed_at", "actor"}]"""
+    init_db()
+    conn = _connect()
+    rows = conn.execute("SELECT period, start_d, end_d, closed_at, actor FROM period_close ORDER BY start_d, end_d").fetchall()
+    conn.close()
+    return [
+        {"period": p, "start": dt.date.fromisoformat(s), "end": dt.date.fromisoformat(e), "closed_at": ts, "actor": actor}
+        for p, s, e, ts, actor in rows
+    ]
+
+def period_snapshots(start_date: dt.date, end_date: dt.date) -> list[dict]:
+    """
+    start~end를 포함하는 마감 기간의 저장된 결과(좁은 기간부터):
+    [{"period", "start", "end", "closed_at", "actor", "snapshot"(JSON 문자열)}]
+    """
+    init_db()
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT period, start_d, end_d, closed_at, actor, snapshot_json FROM period_close "
+        "WHERE start_d <= ? AND end_d >= ? ORDER BY julianday(end_d) - julianday(start_d)",
+        (start_date.isoformat(), end_date.isoformat()),
+    ).fetchall()
+    conn.close()
+    return [
+        {
+            "period": p, "start": dt.date.fromisoformat(s), "end": dt.date.fromisoformat(e),
+            "closed_at": ts, "actor": actor, "snapshot": snap,
+        }
+        for p, s, e, ts, actor, snap in rows
+    ]
+
+def save_period_close(
+    period: str, start_date: dt.date, end_date: dt.date, snapshot_json: str,
+    as_of_seq: int, actor: Optional[str] = None,
+) -> bool:
+    """
+    기간을 마감하고 결과표(snapshot_json)를 저장합니다.
+    결과표를 만든 뒤(as_of_seq = 그때의 journal_high_water) 기간 안의 장부가 바뀌었으면 저장하지 않고 False.
+    """
+    init_db()
+    ts = dt.datetime.now().isoformat(timespec="seconds")
+    conn = _connect()
+    try:
+        with _write_txn(conn) as cur:
+            (changed,) = cur.execute(
+                # d는 바뀐 뒤 날짜 → 기간 밖으로 옮겨 간 행은 이전 날짜(old_json)로 확인
+                "SELECT COUNT(*) FROM change_log WHERE seq > ?1 "
+                "AND (d BETWEEN ?2 AND ?3 OR json_extract(old_json, '$.d') BETWEEN ?2 AND ?3)",
+                (as_of_seq, start_date.isoformat(), end_date.isoformat()),
+            ).fetchone()
+            if changed:
+                return False
+            cur.execute(
+                "INSERT OR REPLACE INTO period_close (period, start_d, end_d, closed_at, actor, snapshot_json) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (period, start_date.isoformat(), end_date.isoformat(), ts, actor, snapshot_json),
             )
-        )
+    finally:
+        conn.close()
+    return True
 
-    conn.commit()
+def reopen_period(period: str) -> bool:
+    """마감 해제(저장된 결과표도 삭제). 마감돼 있었으면 True."""
+    init_db()
+    conn = _connect()
+    try:
+        with _write_txn(conn) as cur:
+            cur.execute("DELETE FROM period_close WHERE period=?", (period,))
+            removed = cur.rowcount > 0
+    finally:
+        conn.close()
+    return removed
+
+def journal_high_water() -> int:
+    """변경 이력의 마지막 seq(없으면 0). 캐시/집계/내보내기의 증분 갱신 기준점으로 사용합니다."""
+    init_db()
+    conn = _connect()
+    (seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()
+    conn.close()
+    return int(seq)
+
+def fetch_changes(
+    since_seq: int = 0,
+    start_date: Optional[dt.date] = None,
+    end_date: Optional[dt.date] = None,
+    limit: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    since_seq 이후의 변경 이력을 seq 순서로 반환합니다.
+    start_date/end_date를 주면 해당 장부 날짜 범위의 이력만 반환합니다.
+    """
+    init_db()
+    conn = _connect()
+    sql = "SELECT seq, ts, actor, kind, op, row_id, d, old_json, new_json FROM change_log WHERE seq > ?"
+    params = [int(since_seq)]
+    if start_date is not None:
+        sql += " AND d >= ?"
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        sql += " AND d <= ?"
+        params.append(end_date.isoformat())
+    sql += " ORDER BY seq"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    df = pd.read_sql_query(sql, conn, params=params)
+    conn.close()
+    return df
+
+def fetch_page(
+    kind: str,
+    start_date: Optional[dt.date] = None,
+    end_date: Optional[dt.date] = None,
+    after: Optional[Tuple[str, int]] = None,
+    limit: int = 100,
+    item: Optional[str] = None,
+    usage: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    text: Optional[str] = None,
+    descending: bool = False,
+) -> pd.DataFrame:
+    """
+    (날짜, id) 순서로 limit개 행을 반환합니다(키셋 페이지 나누기).
+    after=(마지막 행의 날짜 ISO 문자열, id)를 주면 그 다음 행부터 읽으므로, 페이지가 뒤로 가도 비용이 같습니다.
+    필터: item(항목명), usage(적요), min_amount/max_amount(금액 범위, 포함), text(내역/비고에 포함된 글자)
+    descending=True 이면 최신 행부터(after 다음 = 더 이전 행).
+    반환 컬럼: id + INCOME_COLS/EXPENSE_COLS (빈 행 정리는 하지 않음)
+    """
+    if kind not in KIND_COLS:
+        raise ValueError(f"알 수 없는 장부 종류: {kind}")
+    init_db()
+    where, params = ["1=1"], []
+    if start_date is not None:
+        where.append("t.d >= ?")
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        where.append("t.d <= ?")
+        params.append(end_date.isoformat())
+    if item:
+        # 항목명 → code(없는 항목이면 결과 없음). code로 걸어야 (item_code, d, id) 인덱스를 탐
+        cats = load_categories()
+        codes = cats.loc[(cats["kind"] == kind) & (cats["name"] == item), "code"].tolist()
+        where.append("t.item_code = ?")
+        params.append(int(codes[0]) if codes else -1)
+    if usage:
+        where.append("t.usage = ?")
+        params.append(usage)
+    if min_amount is not None:
+        where.append("t.amount >= ?")
+        params.append(float(min_amount))
+    if max_amount is not None:
+        where.append("t.amount <= ?")
+        params.append(float(max_amount))
+    if text:
+        where.append("(instr(COALESCE(t.detail, ''), ?) > 0 OR instr(COALESCE(t.note, ''), ?) > 0)")
+        params.extend([text, text])
+    if after is not None:
+        where.append(f"(t.d, t.id) {'<' if descending else '>'} (?, ?)")
+        params.extend([str(after[0]), int(after[1])])
+    order = "t.d DESC, t.id DESC" if descending else "t.d, t.id"
+    sql = _rows_sql(kind, " AND ".join(where), order=order, with_id=True) + " LIMIT ?"
+    params.append(int(limit))
+
+    conn = _connect()
+    df = pd.read_sql_query(sql, conn, params=params)
     conn.close()
+    if not df.empty:
+        df["날짜"] = pd.to_datetime(df["날짜"]).dt.date
+    return df
 
 def fetch_all() -> Tuple[pd.DataFrame, pd.DataFrame]:
     init_db()
     conn = _connect()
-    income = pd.read_sql_query(
-        "SELECT d as 날짜, usage as 적요, item as 수입항목, detail as 수입내역, amount as 금액, note as 비고 FROM income ORDER BY d, id",
-        conn
-    )
-    expense = pd.read_sql_query(
-        "SELECT d as 날짜, usage as 적요, item as 지출항목, detail as 지출내역, amount as 금액, note as 비고 FROM expense ORDER BY d, id",
-        conn
-    )
+    income = pd.read_sql_query(_rows_sql("income"), conn)
+    expense = pd.read_sql_query(_rows_sql("expense"), conn)
     conn.close()
     if not income.empty:
         income["날짜"] = pd.to_datetime(income["날짜"]).dt.date
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""
+장부 사본 간 동기화(교회 PC ↔ 재정 담당자 노트북): DB 파일 전체 대신 바뀐 행만 파일로 주고받습니다.
+
+- 행마다 사본끼리 같은 고정 id(uid)와, 바뀔 때마다 새로 붙는 버전 표식(rev)이 있습니다.
+  저장할 때 변경 이력(change_log)에 uid, 바뀌기 전 표식(base_rev), 새 표식(rev), 바꾼 사본(origin)을 남깁니다.
+- 내보내기: 상대 사본이 받았다고 확인한 위치(acked_seq) 이후의 변경 중 상대가 만든 것이 아닌 행을
+  '바뀌기 전 표식 + 지금 내용(삭제면 없음) + 지금 표식'으로 묶어 gzip JSON 파일 1개로 만듭니다.
+- 가져오기(트랜잭션 1개): 행마다
+  - 내 표식 == 보낸 표식         → 이미 같음(건너뜀)
+  - 내 표식 == 보낸 쪽 이전 표식 → 내 쪽은 그동안 안 바뀜 → 반영(표식도 그대로 받음)
+  - 둘 다 아님                   → 양쪽에서 고친 행 → 반영하지 않고 충돌로 기록(내용이 같으면 충돌 아님)
+  표식만 비교하므로 어느 쪽에서 먼저 가져오든 같은 행이 충돌로 잡힙니다.
+  마감된 기간의 날짜를 바꾸는 행도 반영하지 않고 충돌로 기록합니다.
+- 충돌은 resolve_conflict로 '내 것 유지'(다음 내보내기 때 상대가 받음) 또는 '상대 것 사용'을 골라 정리합니다.
+- 같은 파일을 다시 가져오거나 범위가 겹쳐도 안전합니다(받은 위치 이후 변경만 보고, 표식이 같으면 건너뜀).
+- 첨부 파일(utils.attachments)은 주고받지 않습니다.
+
+처음 한 번은 지금처럼 DB 파일 전체를 복사해 두 사본을 맞춘 뒤부터 이 파일로 주고받습니다.
+
+사용 예:
+    python -m utils.sync status
+    python -m utils.sync export --peer <상대 id> --out 교회로.json.gz
+    python -m utils.sync import 노트북에서.json.gz
+    python -m utils.sync conflicts
+    python -m utils.sync resolve 3 remote        # 또는 local
+"""
+import sys
+import gzip
+import json
+import argparse
+import datetime as dt
+from dataclasses import dataclass
+from typing import Optional
+
+from utils import tenants
+from utils import storage
+from utils.storage import ROW_FIELDS, KIND_COLS
+
+# 파일 형식이 바뀌면 올림(다른 형식의 파일은 가져오지 않음)
+SYNC_FORMAT = 1
+
+@dataclass(frozen=True)
+class SyncResult:
+    peer: str
+    received: int    # 파일의 변경 수
+    applied: int     # 반영한 행
+    unchanged: int   # 이미 같았던 행(또는 전에 받은 변경)
+    conflicts: int   # 새로 기록한 충돌
+    days: list       # 내용이 바뀐 날짜(문자열)
+
+def _now() -> str:
+    return dt.datetime.now().isoformat(timespec="seconds")
+
+def _state(cur) -> dict:
+    return dict(cur.execute("SELECT key, value FROM sync_state").fetchall())
+
+def _peer_row(cur, peer: Optional[str]) -> tuple[int, int]:
+    """(acked_seq, received_seq). 처음 보는 사본이면 (0, 0)"""
+    row = cur.execute("SELECT acked_seq, received_seq FROM sync_peer WHERE node=?", (peer,)).fetchone()
+    return (int(row[0]), int(row[1])) if row else (0, 0)
+
+def _touch_peer(cur, peer: str) -> None:
+    cur.execute("INSERT OR IGNORE INTO sync_peer (node) VALUES (?)", (peer,))
+
+def node_id() -> str:
+    """이 장부 사본의 id(상대 사본에서 내보낼 때 --peer로 지정)"""
+    storage.init_db()
+    conn = storage._connect()
+    node = storage._sync_node(conn.cursor())
+    conn.close()
+    return node
+
+def peers() -> list[dict]:
+    """주고받은 적 있는 사본: [{"node", "acked_seq", "received_seq", "last_export", "last_import"}]"""
+    storage.init_db()
+    conn = storage._connect()
+    rows = conn.execute(
+        "SELECT node, acked_seq, received_seq, last_export, last_import FROM sync_peer "
+        "ORDER BY COALESCE(last_import, last_export) DESC"
+    ).fetchall()
+    conn.close()
+    return [dict(zip(("node", "acked_seq", "received_seq", "last_export", "last_import"), r)) for r in rows]
+
+def _local(cur, kind: str, uid: str) -> tuple[Optional[int], Optional[dict], Optional[str]]:
+    """내 쪽 행 (행 id, 내용, 표식). 지운 행은 (None, None, 삭제 때 표식), 모르는 행은 (None, None, None)"""
+    row = cur.execute(
+        f"SELECT t.id, t.d, t.usage, c.name, t.detail, t.amount, t.note, t.rev "
+        f"FROM {kind} t LEFT JOIN category c ON c.code = t.item_code WHERE t.uid=?",
+        (uid,),
+    ).fetchone()
+    if row is not None:
+        return row[0], dict(zip(ROW_FIELDS, row[1:7])), row[7]
+    tomb = cur.execute(
+        "SELECT rev FROM change_log WHERE uid=? AND op='delete' ORDER BY seq DESC LIMIT 1", (uid,)
+    ).fetchone()
+    return None, None, (tomb[0] if tomb else None)
+
+def export_changes(peer: Optional[str] = None, since: Optional[int] = None) -> tuple[bytes, dict]:
+    """
+    peer(상대 사본 id)에게 보낼 변경 파일(gzip JSON)과 요약 {"since", "until", "changes"}를 반환합니다.
+    since를 주지 않으면 상대가 받았다고 확인한 위치부터, 처음 보내는 상대면 동기화 시작 위치부터 만듭니다.
+    """
+    storage.init_db()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            state = _state(cur)
+            node = state["node"]
+            acked, received = _peer_row(cur, peer)
+            if since is None:
+                since = max(int(state.get("base_seq", 0)), acked)
+            (until,) = cur.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()
+            # 상대에게서 받은 변경은 돌려보내지 않음
+            entries = cur.execute(
+                "SELECT kind, uid, seq, base_rev, rev FROM change_log "
+                "WHERE seq > ? AND seq <= ? AND uid IS NOT NULL AND origin IS NOT ? ORDER BY seq",
+                (int(since), until, peer),
+            ).fetchall()
+            by_uid: dict = {}
+            for kind, uid, seq, base_rev, rev in entries:
+                by_uid.setdefault((kind, uid), []).append((seq, base_rev, rev))
+            changes, items = [], {}
+            for (kind, uid), chain in by_uid.items():
+                # 이전 표식: 마지막 변경에서 이 구간 안의 변경을 거슬러 올라가 상대도 가진 표식까지
+                # (충돌을 '내 것 유지'로 정리한 변경은 상대 표식 위에 고친 것이므로 거기서 멈춤)
+                made_here = {rev: base_rev for _, base_rev, rev in chain}
+                base_rev, seen = chain[-1][1], set()
+                while base_rev in made_here and base_rev not in seen:
+                    seen.add(base_rev)
+                    base_rev = made_here[base_rev]
+                _, row, rev = _local(cur, kind, uid)
+                changes.append({"kind": kind, "uid": uid, "seq": chain[-1][0], "base_rev": base_rev, "rev": rev, "row": row})
+                if row is not None and row["item"] is not None:
+                    items[(kind, row["item"])] = None
+            # 받는 쪽에 없는 항목은 같은 설정으로 등록하도록 쓰인 항목의 설정도 함께 보냄
+            categories = []
+            for kind, name, exclude_net, receipt in cur.execute(
+                "SELECT kind, name, exclude_net, receipt FROM category ORDER BY kind, sort_order"
+            ):
+                if (kind, name) in items:
+                    categories.append({"kind": kind, "name": name, "exclude_net": exclude_net, "receipt": receipt})
+            if peer is not None:
+                _touch_peer(cur, peer)
+                cur.execute("UPDATE sync_peer SET last_export=? WHERE node=?", (_now(), peer))
+    finally:
+        conn.close()
+
+    payload = {
+        "format": SYNC_FORMAT,
+        "ledger": tenants.current_ledger(),
+        "node": node,
+        "peer": peer,
+        "since": int(since),
+        "until": int(until),
+        "ack": received,  # 상대에게서 여기까지 받았음 → 상대는 다음부터 이 뒤만 보냄
+        "created_at": _now(),
+        "categories": categories,
+        "changes": changes,
+    }
+    data = gzip.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return data, {"since": int(since), "until": int(until), "changes": len(changes)}
+
+def _item_code(cur, kind: str, name: Optional[str], categories: dict) -> Optional[int]:
+    """항목명 → code. 없는 항목은 보낸 쪽 설정(없으면 기본값)으로 목록 끝에 등록"""
+    if name is None:
+        return None
+    row = cur.execute("SELECT code FROM category WHERE kind=? AND name=?", (kind, name)).fetchone()
+    if row is not None:
+        return row[0]
+    cat = categories.get((kind, name), {})
+    cur.execute(
+        "INSERT INTO category (kind, name, sort_order, exclude_net, receipt) "
+        "VALUES (?, ?, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM category WHERE kind=?), ?, ?)",
+        (kind, name, kind, int(cat.get("exclude_net", 0)), int(cat.get("receipt", storage._default_receipt(kind, name)))),
+    )
+    storage._category_cache.pop(storage.db_path(), None)
+    return cur.lastrowid
+
+def _apply(cur, change: dict, categories: dict, ts: str, actor: Optional[str], origin: str) -> set:
+    """
+    변경 1개를 내 쪽에 그대로 반영(표식도 받은 값으로)하고 내용이 바뀐 날짜를 반환합니다.
+    바뀌는 날짜가 마감된 기간이면 PeriodClosedError(반영 안 함).
+    """
+    kind, uid, new = change["kind"], change["uid"], change["row"]
+    row_id, old, rev = _local(cur, kind, uid)
+    dates = {r["d"] for r in (old, new) if r is not None}
+    for ds in sorted(dates):
+        period = storage._closed_period(cur, ds)
+        if period is not None:
+            raise storage.PeriodClosedError(dt.date.fromisoformat(ds), period)
+    old_t = tuple(old[f] for f in ROW_FIELDS) if old is not None else None
+    new_t = tuple(new[f] for f in ROW_FIELDS) if new is not None else None
+    if new is None:
+        if row_id is None:
+            return set()
+        cur.execute(f"DELETE FROM {kind} WHERE id=?", (row_id,))
+        cur.execute("DELETE FROM attachment WHERE kind=? AND row_id=?", (kind, row_id))
+        storage._log_change(cur, ts, actor, kind, "delete", row_id, old=old_t,
+                            uid=uid, base_rev=rev, rev=change["rev"], origin=origin)
+        return dates
+    values = (new["d"], new["usage"], _item_code(cur, kind, new["item"], categories), new["detail"], new["amount"], new["note"])
+    if row_id is None:
+        cur.execute(
+            f"INSERT INTO {kind} (d, usage, item_code, detail, amount, note, uid, rev) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (*values, uid, change["rev"]),
+        )
+        storage._log_change(cur, ts, actor, kind, "insert", cur.lastrowid, new=new_t,
+                            uid=uid, base_rev=rev, rev=change["rev"], origin=origin)
+    else:
+        cur.execute(
+            f"UPDATE {kind} SET d=?, usage=?, item_code=?, detail=?, amount=?, note=?, rev=? WHERE id=?",
+            (*values, change["rev"], row_id),
+        )
+        storage._log_change(cur, ts, actor, kind, "update", row_id, old=old_t, new=new_t,
+                            uid=uid, base_rev=rev, rev=change["rev"], origin=origin)
+    return dates
+
+def _close_conflicts(cur, uid: str, resolution: str, ts: str, actor: Optional[str]) -> None:
+    cur.execute(
+        "UPDATE sync_conflict SET resolved_at=?, resolution=?, actor=? WHERE uid=? AND resolved_at IS NULL",
+        (ts, resolution, actor, uid),
+    )
+
+def _finish(cur, touched: set) -> None:
+    touched = sorted(touched)
+    storage._bump_versions(cur, touched)
+    storage._refresh_daily_totals(cur, touched)
+
+def import_changes(data: bytes, actor: Optional[str] = None) -> SyncResult:
+    """상대 사본에서 만든 변경 파일(export_changes)을 트랜잭션 1개로 반영합니다. 형식/장부가 다르면 ValueError."""
+    try:
+        payload = json.loads(gzip.decompress(data).decode("utf-8"))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"동기화 파일을 읽을 수 없습니다: {e}")
+    if payload.get("format") != SYNC_FORMAT:
+        raise ValueError(f"지원하지 않는 동기화 파일 형식입니다: {payload.get('format')}")
+    if payload["ledger"] != tenants.current_ledger():
+        raise ValueError(f"다른 장부({payload['ledger']})의 파일입니다. 현재 장부: {tenants.current_ledger()}")
+    for change in payload["changes"]:
+        if change["kind"] not in KIND_COLS:
+            raise ValueError(f"알 수 없는 장부 종류: {change['kind']}")
+
+    storage.init_db()
+    peer = payload["node"]
+    categories = {(c["kind"], c["name"]): c for c in payload.get("categories", [])}
+    ts = _now()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            node = storage._sync_node(cur)
+            if peer == node:
+                raise ValueError("이 사본에서 만든 파일입니다. 상대 사본에서 가져오세요.")
+            _touch_peer(cur, peer)
+            _, received = _peer_row(cur, peer)
+            applied = unchanged = conflicts = 0
+            touched = set()
+            for change in payload["changes"]:
+                if change["seq"] <= received:
+                    unchanged += 1  # 전에 받은 변경(같은 파일을 다시 가져옴)
+                    continue
+                kind, uid = change["kind"], change["uid"]
+                row_id, local, rev = _local(cur, kind, uid)
+                if rev == change["rev"] or local == change["row"]:
+                    if local is not None and rev != change["rev"]:
+                        # 양쪽에서 같은 내용으로 고침: 두 사본이 같은 표식을 갖도록 큰 쪽으로 맞춤
+                        cur.execute(f"UPDATE {kind} SET rev=? WHERE id=?", (max(rev, change["rev"]), row_id))
+                    _close_conflicts(cur, uid, "same", ts, actor)
+                    unchanged += 1
+                    continue
+                reason = None
+                if rev == change["base_rev"]:
+                    try:
+                        touched |= _apply(cur, change, categories, ts, actor, peer)
+                        _close_conflicts(cur, uid, "remote", ts, actor)
+                        applied += 1
+                        continue
+                    except storage.PeriodClosedError as e:
+                        reason = f"마감된 기간({e.period})"
+                else:
+                    reason = "양쪽에서 수정" if local is not None and change["row"] is not None else "한쪽에서 삭제"
+                # 충돌: 내 쪽은 그대로 두고 기록(같은 행의 열린 충돌은 최신 것으로 교체)
+                cur.execute("DELETE FROM sync_conflict WHERE uid=? AND peer=? AND resolved_at IS NULL", (uid, peer))
+                cur.execute(
+                    "INSERT INTO sync_conflict (peer, kind, uid, d, local_rev, change_json, reason, detected_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        peer, kind, uid, (change["row"] or local or {}).get("d"), rev,
+                        json.dumps(change, ensure_ascii=False), reason, ts,
+                    ),
+                )
+                conflicts += 1
+            _finish(cur, touched)
+            cur.execute(
+                "UPDATE sync_peer SET received_seq=MAX(received_seq, ?), last_import=? WHERE node=?",
+                (int(payload["until"]), ts, peer),
+            )
+            # 나에게 보낸 파일이면 상대가 받았다고 한 위치까지는 다시 보내지 않음
+            if payload.get("peer") == node:
+                cur.execute("UPDATE sync_peer SET acked_seq=MAX(acked_seq, ?) WHERE node=?", (int(payload["ack"]), peer))
+    finally:
+        conn.close()
+    return SyncResult(
+        peer=peer, received=len(payload["changes"]), applied=applied, unchanged=unchanged,
+        conflicts=conflicts, days=sorted(touched),
+    )
+
+def open_conflicts() -> list[dict]:
+    """정리하지 않은 충돌: [{"id", "peer", "kind", "uid", "d", "reason", "detected_at", "local", "remote"}] (local/remote는 행 내용, 삭제면 None)"""
+    storage.init_db()
+    conn = storage._connect()
+    try:
+        cur = conn.cursor()
+        rows = cur.execute(
+            "SELECT id, peer, kind, uid, d, reason, detected_at, change_json FROM sync_conflict "
+            "WHERE resolved_at IS NULL ORDER BY d, id"
+        ).fetchall()
+        out = []
+        for cid, peer, kind, uid, d, reason, detected_at, change_json in rows:
+            out.append({
+                "id": cid, "peer": peer, "kind": kind, "uid": uid, "d": d, "reason": reason, "detected_at": detected_at,
+                "local": _local(cur, kind, uid)[1], "remote": json.loads(change_json)["row"],
+            })
+    finally:
+        conn.close()
+    return out
+
+def resolve_conflict(conflict_id: int, keep: str, actor: Optional[str] = None) -> None:
+    """
+    충돌 정리. keep="remote": 상대 내용으로 바꿈. keep="local": 내 내용을 유지하고,
+    다음 내보내기 때 상대가 내 내용을 받도록(상대 표식 위에 고친 것으로) 이력을 남깁니다.
+    """
+    if keep not in ("local", "remote"):
+        raise ValueError("keep은 'local' 또는 'remote'입니다.")
+    storage.init_db()
+    ts = _now()
+    conn = storage._connect()
+    try:
+        with storage._write_txn(conn) as cur:
+            row = cur.execute(
+                "SELECT kind, uid, change_json FROM sync_conflict WHERE id=? AND resolved_at IS NULL", (int(conflict_id),)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"정리할 충돌이 없습니다: {conflict_id}")
+            kind, uid, change_json = row
+            change = json.loads(change_json)
+            node = storage._sync_node(cur)
+            if keep == "remote":
+                # 이 사본의 결정이므로 origin은 이 사본: 상대에게 다시 가도 표식이 같아 건너뜀(상대의 충돌도 정리됨)
+                _finish(cur, _apply(cur, change, {}, ts, actor, node))
+            else:
+                row_id, local, _ = _local(cur, kind, uid)
+                rev = storage._new_rev()
+                if row_id is not None:
+                    cur.execute(f"UPDATE {kind} SET rev=? WHERE id=?", (rev, row_id))
+                    local_t = tuple(local[f] for f in ROW_FIELDS)
+                    storage._log_change(cur, ts, actor, kind, "update", row_id, old=local_t, new=local_t,
+                                        uid=uid, base_rev=change["rev"], rev=rev, origin=node)
+                elif change["row"] is not None:
+                    # 내 쪽에서 지운 행을 상대가 고침 → 삭제 유지
+                    old_t = tuple(change["row"][f] for f in ROW_FIELDS)
+                    tomb = cur.execute(
+                        "SELECT row_id FROM change_log WHERE uid=? AND op='delete' ORDER BY seq DESC LIMIT 1", (uid,)
+                    ).fetchone()
+                    storage._log_change(cur, ts, actor, kind, "delete", tomb[0] if tomb else 0, old=old_t,
+                                        uid=uid, base_rev=change["rev"], rev=rev, origin=node)
+            _close_conflicts(cur, uid, keep, ts, actor)
+    finally:
+        conn.close()
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.sync", description="장부 사본 간 변경분 동기화")
+    parser.add_argument("--ledger", default=tenants.DEFAULT_LEDGER, help="장부 코드(기본: default)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="이 사본 id와 주고받은 사본 목록")
+    p_exp = sub.add_parser("export", help="변경 파일 만들기")
+    p_exp.add_argument("--peer", help="받을 사본 id(status로 확인, 생략하면 동기화 시작 위치부터 전부)")
+    p_exp.add_argument("--since", type=int, help="이 변경 이력 seq 이후부터(다시 보낼 때)")
+    p_exp.add_argument("--out", help="저장할 파일(기본: sync_<장부>_<사본 id>_<seq>.json.gz)")
+    p_imp = sub.add_parser("import", help="상대 사본의 변경 파일 가져오기")
+    p_imp.add_argument("path")
+    sub.add_parser("conflicts", help="정리하지 않은 충돌 목록")
+    p_res = sub.add_parser("resolve", help="충돌 정리")
+    p_res.add_argument("id", type=int)
+    p_res.add_argument("keep", choices=["local", "remote"])
+    args = parser.parse_args(argv)
+
+    with tenants.use_ledger(args.ledger):
+        if args.cmd == "status":
+            print(f"이 사본 id: {node_id()}")
+            for p in peers():
+                print(f"  {p['node']}  보낸 것 확인 seq {p['acked_seq']}  받은 seq {p['received_seq']}  "
+                      f"내보내기 {p['last_export'] or '-'}  가져오기 {p['last_import'] or '-'}")
+        elif args.cmd == "export":
+            data, info = export_changes(args.peer, args.since)
+            path = args.out or f"sync_{tenants.current_ledger()}_{node_id()}_{info['until']}.json.gz"
+            with open(path, "wb") as f:
+                f.write(data)
+            print(f"{path}: 변경 {info['changes']:,}행 (seq {info['since']}~{info['until']}, {len(data) / 1024:,.1f} KB)")
+        elif args.cmd == "import":
+            with open(args.path, "rb") as f:
+                result = import_changes(f.read())
+            print(
+                f"{result.peer}에서 {result.received:,}행: 반영 {result.applied:,} · 같음 {result.unchanged:,} · "
+                f"충돌 {result.conflicts:,} (바뀐 날짜 {len(result.days)}일)"
+            )
+            return 1 if result.conflicts else 0
+        elif args.cmd == "conflicts":
+            for c in open_conflicts():
+                print(f"[{c['id']}] {c['d']} {c['kind']} {c['reason']}\n  내 것:   {c['local']}\n  상대 것: {c['remote']}")
+        elif args.cmd == "resolve":
+            resolve_conflict(args.id, args.keep)
+            print("정리했습니다.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
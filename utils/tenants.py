@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+여러 교회(장부)를 한 서버에서 운영하기 위한 장부 목록/선택/연결 관리.
+
+- 장부마다 SQLite 파일 1개. 기본 장부는 기존 data/church_finance.db (데이터 폴더는 CHURCH_DATA_DIR로 변경 가능)
+- 장부 목록은 data/ledgers.json 에 보관(없으면 기본 장부 1개)
+- 현재 장부: use_ledger()로 지정한 값 → Streamlit 세션의 선택값 → 기본 장부 순으로 결정
+- 연결은 장부별로 필요할 때 열고(lazy), 쓰지 않는 연결은 일정 시간 후 닫습니다.
+"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+from utils import querylog
+
+# 데이터 폴더(환경변수 CHURCH_DATA_DIR로 바꿀 수 있음: 부하 테스트 등에서 복사본 사용)
+DATA_DIR_ENV = "CHURCH_DATA_DIR"
+DATA_DIR = os.environ.get(DATA_DIR_ENV) or os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+REGISTRY_PATH = os.path.join(DATA_DIR, "ledgers.json")
+
+DEFAULT_LEDGER = "default"
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, "church_finance.db")
+DEFAULT_CHURCH_NAME = "평안한교회"
+
+# Streamlit 세션에서 선택한 장부를 보관하는 키
+SESSION_KEY = "ledger"
+
+_KEY_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,39}$")
+
+@dataclass(frozen=True)
+class Ledger:
+    key: str
+    name: str
+    db_path: str
+    # 기부금 영수증의 기부금 단체 정보(ledgers.json에 선택 입력)
+    reg_no: str = ""
+    address: str = ""
+    representative: str = ""
+
+_registry_cache: dict = {"mtime": None, "ledgers": None}
+_registry_lock = threading.Lock()
+
+def _load_registry() -> dict:
+    """ledgers.json을 읽어 {key: Ledger}로 반환(파일이 바뀐 경우에만 다시 읽음)."""
+    try:
+        mtime = os.path.getmtime(REGISTRY_PATH)
+    except OSError:
+        mtime = None
+    with _registry_lock:
+        if _registry_cache["ledgers"] is not None and _registry_cache["mtime"] == mtime:
+            return _registry_cache["ledgers"]
+
+        raw = {}
+        if mtime is not None:
+            with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+
+        ledgers = {DEFAULT_LEDGER: Ledger(DEFAULT_LEDGER, DEFAULT_CHURCH_NAME, DEFAULT_DB_PATH)}
+        for key, info in raw.items():
+            name = info.get("name") or key
+            extra = {f: str(info.get(f) or "") for f in ("reg_no", "address", "representative")}
+            if key == DEFAULT_LEDGER:
+                ledgers[key] = Ledger(key, name, DEFAULT_DB_PATH, **extra)
+                continue
+            db = info.get("db") or os.path.join("ledgers", f"{key}.db")
+            ledgers[key] = Ledger(key, name, db if os.path.isabs(db) else os.path.join(DATA_DIR, db), **extra)
+
+        _registry_cache["mtime"] = mtime
+        _registry_cache["ledgers"] = ledgers
+        return ledgers
+
+def list_ledgers() -> list[Ledger]:
+    ledgers = _load_registry()
+    return [ledgers[DEFAULT_LEDGER]] + sorted((l for k, l in ledgers.items() if k != DEFAULT_LEDGER), key=lambda l: l.name)
+
+def get_ledger(key: Optional[str] = None) -> Ledger:
+    ledgers = _load_registry()
+    key = key or current_ledger()
+    if key not in ledgers:
+        raise KeyError(f"등록되지 않은 장부입니다: {key}")
+    return ledgers[key]
+
+def add_ledger(key: str, name: str) -> Ledger:
+    """장부를 등록합니다. DB 파일은 처음 사용할 때 만들어집니다."""
+    key = (key or "").strip().lower()
+    name = (name or "").strip()
+    if not _KEY_RE.match(key):
+        raise ValueError("장부 코드는 영문 소문자/숫자/-/_ 만 사용할 수 있습니다. (최대 40자)")
+    if not name:
+        raise ValueError("교회(장부) 이름을 입력해 주세요.")
+
+    raw = {}
+    if os.path.exists(REGISTRY_PATH):
+        with open(REGISTRY_PATH, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    if key in raw:
+        raise ValueError(f"이미 있는 장부 코드입니다: {key}")
+    raw[key] = {"name": name} if key == DEFAULT_LEDGER else {"name": name, "db": os.path.join("ledgers", f"{key}.db")}
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = REGISTRY_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(raw, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, REGISTRY_PATH)
+    return get_ledger(key)
+
+# ---------------------------------------------------------------------------
+# 현재 장부
+# ---------------------------------------------------------------------------
+_current: contextvars.ContextVar = contextvars.ContextVar("ledger", default=None)
+
+def _session_ledger() -> Optional[str]:
+    # Streamlit 스크립트 실행 중일 때만 세션 값을 사용(명령줄/HTTP에서는 streamlit을 불러오지 않음)
+    st = sys.modules.get("streamlit")
+    if st is None:
+        return None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return None
+        return st.session_state.get(SESSION_KEY)
+    except Exception:
+        return None
+
+def current_ledger() -> str:
+    key = _current.get() or _session_ledger()
+    if not key or key not in _load_registry():
+        return DEFAULT_LEDGER
+    return key
+
+def current_church_name() -> str:
+    return get_ledger(current_ledger()).name
+
+@contextmanager
+def use_ledger(key: str):
+    """블록 안에서 사용할 장부를 지정합니다(명령줄/HTTP/백그라운드 작업용)."""
+    get_ledger(key)  # 존재 확인
+    token = _current.set(key)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+# ---------------------------------------------------------------------------
+# 연결 라우터
+# ---------------------------------------------------------------------------
+class PooledConnection(sqlite3.Connection):
+    """close() 시 실제로 닫지 않고 라우터의 대기 목록으로 돌려보내는 연결."""
+
+    _router = None
+    _pool_key = None
+
+    def cursor(self, factory=None):
+        # SQL 실행 기록이 켜져 있으면 계측 커서(utils.querylog)
+        factory = factory or querylog.cursor_factory()
+        return super().cursor(factory) if factory else super().cursor()
+
+    def execute(self, sql, parameters=()):
+        if querylog.enabled():
+            return self.cursor().execute(sql, parameters)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if querylog.enabled():
+            return self.cursor().executemany(sql, seq_of_parameters)
+        return super().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self._router is None:
+            super().close()
+        else:
+            self._router._release(self)
+
+    def _close_for_real(self):
+        super().close()
+
+class LedgerRouter:
+    """
+    장부(DB 파일)별 연결 풀.
+    - 처음 요청될 때 연결을 열고, 반환된 연결은 재사용
+    - idle_timeout 초 이상 쓰이지 않은 연결은 다음 요청 때 닫음
+    - 한 연결은 한 번에 한 스레드만 사용(반환 전까지 다른 요청에 주지 않음)
+    """
+
+    def __init__(self, idle_timeout: float = 300.0, max_idle_per_ledger: int = 4):
+        self.idle_timeout = idle_timeout
+        self.max_idle_per_ledger = max_idle_per_ledger
+        self._lock = threading.Lock()
+        self._idle: dict[str, list] = {}
+
+    def connect(self, key: Optional[str] = None, timeout: float = 5.0) -> sqlite3.Connection:
+        path = get_ledger(key).db_path
+        now = time.monotonic()
+        conn = None
+        with self._lock:
+            expired = self._take_expired(now, self.idle_timeout)
+            pool = self._idle.get(path)
+            if pool:
+                conn = pool.pop()[0]
+        for c in expired:
+            c._close_for_real()
+        if conn is not None:
+            # 재사용 연결도 이번 요청의 timeout(잠금 대기 시간)을 따르게 함
+            conn.execute(f"PRAGMA busy_timeout={int(timeout * 1000)}")
+            return conn
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, factory=PooledConnection)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn._router = self
+        conn._pool_key = path
+        return conn
+
+    def _release(self, conn: PooledConnection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.isolation_level = ""  # 기본(암묵적 트랜잭션)으로 되돌림
+            conn.row_factory = None
+        except sqlite3.Error:
+            conn._close_for_real()
+            return
+        with self._lock:
+            pool = self._idle.setdefault(conn._pool_key, [])
+            if len(pool) < self.max_idle_per_ledger:
+                pool.append((conn, time.monotonic()))
+                return
+        conn._close_for_real()
+
+    def _take_expired(self, now: float, max_idle: float) -> list:
+        expired = []
+        for pool in self._idle.values():
+            keep = []
+            for conn, last in pool:
+                if now - last > max_idle:
+                    expired.append(conn)
+                else:
+                    keep.append((conn, last))
+            pool[:] = keep
+        return expired
+
+    def close_idle(self, max_idle: Optional[float] = None) -> int:
+        """max_idle 초(기본 idle_timeout) 이상 쉬고 있는 연결을 닫고, 닫은 개수를 반환합니다."""
+        with self._lock:
+            expired = self._take_expired(time.monotonic(), self.idle_timeout if max_idle is None else max_idle)
+        for c in expired:
+            c._close_for_real()
+        return len(expired)
+
+    def stats(self) -> dict:
+        """장부 DB 경로별 대기 중인 연결 수"""
+        with self._lock:
+            return {path: len(pool) for path, pool in self._idle.items() if pool}
+
+# 프로세스 전체에서 공유하는 라우터
+router = LedgerRouter()
@@ -4,8 +4,9 @@ import calendar
 import streamlit as st
 
 from utils.auth import is_authenticated, logout_button
-from utils.storage import fetch_all
-from utils.exporter import export_all_xlsx
+from utils.tenants import list_ledgers, current_ledger, current_church_name, use_ledger
+from utils.warmup import start_background_warmup
+from utils.autosave import queue as autosave_queue, session_owner
 
 def apply_global_style() -> None:
     # 중년층 친화: 큰 글씨, 넓은 버튼, 여백 확보
@@ -55,11 +56,25 @@ def render_header(title: str, subtitle: str = "") -> None:
     if subtitle:
         st.markdown(f'<div class="sub-title">{subtitle}</div>', unsafe_allow_html=True)
 
+def _all_xlsx_builder(ledger: str):
+    """전체 엑셀을 만드는 함수(다운로드 버튼을 눌렀을 때 별도 스레드에서 실행)"""
+    def build() -> bytes:
+        # pandas/openpyxl은 여기서 처음 불러옴(로그인 페이지 첫 로딩에는 필요 없음)
+        from utils.storage import fetch_all
+        from utils.exporter import export_all_xlsx
+
+        with use_ledger(ledger):
+            income_all, expense_all = fetch_all()
+            return export_all_xlsx(income_all, expense_all)
+    return build
+
 def render_top_nav(active: str) -> None:
     """
     상단바 네비게이션(사이드바 대신).
     active: 현재 페이지 키 (e.g., "기본정보", "재정장부(입력)")
     """
+    # 서버 시작 후 첫 요청 때 한 번, 백그라운드에서 DB/캐시 미리 준비
+    start_background_warmup()
 
     # 페이지 이동(진입) 감지: 다른 페이지에서 넘어왔을 때 visit 카운트를 증가
     prev_active = st.session_state.get("__active_page")
@@ -72,17 +87,24 @@ def render_top_nav(active: str) -> None:
     pages = [
         ("기본정보", "app.py"),
         ("재정장부(입력)", "pages/1_재정장부_입력.py"),
+        ("일괄 입력", "pages/8_일괄입력.py"),
         ("재정장부(보고)", "pages/2_재정장부_보고.py"),
         ("월별 현황(수입)", "pages/3_월별현황_수입.py"),
         ("월별 현황(지출)", "pages/4_월별현황_지출.py"),
+        ("은행 대조", "pages/5_은행대조.py"),
+        ("거래 내역", "pages/7_거래내역.py"),
+        ("시산표", "pages/10_시산표.py"),
         ("예산안", "pages/6_예산안.py"),
+        ("관리", "pages/9_관리.py"),
     ]
 
-    # 버튼을 가로로 배치
-    cols = st.columns([1, 1, 1, 1, 1, 0.9, 1.35], gap="small")
+    # 버튼을 가로로 배치(마지막 칸은 로그인/다운로드 영역)
+    cols = st.columns([1] * len(pages) + [1.35], gap="small")
     for i, (label, path) in enumerate(pages):
         btn_type = "primary" if label == active else "secondary"
         if cols[i].button(label, type=btn_type, key=f"nav_{active}_{label}", width="stretch"):
+            # 다른 페이지로 가기 전에 입력 페이지의 대기 중인 자동 저장을 반영
+            autosave_queue.flush_owner(session_owner())
             try:
                 st.switch_page(path)
             except Exception:
@@ -91,13 +113,11 @@ def render_top_nav(active: str) -> None:
     with cols[-1]:
         if is_authenticated():
             logout_button(key=f"logout_{active}")
-            # 전체 엑셀 다운로드
+            # 전체 엑셀 다운로드(버튼을 눌렀을 때 생성)
             try:
-                income_all, expense_all = fetch_all()
-                xlsx_bytes = export_all_xlsx(income_all, expense_all)
                 st.download_button(
                     "전체 엑셀(.xlsx)",
-                    data=xlsx_bytes,
+                    data=_all_xlsx_builder(current_ledger()),
                     file_name=f"교회재정_전체데이터_{dt.date.today().isoformat()}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     width="stretch",
@@ -112,14 +132,10 @@ def render_top_nav(active: str) -> None:
                     st.switch_page("app.py")
                 except Exception:
                     pass
-def _sundays_of_month(year: int, month: int):
-    cal = calendar.monthcalendar(year, month)
-    sundays = []
-    for week in cal:
-        d = week[calendar.SUNDAY]
-        if d != 0:
-            sundays.append(dt.date(year, month, d))
-    return sundays
+
+    # 여러 장부를 운영하는 경우 현재 장부 표시
+    if len(list_ledgers()) > 1:
+        st.caption(f"현재 장부: {current_church_name()}")
 
 def church_date_picker(prefix: str = "date") -> dt.date:
     """
@@ -141,7 +157,9 @@ def church_date_picker(prefix: str = "date") -> dt.date:
     year = c1.selectbox("년", years, index=years.index(today.year), key=y_key)
     month = c2.selectbox("월", list(range(1, 13)), index=today.month - 1, key=m_key)
 
-    sundays = _sundays_of_month(year, month)
+    # 주일/주차는 DB의 calendar 테이블 기준(보고서와 같은 정의)
+    from utils.storage import sundays_of_month
+    sundays = sundays_of_month(year, month)
     if not sundays:
         sundays = [dt.date(year, month, 1)]
 
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+서버를 다시 시작한 뒤 첫 화면을 빨리 띄우기 위한 준비 작업과 모듈 불러오기 시간 점검.
+
+- start_background_warmup(): 첫 요청 때 한 번, 백그라운드 스레드에서 무거운 모듈(pandas/openpyxl)을
+  불러오고 모든 장부 DB를 열어 스키마 확인/항목 캐시를 미리 채웁니다.
+  환경변수 CHURCH_WARMUP=0 이면 하지 않습니다. 준비가 끝나면 정기 DB 정리(utils.maintenance)를 시작합니다.
+
+사용 예:
+    python -m utils.warmup            # 준비 작업을 실행하고 단계별 시간 출력
+    python -m utils.warmup --check    # 로그인 페이지 모듈의 불러오기 시간 예산 점검(초과 시 종료 코드 1)
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import threading
+import subprocess
+
+WARMUP_ENV = "CHURCH_WARMUP"
+
+# 로그인 페이지(app.py)가 불러오는 우리 모듈과 시간 예산(streamlit 자체는 제외)
+LOGIN_MODULES = ["utils.ui", "utils.auth", "utils.tenants"]
+IMPORT_BUDGET_SEC = 0.2
+# 로그인 페이지에서 불러오면 안 되는 무거운 모듈(엑셀/보고서를 만들 때 불러옴)
+HEAVY_MODULES = ["pandas", "openpyxl"]
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_started = False
+_start_lock = threading.Lock()
+
+def warm_up() -> dict:
+    """무거운 모듈을 불러오고 모든 장부 DB를 열어 캐시를 채웁니다. 단계별 소요 시간(초)을 반환합니다."""
+    timings = {}
+    t0 = time.perf_counter()
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
+    from utils import storage, reports, exporter  # noqa: F401
+    from utils import tenants
+    timings["imports"] = time.perf_counter() - t0
+
+    for ledger in tenants.list_ledgers():
+        t0 = time.perf_counter()
+        with tenants.use_ledger(ledger.key):
+            storage.init_db()
+            storage.load_categories()
+            storage.journal_high_water()
+        timings[f"ledger:{ledger.key}"] = time.perf_counter() - t0
+    return timings
+
+def _warm_up_quietly() -> None:
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"[warmup] 준비 작업 실패: {e}", file=sys.stderr)
+    # 준비가 끝난 뒤 정기 DB 정리 시작
+    from utils import maintenance
+
+    maintenance.start_scheduler()
+
+def start_background_warmup() -> bool:
+    """프로세스당 한 번만 백그라운드 준비 작업을 시작합니다. 시작했으면 True."""
+    global _started
+    if os.environ.get(WARMUP_ENV, "1") == "0":
+        return False
+    with _start_lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=_warm_up_quietly, name="warmup", daemon=True).start()
+    return True
+
+def measure_imports(modules: list[str]) -> tuple[float, list[str]]:
+    """
+    새 파이썬 프로세스에서 streamlit을 먼저 불러온 뒤 modules를 불러오는 데 걸린 시간(초)과
+    그때 새로 불러온 최상위 모듈 목록을 반환합니다.
+    """
+    code = (
+        "import sys, time, json\n"
+        "import streamlit\n"
+        "before = set(sys.modules)\n"
+        "t0 = time.perf_counter()\n"
+        + "".join(f"import {m}\n" for m in modules)
+        + "elapsed = time.perf_counter() - t0\n"
+        "loaded = sorted({m.split('.')[0] for m in set(sys.modules) - before})\n"
+        "print(json.dumps({'elapsed': elapsed, 'loaded': loaded}))\n"
+    )
+    env = dict(os.environ, **{WARMUP_ENV: "0"})
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["elapsed"], result["loaded"]
+
+def check_import_budget(budget_sec: float = IMPORT_BUDGET_SEC) -> list[str]:
+    """로그인 페이지 모듈의 불러오기 시간/무거운 모듈 여부를 점검하고 문제 목록을 반환합니다(비어 있으면 통과)."""
+    elapsed, loaded = measure_imports(LOGIN_MODULES)
+    problems = []
+    if elapsed > budget_sec:
+        problems.append(f"불러오기 시간 {elapsed:.3f}초 > 예산 {budget_sec:.3f}초")
+    heavy = [m for m in HEAVY_MODULES if m in loaded]
+    if heavy:
+        problems.append(f"로그인 페이지에서 무거운 모듈을 불러옴: {', '.join(heavy)}")
+    print(f"{', '.join(LOGIN_MODULES)}: {elapsed:.3f}초 (예산 {budget_sec:.3f}초)")
+    return problems
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.warmup", description="서버 준비 작업 / 불러오기 시간 점검")
+    parser.add_argument("--check", action="store_true", help="로그인 페이지 모듈의 불러오기 시간 예산 점검")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SEC, help="불러오기 시간 예산(초)")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        problems = check_import_budget(args.budget)
+        for p in problems:
+            print(f"실패: {p}")
+        return 1 if problems else 0
+
+    for step, sec in warm_up().items():
+        print(f"{step}: {sec:.3f}초")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))